@@ -0,0 +1,3 @@
+from benchmarks.benchmarkTools import main
+
+main()
@@ -0,0 +1,286 @@
+import argparse
+import os
+import time
+import tracemalloc
+
+from unittest import mock
+
+import src.calibrationTools as ct
+import src.daqTools as dt
+import src.gui.guiDataAcquisition as guiDataAcquisition
+import src.guiTools as gt
+import src.pipelineTools as pt
+import src.simulationTools as sim
+import src.statisticsTools as st
+import src.timingTools as tm
+
+from benchmarks.benchmarkTools import AggCanvas, save_results
+from matplotlib.figure import Figure
+from src.guiTools import sg
+
+acquisition_modes = ['on demand', 'finite sampling']
+
+DEFAULT_N_TICKS = 500  # acquisition ticks of every mode
+DEFAULT_ALARMS = ['85', '105']  # [ºC], the simulated temperature crosses both
+DEFAULT_SAMPLE_RATE = 16  # [Sa/s], the fastest the finite sampling window accepts is 1000 / gt.MIN_TIME_UPDATE_MS
+
+
+class FakeElement:
+    """
+    Stands for a PySimpleGUI element: stores what the window behaviour updates instead of drawing it
+    """
+
+    def __init__(self, window, key):
+        self.window = window
+        self.key = key
+        self.value = None
+        self.visible = True
+        self.disabled = False
+        self.source = None
+        self.metadata = None
+
+    def update(self, value=None, disabled=None, visible=None, source=None, **kwargs):
+        if value is not None:
+            self.value = value
+            # inputs edited by the behaviour, e.g. emptied, are read back in the next values
+            if self.key in self.window.values:
+                self.window.values[self.key] = value
+        if disabled is not None:
+            self.disabled = disabled
+        if visible is not None:
+            self.visible = visible
+        if source is not None:
+            self.source = source
+
+
+class FakeWindow:
+    """
+    Stands for a PySimpleGUI window without a display. Its reads return scripted events: first the events before
+    the acquisition, then timeouts while acquiring, until n_ticks have been read or the acquisition ends on its
+    own, then the remaining events and finally the window is closed. Events of hidden or disabled elements are
+    skipped, the user couldn't click them.
+
+    It measures the acquisition: the time the behaviour takes between reads (per tick latency), the samples per
+    second and the memory the process grows.
+    """
+
+    def __init__(self, values, script, n_ticks, realtime=False, trace_memory=False):
+        """
+        :param values: values of the window inputs
+        :param script: list of [event, changes to the values] pairs
+        :param n_ticks: maximum number of acquisition ticks
+        :param realtime: True to wait for the read timeout like PySimpleGUI does, False to run as fast as possible
+        :param trace_memory: True to measure the memory allocated by Python with tracemalloc, which slows the loop,
+        instead of the resident memory of the process
+        """
+        self.values = dict(values)
+        self.script = list(script)
+        self.n_ticks = n_ticks
+        self.realtime = realtime
+        self.trace_memory = trace_memory
+        self.elements = {}
+        self.ticks = 0
+        self.tick_latency = tm.LatencyHistogram()
+        self.last_event = None
+        self.last_return_ns = None
+        self.start_ns = None
+        self.end_ns = None
+        self.start_memory = None
+        self.end_memory = None
+
+    def __getitem__(self, key):
+        if key not in self.elements:
+            self.elements[key] = FakeElement(self, key)
+        return self.elements[key]
+
+    def is_acquiring(self):
+        return bool(self['-ACQUIRE-'].metadata)
+
+    def get_memory(self):
+        return tracemalloc.get_traced_memory()[0] if self.trace_memory else get_resident_memory()
+
+    def read(self, timeout=None):
+        now = time.perf_counter_ns()
+        if self.last_event in ['-ACQUIRE-', sg.TIMEOUT_KEY] and self.start_ns is not None and self.end_ns is None:
+            self.tick_latency.add(now - self.last_return_ns)
+        if self.is_acquiring() and self.ticks < self.n_ticks:
+            if self.start_ns is None:
+                self.start_ns = now
+            self.ticks += 1
+            if self.realtime and timeout is not None:
+                time.sleep(timeout / 1000)
+            event = sg.TIMEOUT_KEY
+        else:
+            if self.start_ns is not None and self.end_ns is None:
+                self.end_ns = now
+                self.end_memory = self.get_memory()
+            event = sg.WIN_CLOSED
+            while self.script:
+                event, changes = self.script.pop(0)
+                if self[event].visible and not self[event].disabled:
+                    self.values.update(changes)
+                    break
+                event = sg.WIN_CLOSED
+            if event == '-ACQUIRE-':
+                self.start_memory = self.get_memory()
+        self.last_event = event
+        self.last_return_ns = time.perf_counter_ns()
+        return event, dict(self.values)
+
+    def close(self):
+        pass
+
+
+def get_resident_memory():
+    """
+    Returns the resident memory of the process, read from /proc on Linux
+    :return: memory in [bytes], None where it can't be read
+    """
+    try:
+        with open('/proc/self/statm', mode='r') as file:
+            return int(file.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def raise_popup_error(message, *args, **kwargs):
+    raise RuntimeError(f"The scripted acquisition showed an error: {message}")
+
+
+def create_values(mode, slider_ms, n_samples, sample_rate):
+    """
+    Returns the values of the data acquisition window inputs for an acquisition
+    :param mode: one of acquisition_modes
+    :param slider_ms: time interval of on demand acquisitions in [ms]
+    :param n_samples: number of samples of finite sampling acquisitions
+    :param sample_rate: sample rate of finite sampling acquisitions in [Sa/s]
+    :return: dictionary with input keys and values
+    """
+    return {
+        '-MIN_TEMP_INPUT-': '',
+        '-MAX_TEMP_INPUT-': '',
+        '-ALARM_HYSTERESIS_INPUT-': '0',
+        '-ALARM_DEBOUNCE_INPUT-': '0',
+        '-ALARM_RATE_INPUT-': '',
+        '-ALARM_TIME_TO_LIMIT_INPUT-': '',
+        '-ALARM_RATE_HYSTERESIS_INPUT-': '',
+        '-ALARM_TIME_TO_LIMIT_HYSTERESIS_INPUT-': '',
+        '-ON_DEMAND-': mode == 'on demand',
+        '-FINITE_SAMPLING-': mode == 'finite sampling',
+        '-N_SAMPLES_INPUT-': str(n_samples),
+        '-SAMPLE_RATE_INPUT-': str(sample_rate),
+        '-FILTER_TYPE-': 'None',
+        '-FILTER_PARAMETER_INPUT-': '',
+        '-TRIGGER_TYPE-': 'None',
+        '-TRIGGER_DIRECTION-': 'Rising',
+        '-TRIGGER_LEVEL_INPUT-': '',
+        '-TRIGGER_HYSTERESIS_INPUT-': '0',
+        '-TRIGGER_PRE_INPUT-': '100',
+        '-TRIGGER_POST_INPUT-': '1000',
+        '-INTERLOCK_TYPE-': 'None',
+        '-INTERLOCK_VOLTAGE_INPUT-': '0.0',
+        '-INTERLOCK_LATCH-': False,
+        '-SLIDER-': float(slider_ms),
+        '-STATS_WINDOW_INPUT-': str(st.DEFAULT_WINDOW_LENGTH)
+    }
+
+
+def run_acquisition_benchmark(mode, n_ticks=DEFAULT_N_TICKS, slider_ms=gt.MIN_TIME_UPDATE_MS,
+                              sample_rate=DEFAULT_SAMPLE_RATE, alarms=DEFAULT_ALARMS, realtime=False,
+                              trace_memory=False):
+    """
+    Runs data_acquisition_window_behavior with a fake window and a simulated DAQ: sets the alarms, acquires for
+    n_ticks, or until a finite sampling acquisition ends, stops and closes the window
+    :param mode: one of acquisition_modes
+    :param n_ticks: maximum number of acquisition ticks, finite sampling acquisitions take this many samples
+    :param slider_ms: time interval of on demand acquisitions in [ms]
+    :param sample_rate: sample rate of finite sampling acquisitions in [Sa/s]
+    :param alarms: [min, max] alarm inputs
+    :param realtime: True to wait for the read timeouts like the GUI does
+    :param trace_memory: True to measure the memory allocated by Python instead of the resident memory
+    :return: dictionary with the results and the niDAQ object
+    """
+    if mode not in acquisition_modes:
+        raise ValueError(f"Acquisition mode must be one of {acquisition_modes}.\nGot {mode} instead.")
+    calibration = ct.LinearCalibration('LEAST_SQUARES')
+    calibration.set_parameters(100.0, -5.0)
+    niDAQ = dt.niDAQ(sim.SIMULATED_MODEL, False)
+    niDAQ.initiate_daq()
+    niDAQ.add_calibration_to_log(calibration)
+    niDAQ.set_calibration(repr(calibration))
+
+    script = [['-SET-', {'-MIN_TEMP_INPUT-': alarms[0], '-MAX_TEMP_INPUT-': alarms[1]}],
+              ['-ACQUIRE-', {}],
+              ['-STOP-', {}]]
+    window = FakeWindow(create_values(mode, slider_ms, n_ticks, sample_rate), script, n_ticks, realtime,
+                        trace_memory)
+    # same figure as the GUI, drawn without a display
+    fig = Figure(figsize=(gt.FIG_SIZE_WIDTH, gt.FIG_SIZE_HEIGHT))
+    fig.add_subplot(111)
+
+    if trace_memory:
+        tracemalloc.start()
+    try:
+        with mock.patch.object(guiDataAcquisition.sg, 'popup_error', raise_popup_error):
+            niDAQ.set_task_start(1)
+            niDAQ.set_task_write(dt.AO_DAQ_VAL)
+            guiDataAcquisition.data_acquisition_window_behavior(niDAQ, window, fig, AggCanvas(fig))
+            niDAQ.stop_data_acquisition()
+            niDAQ.set_task_stop(1)
+    finally:
+        if trace_memory:
+            tracemalloc.stop()
+
+    elapsed = (window.end_ns - window.start_ns) / pt.NS_PER_S
+    latency_p50, latency_p99, latency_max = window.tick_latency.get_summary()
+    memory_growth = None if window.start_memory is None else window.end_memory - window.start_memory
+    result = {
+        'mode': mode,
+        'realtime': realtime,
+        'ticks': window.ticks,
+        'samples': len(niDAQ),
+        'elapsed [s]': round(elapsed, 3),
+        'samples/s': round(len(niDAQ) / elapsed, 1),
+        'tick p50 [ms]': latency_p50,
+        'tick p99 [ms]': latency_p99,
+        'tick max [ms]': latency_max,
+        'memory growth [kB]': None if memory_growth is None else round(memory_growth / 1000, 1),
+        'memory per sample [bytes]': None if memory_growth is None else round(memory_growth / len(niDAQ), 1),
+        'alarm episodes': len(niDAQ.alarm_engine)
+    }
+    return result, niDAQ
+
+
+def format_result(result):
+    return "\n".join(f"{name + ':':<27} {value}" for name, value in result.items())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks the data acquisition window with a fake window and a "
+                                                 "simulated DAQ")
+    parser.add_argument('--mode', default=None, choices=acquisition_modes, help="runs only this acquisition mode")
+    parser.add_argument('--ticks', type=int, default=DEFAULT_N_TICKS, help="acquisition ticks of every mode")
+    parser.add_argument('--interval', type=float, default=gt.MIN_TIME_UPDATE_MS,
+                        help="time interval of on demand acquisitions in [ms]")
+    parser.add_argument('--rate', type=float, default=DEFAULT_SAMPLE_RATE,
+                        help="sample rate of finite sampling acquisitions in [Sa/s]")
+    parser.add_argument('--realtime', action='store_true',
+                        help="waits for the read timeouts like the GUI, instead of running as fast as possible")
+    parser.add_argument('--trace-memory', action='store_true',
+                        help="measures the memory allocated by Python, slower, instead of the resident memory")
+    parser.add_argument('--output', default=None, help="JSON file where the results are saved")
+    arguments = parser.parse_args()
+
+    results = []
+    for mode in acquisition_modes if arguments.mode is None else [arguments.mode]:
+        result, niDAQ = run_acquisition_benchmark(mode, arguments.ticks, arguments.interval, arguments.rate,
+                                                  realtime=arguments.realtime, trace_memory=arguments.trace_memory)
+        print(f"{mode.upper()}\n{format_result(result)}\n\n"
+              f"{pt.format_timing_report(niDAQ.pipeline.get_timing_report())}\n", flush=True)
+        results.append(result)
+    if arguments.output is not None:
+        save_results(results, arguments.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,244 @@
+import argparse
+import datetime
+import importlib
+import json
+import platform
+import statistics
+import sys
+import time
+
+import matplotlib
+import numpy as np
+
+# plots are drawn without a display
+matplotlib.use('Agg')
+
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+from pathlib import Path
+
+BENCHMARK_MODULES = ['benchmarks.hotPathBenchmarks']
+BASELINE_PATH = Path(__file__).parent / "baseline.json"
+MIN_REPEAT_TIME = 0.2  # [s] every repeat calls the function at least for this long
+MAX_TOTAL_TIME = 5.0  # [s] repeats stop once a benchmark has taken this long
+N_REPEATS = 5
+DEFAULT_TOLERANCE = 0.25  # slowdown with respect to the baseline reported as a regression
+NAME_WIDTH = 64  # characters of the benchmark names printed
+
+_benchmarks = []
+
+
+class Benchmark:
+    """
+    Benchmark of a function for several sizes. The setup function prepares the data outside the timed code and
+    returns the function that is timed.
+    """
+
+    def __init__(self, name, setup, sizes, full_sizes=()):
+        self.name = name
+        self.setup = setup
+        self.sizes = list(sizes)
+        self.full_sizes = list(full_sizes)  # sizes that take long, only run with --full
+
+    def get_sizes(self, quick=False, full=False):
+        """
+        Returns the sizes to run
+        :param quick: True to run only the smallest size
+        :param full: True to also run the sizes that take long
+        :return: list of sizes
+        """
+        sizes = self.sizes + (self.full_sizes if full else [])
+        return sizes[:1] if quick else sizes
+
+
+def benchmark(name, sizes, full_sizes=()):
+    """
+    Decorator that registers a setup function as a benchmark
+    :param name: name of the benchmark
+    :param sizes: sizes the setup function is called with, e.g. number of samples
+    :param full_sizes: sizes only run with --full
+    :return: decorator
+    """
+    def register(setup):
+        _benchmarks.append(Benchmark(name, setup, sizes, full_sizes))
+        return setup
+    return register
+
+
+class AggCanvas(FigureCanvasAgg):
+    """
+    Canvas without a window that stands for the Tk canvas of the GUI, so plotting functions run without a display
+    """
+
+    class _Widget:
+        def pack(self, *args, **kwargs):
+            pass
+
+    def get_tk_widget(self):
+        return self._Widget()
+
+
+def create_figure():
+    """
+    Creates a figure with the size and subplot of the acquisition plot
+    :return: figure and its canvas
+    """
+    fig = Figure(figsize=(6, 4))
+    fig.add_subplot(111)
+    return fig, AggCanvas(fig)
+
+
+def time_function(function):
+    """
+    Times a function: every repeat calls it as many times as fit in MIN_REPEAT_TIME, repeats stop after N_REPEATS
+    or MAX_TOTAL_TIME
+    :param function: function without arguments
+    :return: list with the time per call of every repeat in [s]
+    """
+    start = time.perf_counter()
+    function()
+    first_call = time.perf_counter() - start
+    n_calls = max(int(MIN_REPEAT_TIME / first_call), 1) if first_call > 0 else 1000
+    times = []
+    total_start = time.perf_counter()
+    while len(times) < N_REPEATS and (not times or time.perf_counter() - total_start < MAX_TOTAL_TIME):
+        start = time.perf_counter()
+        for _ in range(n_calls):
+            function()
+        times.append((time.perf_counter() - start) / n_calls)
+    return times
+
+
+def run_benchmarks(name_filter=None, quick=False, full=False):
+    """
+    Runs every registered benchmark
+    :param name_filter: only benchmarks whose name contains this text are run, None to run them all
+    :param quick: True to run only the smallest size of every benchmark
+    :param full: True to also run the sizes that take long
+    :return: list of result dictionaries
+    """
+    for module in BENCHMARK_MODULES:
+        importlib.import_module(module)
+    results = []
+    for case in _benchmarks:
+        if name_filter is not None and name_filter not in case.name:
+            continue
+        for size in case.get_sizes(quick, full):
+            times = time_function(case.setup(size))
+            result = {
+                'name': case.name,
+                'size': size,
+                'repeats': len(times),
+                'best [s]': min(times),
+                'median [s]': statistics.median(times),
+                'per item [s]': statistics.median(times) / size
+            }
+            print(f"{get_key(result):<{NAME_WIDTH}} {format_time(result['median [s]']):>10} "
+                  f"({format_time(result['per item [s]'])} per item)", flush=True)
+            results.append(result)
+    return results
+
+
+def get_key(result):
+    return f"{result['name']}[{result['size']}]"
+
+
+def format_time(seconds):
+    """
+    Formats a time with the most readable unit
+    :param seconds: time in [s]
+    :return: string
+    """
+    for unit, factor in [('s', 1), ('ms', 1e-3), ('µs', 1e-6)]:
+        if seconds >= factor:
+            return f"{seconds / factor:.3f} {unit}"
+    return f"{seconds / 1e-9:.1f} ns"
+
+
+def get_environment():
+    """
+    Returns the versions and machine the benchmarks ran on, results of different machines can't be compared
+    :return: dictionary
+    """
+    return {
+        'date': datetime.datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'processor': platform.processor() or platform.machine()
+    }
+
+
+def save_results(results, file_name):
+    """
+    Saves results to a JSON file
+    :param results: list made by run_benchmarks
+    :param file_name: path to the JSON file
+    :return:
+    """
+    with open(file_name, mode='w') as file:
+        json.dump({'environment': get_environment(), 'results': results}, file, indent=2)
+
+
+def load_results(file_name):
+    with open(file_name, mode='r') as file:
+        return json.load(file)
+
+
+def compare_results(results, baseline, tolerance=DEFAULT_TOLERANCE):
+    """
+    Compares the median time of every result with the same benchmark and size in the baseline
+    :param results: list made by run_benchmarks
+    :param baseline: dictionary loaded from a results file
+    :param tolerance: relative slowdown reported as a regression, e.g. 0.25 for 25 % slower
+    :return: list of [key, baseline median, median, ratio, is regression], only for results in the baseline
+    """
+    baseline_medians = {get_key(result): result['median [s]'] for result in baseline['results']}
+    comparison = []
+    for result in results:
+        key = get_key(result)
+        if key in baseline_medians:
+            ratio = result['median [s]'] / baseline_medians[key]
+            comparison.append([key, baseline_medians[key], result['median [s]'], ratio, ratio > 1 + tolerance])
+    return comparison
+
+
+def format_comparison(comparison):
+    """
+    Formats a comparison as a text table
+    :param comparison: rows made by compare_results
+    :return: string with the table
+    """
+    lines = [f"{'Benchmark':<{NAME_WIDTH}} {'Baseline':>10} {'Now':>10} {'Ratio':>7}"]
+    for key, baseline_median, median, ratio, is_regression in comparison:
+        lines.append(f"{key:<{NAME_WIDTH}} {format_time(baseline_median):>10} {format_time(median):>10} {ratio:>7.2f}"
+                     f"{'  REGRESSION' if is_regression else ''}")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks the calibration and acquisition hot paths")
+    parser.add_argument('--filter', default=None, help="only runs benchmarks whose name contains this text")
+    parser.add_argument('--quick', action='store_true', help="only runs the smallest size of every benchmark")
+    parser.add_argument('--full', action='store_true', help="also runs the largest sizes, which take minutes")
+    parser.add_argument('--output', default=None, help="JSON file where the results are saved")
+    parser.add_argument('--baseline', default=str(BASELINE_PATH), help="JSON results the run is compared with")
+    parser.add_argument('--save-baseline', action='store_true', help="saves the results as the new baseline")
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help="slowdown reported as a regression, 0.25 is 25 %% slower")
+    arguments = parser.parse_args()
+
+    results = run_benchmarks(arguments.filter, arguments.quick, arguments.full)
+    if arguments.output is not None:
+        save_results(results, arguments.output)
+    if arguments.save_baseline:
+        save_results(results, arguments.baseline)
+        print(f"\nBaseline saved to {arguments.baseline}")
+    elif Path(arguments.baseline).exists():
+        comparison = compare_results(results, load_results(arguments.baseline), arguments.tolerance)
+        print(f"\n{format_comparison(comparison)}")
+        # a failing exit code lets continuous integration catch regressions
+        if any(row[-1] for row in comparison):
+            sys.exit(1)
+    else:
+        print(f"\nNo baseline at {arguments.baseline}, save one with --save-baseline")
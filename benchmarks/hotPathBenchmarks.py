@@ -0,0 +1,190 @@
+import atexit
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import src.alarmTools as at
+import src.calibrationTools as ct
+import src.daqTools as dt
+import src.guiTools as gt
+import src.simulationTools as sim
+
+from benchmarks.benchmarkTools import benchmark, create_figure
+
+SEED = 0
+NON_LINEAR_PARAMETERS = (2.0, 100.0, -5.0)  # a, b, c of the non-linear calibration benchmarked
+
+
+def create_calibration_points(n_points, non_linear=False):
+    """
+    Creates calibration points on a known expression with some noise
+    :param n_points: number of points
+    :param non_linear: True for points on the non-linear expression, False for a line
+    :return: list of pairs [voltage, temperature]
+    """
+    rng = np.random.default_rng(SEED)
+    voltages = np.round(np.linspace(0.5, 2.5, n_points) + rng.normal(0, 0.001, n_points), 3)
+    if non_linear:
+        temperatures = ct.non_linear_func(voltages, *NON_LINEAR_PARAMETERS)
+    else:
+        temperatures = ct.linear_func(voltages, 100.0, -5.0)
+    temperatures = np.round(temperatures + rng.normal(0, 0.05, n_points), 3)
+    return [[voltage, temperature] for voltage, temperature in zip(voltages.tolist(), temperatures.tolist())]
+
+
+def create_linear_calibration():
+    calibration = ct.LinearCalibration('LEAST_SQUARES')
+    calibration.set_parameters(100.0, -5.0)
+    return calibration
+
+
+def create_daq(n_samples):
+    """
+    Creates a simulated DAQ holding a run of n_samples, without starting its tasks
+    :param n_samples: number of samples
+    :return: niDAQ object
+    """
+    niDAQ = dt.niDAQ(sim.SIMULATED_MODEL, False)
+    niDAQ.set_calibration(repr(create_linear_calibration()))
+    niDAQ.set_time_log()
+    rng = np.random.default_rng(SEED)
+    voltages = np.round(1 + 0.2 * np.sin(np.arange(n_samples) / 1000) + rng.normal(0, 0.002, n_samples), 3)
+    times = np.arange(n_samples, dtype=np.int64) * 1000000  # 1000 Sa/s
+    niDAQ.add_block(times, voltages, create_linear_calibration().calculate_temperature_array(voltages))
+    return niDAQ
+
+
+@benchmark('LinearCalibration.calculate_expression', [10, 100, 1000])
+def linear_fit(n_points):
+    calibration = ct.LinearCalibration('LEAST_SQUARES')
+    calibration.set_data_list(create_calibration_points(n_points))
+    return calibration.calculate_expression
+
+
+@benchmark('NonLinearCalibration.calculate_expression', [10, 100, 1000])
+def non_linear_fit(n_points):
+    calibration = ct.NonLinearCalibration()
+    calibration.set_data_list(create_calibration_points(n_points, non_linear=True))
+    return calibration.calculate_expression
+
+
+@benchmark('LinearCalibration.calculate_temperature per sample', [1000, 100000])
+def temperature_per_sample(n_samples):
+    calibration = create_linear_calibration()
+    voltages = [1.0 + i / n_samples for i in range(n_samples)]
+    return lambda: [calibration.calculate_temperature(voltage) for voltage in voltages]
+
+
+@benchmark('LinearCalibration.calculate_temperature_array per block', [1000, 100000])
+def temperature_per_block(n_samples):
+    calibration = create_linear_calibration()
+    voltages = np.linspace(1.0, 2.0, n_samples)
+    return lambda: calibration.calculate_temperature_array(voltages)
+
+
+@benchmark('Calibration.update_data', [10, 100, 1000])
+def update_data(n_points):
+    calibration = create_linear_calibration()
+    calibration.set_data_list(create_calibration_points(n_points))
+    return calibration.update_data
+
+
+@benchmark('gt.get_sorted_nth_elements', [100, 10000, 1000000])
+def sorted_nth_elements(n_points):
+    data = create_calibration_points(n_points)
+    np.random.default_rng(SEED).shuffle(data)
+    return lambda: gt.get_sorted_nth_elements(data, 0)
+
+
+def create_alarm_engine(calibration=None):
+    engine = at.AlarmEngine()
+    engine.set_calibration(calibration)
+    engine.set_limit('Below Minimum', 90.0)
+    engine.set_limit('Above Maximum', 110.0)
+    return engine
+
+
+@benchmark('AlarmEngine.update calibrating temperatures', [1000, 100000])
+def alarms_on_temperatures(n_samples):
+    calibration = create_linear_calibration()
+    engine = create_alarm_engine()
+    times = np.arange(n_samples, dtype=np.int64) * 1000000
+    # within the limits, like most of a run
+    voltages = np.round(1 + 0.05 * np.sin(np.arange(n_samples) / 100), 3)
+    return lambda: engine.update(times, temperatures=calibration.calculate_temperature_array(voltages))
+
+
+@benchmark('AlarmEngine.update on voltages', [1000, 100000])
+def alarms_on_voltages(n_samples):
+    engine = create_alarm_engine(create_linear_calibration())
+    times = np.arange(n_samples, dtype=np.int64) * 1000000
+    # within the limits, like most of a run
+    voltages = np.round(1 + 0.05 * np.sin(np.arange(n_samples) / 100), 3)
+    return lambda: engine.update(times, voltages)
+
+
+@benchmark('AlarmEngine.update_trend', [100, 100000])
+def trend_alarms(n_samples):
+    engine = create_alarm_engine()
+    engine.set_limit('Rate of Change', 5.0)
+    engine.set_limit('Time to Limit', 30.0)
+    times = np.arange(n_samples, dtype=np.int64) * 1000000
+    temperatures = 100 + 5 * np.sin(np.arange(n_samples) / 100)
+    block_duration = n_samples * 1000000
+    offset = [0]
+
+    def update_trend():
+        # every block follows the previous one, as in an acquisition
+        offset[0] += block_duration
+        engine.update_trend(times + offset[0], temperatures)
+    return update_trend
+
+
+@benchmark('niDAQ.add_data', [1000, 100000])
+def add_data(n_samples):
+    pairs = [[1.0, 95.0]] * n_samples
+
+    def add_samples():
+        niDAQ = dt.niDAQ(sim.SIMULATED_MODEL, False)
+        for pair in pairs:
+            niDAQ.add_data(pair)
+    return add_samples
+
+
+@benchmark('niDAQ.add_time', [1000, 100000])
+def add_time(n_samples):
+    def add_times():
+        niDAQ = dt.niDAQ(sim.SIMULATED_MODEL, False)
+        for _ in range(n_samples):
+            niDAQ.add_time()
+    return add_times
+
+
+@benchmark('niDAQ.add_block', [1000, 100000])
+def add_block(n_samples):
+    times = np.arange(n_samples, dtype=np.int64)
+    voltages = np.ones(n_samples)
+
+    def add_samples():
+        niDAQ = dt.niDAQ(sim.SIMULATED_MODEL, False)
+        # 100 samples per block, as read from a buffered acquisition
+        for start in range(0, n_samples, 100):
+            niDAQ.add_block(times[start:start + 100], voltages[start:start + 100], voltages[start:start + 100])
+    return add_samples
+
+
+@benchmark('niDAQ.save_data_acquisition', [10000, 100000, 1000000], full_sizes=[10000000])
+def save_data_acquisition(n_samples):
+    niDAQ = create_daq(n_samples)
+    directory = tempfile.mkdtemp()
+    atexit.register(shutil.rmtree, directory, True)
+    return lambda: niDAQ.save_data_acquisition(os.path.join(directory, "run.csv"))
+
+
+@benchmark('niDAQ.update_figure', [1000, 100000, 1000000])
+def update_figure(n_samples):
+    niDAQ = create_daq(n_samples)
+    niDAQ.set_alarm_max(110.0)
+    fig, canvas = create_figure()
+    return lambda: niDAQ.update_figure(fig, canvas)
@@ -1,9 +1,18 @@
+import argparse
+import functools
 import sys
 import os
 
 import src.app.appDAQ as daq
 import src.app.appCalibrationMethod as calibration_method
 import src.app.appDataAcquisition as data_acquisition
+import src.calibrationTools as ct
+import src.pipelineTools as pipeline
+import src.processTools as process
+import src.profilingTools as profiling
+import src.sharedMemoryTools as shared_memory
+import src.storageTools as storage
+import src.streamTools as stream
 
 # Gets the path of the current script
 current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -13,18 +22,79 @@ parent_dir = os.path.dirname(current_dir)
 sys.path.append(parent_dir)
 
 
+def parse_arguments():
+    """
+    Parses command line arguments
+    :return: namespace with the arguments
+    """
+    parser = argparse.ArgumentParser(description="PyroDAQ temperature data acquisition")
+    parser.add_argument('--sensor-id', default=ct.DEFAULT_SENSOR_ID,
+                        help="id of the sensor, calibrations are saved and loaded under it")
+    parser.add_argument('--library', default=storage.CALIBRATION_LIBRARY_PATH,
+                        help="path to the calibration library")
+    parser.add_argument('--load-calibration', action='store_true',
+                        help="loads the last calibration of the sensor and skips the calibration windows")
+    parser.add_argument('--publish-port', type=int, default=None,
+                        help="streams acquired data to local subscribers on this TCP port")
+    parser.add_argument('--shared-memory', default=None, metavar='NAME',
+                        help="writes acquired data to a shared memory ring with this name")
+    parser.add_argument('--sink-policy', default=None, choices=pipeline.backpressure_policies,
+                        help="serves the data stream and shared memory from their own threads with this policy "
+                             "when they can't keep up")
+    parser.add_argument('--deadband', type=float, default=None,
+                        help="stores a sample only when the temperature changes more than this [ºC]")
+    parser.add_argument('--max-interval', type=float, default=None,
+                        help="with a deadband, stores a sample at least every this [ms]")
+    parser.add_argument('--acquisition-process', action='store_true',
+                        help="acquires in a separate process, so the GUI can't delay sampling")
+    parser.add_argument('--profile', action='store_true',
+                        help="times reads, calibrations, plots and saves, and prints a report at exit "
+                             f"(also enabled with {profiling.PROFILE_ENVIRONMENT_VARIABLE}=1)")
+    parser.add_argument('--cprofile', default=None, metavar='FILE',
+                        help="profiles the whole run with cProfile and saves the stats to this file "
+                             f"(also enabled with {profiling.CPROFILE_ENVIRONMENT_VARIABLE}=FILE)")
+    return parser.parse_args()
+
+
 def main():
+    arguments = parse_arguments()
+    profiling.configure(arguments.profile, arguments.cprofile)
 
     # --- DAQ SELECTION ---
-    niDAQ = daq.run_select_daq()
+    if arguments.acquisition_process:
+        # the acquisition process owns the DAQ and serves the data stream and shared memory itself
+        niDAQ = daq.run_select_daq(functools.partial(process.RemoteDAQ, publish_port=arguments.publish_port,
+                                                     shared_memory_name=arguments.shared_memory))
+    else:
+        niDAQ = daq.run_select_daq()
+    niDAQ.set_calibration_library(storage.CalibrationLibrary(arguments.library), arguments.sensor_id)
+    # --- CALIBRATION LIBRARY ---
+    skip_calibration = niDAQ.load_calibrations_from_library() and arguments.load_calibration
+    # --- DATA STREAM ---
+    niDAQ.set_sink_policy(arguments.sink_policy)
+    niDAQ.set_deadband(arguments.deadband, arguments.max_interval)
+    is_local = not arguments.acquisition_process and not niDAQ.is_exit_requested()
+    if arguments.publish_port is not None and is_local:
+        niDAQ.set_publisher(stream.DataPublisher(port=arguments.publish_port))
+        niDAQ.publisher.start()
+    if arguments.shared_memory is not None and is_local:
+        niDAQ.set_shared_ring(shared_memory.SharedRingWriter(arguments.shared_memory))
     while not niDAQ.is_exit_requested():
         # --- CALIBRATION ---
-        calibration_method.run_calibrate(niDAQ)
+        if not skip_calibration:
+            calibration_method.run_calibrate(niDAQ)
+        skip_calibration = False
         if niDAQ.is_exit_requested():
             niDAQ.exit()
             continue
         # --- ACQUIRE DATA ---
         data_acquisition.run_data_acquisition(niDAQ)
+    if niDAQ.publisher is not None:
+        niDAQ.publisher.stop()
+    if niDAQ.shared_ring is not None:
+        niDAQ.shared_ring.close()
+    if arguments.acquisition_process:
+        niDAQ.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,450 @@
+import numpy as np
+import src.statisticsTools as st
+
+# Alarm type list, ordered as niDAQ.alarm_states
+alarm_types = ['Below Minimum', 'Above Maximum', 'Rate of Change', 'Time to Limit']
+threshold_alarm_types = alarm_types[:2]  # on the temperature
+trend_alarm_types = alarm_types[2:]  # on the trend of the temperature: its rate and the time it takes to reach a limit
+# alarms raised below their limit, evaluated as maximum alarms on the negated signal
+minimum_alarm_types = ['Below Minimum', 'Time to Limit']
+
+# unit of the limit and peak of every alarm type
+alarm_units = {
+    'Below Minimum': 'ºC',
+    'Above Maximum': 'ºC',
+    'Rate of Change': 'ºC/s',
+    'Time to Limit': 's'
+}
+
+alarm_log_fieldnames = ['Alarm Type', 'Start [ns]', 'End [ns]', 'Peak', 'Unit']
+
+TEMPERATURE_RESOLUTION = 0.001  # [ºC] temperatures are rounded to by the calibrations
+DEFAULT_TREND_HYSTERESIS = 0.25  # fraction of their limit trend alarms clear within when no hysteresis is set
+
+
+class ThresholdAlarm:
+    """
+    Alarm on a temperature limit with hysteresis and debounce. It's raised once the temperature has been beyond the
+    limit for at least the debounce time, and it's cleared when the temperature gets back within the limit by more
+    than the hysteresis, so noise around the limit can't raise and clear it again and again. Every excursion that
+    raises the alarm is logged once, as an episode with its start, end and peak temperature. Trend alarms are
+    evaluated the same way on the rate of change or on the time to reach a limit instead of the temperature.
+
+    With a calibration, the limits are inverted to voltages once, for every range where the calibration is
+    monotonic, so blocks whose voltages are all within one of them are checked without calculating their
+    temperature. Blocks are evaluated with array operations; whether the alarm is raised and the excursion in
+    progress are kept between blocks.
+    """
+
+    def __init__(self, alarm_type, limit, hysteresis=0.0, debounce=0, calibration=None):
+        """
+        :param alarm_type: one of alarm_types
+        :param limit: limit in the unit of the alarm type, see alarm_units
+        :param hysteresis: how much, in the unit of the alarm type, the signal has to get back within the limit to
+        clear the alarm
+        :param debounce: time in [ns] the temperature has to stay beyond the limit to raise the alarm
+        :param calibration: calibration object the voltages are converted with, None to only check temperatures
+        """
+        if alarm_type not in alarm_types:
+            raise ValueError(f"No matching alarm found.\nExpected: {alarm_types}\nGot: {alarm_type}.")
+        if hysteresis < 0 or debounce < 0:
+            raise ValueError(f"Hysteresis and debounce can't be negative.\nGot {hysteresis} and {debounce} instead.")
+        self.alarm_type = alarm_type
+        self.limit = limit
+        self.hysteresis = hysteresis
+        self.debounce = debounce
+        # minimum alarms are evaluated as maximum alarms on the negated signal
+        self.sign = -1 if alarm_type in minimum_alarm_types else 1
+        self.calibration = None
+        self.branches = []  # voltage levels of the limits in every monotonic range of the calibration
+        self.is_raised = False
+        self.raised_time = None  # [ns] of the sample that last raised the alarm
+        self.excursion_start = None  # [ns] since the temperature went beyond the limit, None while it's within
+        self.excursion_peak = None  # most extreme temperature of the excursion
+        self.episode = None  # log entry of the episode in progress
+        self.set_calibration(calibration)
+
+    def __repr__(self):
+        unit = alarm_units[self.alarm_type]
+        return f"{self.alarm_type} {self.limit} {unit} (hysteresis {self.hysteresis} {unit}, " \
+               f"debounce {self.debounce} ns)"
+
+    def set_calibration(self, calibration):
+        """
+        Sets the calibration voltages are converted with and inverts the limits in its monotonic ranges
+        :param calibration: calibration object, None to only check temperatures
+        :return:
+        """
+        self.calibration = calibration
+        self.branches = [] if calibration is None else [self.invert_limits(voltage_range)
+                                                        for voltage_range in calibration.get_monotonic_ranges()]
+
+    def invert_limits(self, voltage_range):
+        """
+        Finds the voltages where the temperature, once rounded, goes beyond the limit and where it clears the alarm,
+        within a range where the calibration is monotonic
+        :param voltage_range: [low, high, direction] made by Calibration.get_monotonic_ranges
+        :return: dictionary with the range, the direction the voltage is multiplied by so that the alarm rises with
+        it, and the 'beyond' and 'clear' levels of the voltage multiplied by the direction
+        """
+        low, high, direction = voltage_range
+        direction *= self.sign
+        # temperatures are rounded to the resolution, these are the unrounded temperatures where they change
+        half = TEMPERATURE_RESOLUTION / 2
+        levels = []
+        for boundary in [self.limit + self.sign * half, self.limit - self.sign * (self.hysteresis - half)]:
+            voltage = self.calibration.calculate_voltage(boundary, voltage_range)
+            if voltage is None:
+                # the temperature is on the same side of the boundary in the whole range
+                probe = get_probe_voltage(low, high)
+                temperature = float(self.calibration.calculate_temperature_array([probe])[0])
+                levels.append(-np.inf if self.sign * temperature > self.sign * boundary else np.inf)
+            else:
+                levels.append(direction * voltage)
+        return {'range': [low, high], 'direction': direction, 'beyond': levels[0], 'clear': levels[1]}
+
+    def find_branch(self, low, high):
+        """
+        Looks for a monotonic range of the calibration holding every voltage of a block
+        :param low: lowest voltage of the block
+        :param high: highest voltage of the block
+        :return: branch made by invert_limits, None if there isn't one and temperatures have to be checked
+        """
+        for branch in self.branches:
+            if branch['range'][0] <= low and high <= branch['range'][1]:
+                return branch
+        return None
+
+    def to_temperatures(self, values, branch):
+        """
+        Converts values of the signal the alarm is evaluated on back to temperatures
+        :param values: list of temperatures, negated for minimum alarms, or of voltages multiplied by the branch
+        direction
+        :param branch: branch the values were evaluated with, None for temperatures
+        :return: list of temperatures in [ºC]
+        """
+        if not values:
+            return []
+        if branch is None:
+            return (self.sign * np.array(values)).tolist()
+        return self.calibration.calculate_temperature_array(branch['direction'] * np.array(values)).tolist()
+
+    def update(self, times, values, branch=None):
+        """
+        Evaluates a block
+        :param times: array with the time of every sample in [ns]
+        :param values: array of temperatures, or of voltages if a branch is given
+        :param branch: branch made by invert_limits whose range holds every voltage, None to check temperatures
+        :return: list with the log entries of the episodes that started in this block, entries of episodes in
+        progress get their end when the alarm is cleared
+        """
+        times = np.asarray(times, dtype=np.int64)
+        if branch is None:
+            signal = self.sign * np.asarray(values, dtype=float)
+            beyond_level, clear_level = self.sign * self.limit, self.sign * self.limit - self.hysteresis
+        else:
+            signal = branch['direction'] * np.asarray(values, dtype=float)
+            # voltages clear the alarm strictly below their level
+            beyond_level, clear_level = branch['beyond'], np.nextafter(branch['clear'], -np.inf)
+
+        # most blocks don't change anything: no sample goes beyond the limit while the alarm is cleared, or no
+        # sample clears it while it's raised. The excursion in progress only matters until the alarm is raised.
+        if not self.is_raised and self.excursion_start is None:
+            is_beyond = signal > beyond_level
+            if not is_beyond.any():
+                return []
+        elif self.is_raised:
+            is_clearing = signal <= clear_level
+            if not is_clearing.any():
+                self._add_to_peak(self.episode, self.to_temperatures([signal.max()], branch)[0])
+                self.excursion_start, self.excursion_peak = None, None
+                return []
+        is_beyond = signal > beyond_level
+        is_clearing = signal <= clear_level
+        indexes = np.arange(len(signal))
+
+        # index where the excursion of every sample beyond the limit started, -1 if it started in a previous block
+        was_beyond = np.concatenate(([self.excursion_start is not None], is_beyond[:-1]))
+        excursion_index = np.maximum.accumulate(np.where(is_beyond & ~was_beyond, indexes, -1))
+        excursion_start = np.where(excursion_index >= 0, times[np.maximum(excursion_index, 0)],
+                                   self.excursion_start if self.excursion_start is not None else 0)
+        is_raising = is_beyond & (times - excursion_start >= self.debounce)
+
+        # the alarm keeps the state of the last sample that raised or cleared it
+        changes = np.where(is_raising, 1, np.where(is_clearing, -1, 0))
+        last_change = np.maximum.accumulate(np.where(changes != 0, indexes, -1))
+        is_raised = np.where(last_change >= 0, changes[np.maximum(last_change, 0)] > 0, self.is_raised)
+
+        was_raised = np.concatenate(([self.is_raised], is_raised[:-1]))
+        new_episodes = []
+        # peaks of the signal of every episode, converted to temperatures all at once at the end of the block
+        peaks = []
+        start = 0
+        for index in np.flatnonzero(is_raised != was_raised).tolist():
+            if is_raised[index]:
+                # the episode starts when the excursion started, before the debounce time
+                start = max(int(excursion_index[index]), 0)
+                self.episode = {'Alarm Type': self.alarm_type, 'Start [ns]': int(excursion_start[index]),
+                                'End [ns]': None, 'Peak': None, 'Unit': alarm_units[self.alarm_type]}
+                new_episodes.append(self.episode)
+                self.raised_time = int(times[index])
+                if excursion_index[index] < 0:
+                    self._add_to_peak(self.episode, self.excursion_peak)
+            else:
+                if index > start:
+                    peaks.append([self.episode, signal[start:index].max()])
+                self.episode['End [ns]'] = int(times[index])
+                self.episode = None
+        if self.episode is not None:
+            peaks.append([self.episode, signal[start:].max()])
+        # the excursion in progress carries on in the next block
+        if is_beyond[-1]:
+            peaks.append([None, signal[max(int(excursion_index[-1]), 0):].max()])
+
+        excursion_peak = None
+        for (episode, _), temperature in zip(peaks, self.to_temperatures([peak for _, peak in peaks], branch)):
+            if episode is None:
+                excursion_peak = temperature
+            else:
+                self._add_to_peak(episode, temperature)
+        if is_beyond[-1]:
+            if excursion_index[-1] < 0 and self.excursion_peak is not None:
+                excursion_peak = self.get_most_extreme(excursion_peak, self.excursion_peak)
+            self.excursion_start, self.excursion_peak = int(excursion_start[-1]), excursion_peak
+        else:
+            self.excursion_start, self.excursion_peak = None, None
+        self.is_raised = bool(is_raised[-1])
+        return new_episodes
+
+    def get_most_extreme(self, temperature, other):
+        return temperature if self.sign * temperature > self.sign * other else other
+
+    def _add_to_peak(self, episode, temperature):
+        """
+        Private method that updates the peak of an episode
+        :param episode: log entry of the episode
+        :param temperature: temperature in [ºC], None to leave the peak as it is
+        :return:
+        """
+        if temperature is None:
+            return
+        peak = episode['Peak']
+        episode['Peak'] = temperature if peak is None else self.get_most_extreme(temperature, peak)
+
+    def close(self, time_ns):
+        """
+        Ends the episode in progress, e.g. when the limit changes
+        :param time_ns: time the episode ends in [ns]
+        :return:
+        """
+        if self.episode is not None:
+            self.episode['End [ns]'] = time_ns
+        self.reset()
+
+    def reset(self):
+        self.is_raised = False
+        self.raised_time = None
+        self.excursion_start = None
+        self.excursion_peak = None
+        self.episode = None
+
+
+def get_probe_voltage(low, high):
+    """
+    Returns a voltage within a range, which can be unbounded
+    :param low: lower bound, can be -inf
+    :param high: upper bound, can be inf
+    :return: voltage
+    """
+    if np.isfinite(low) and np.isfinite(high):
+        return (low + high) / 2
+    if np.isfinite(low):
+        return low + 1
+    if np.isfinite(high):
+        return high - 1
+    return 0.0
+
+
+class AlarmEngine:
+    """
+    Threshold and trend alarms of an acquisition, evaluated on every block, and the log of their episodes. The log
+    has one entry per excursion instead of one per sample, so it stays small however long a signal is beyond a limit.
+    With the calibration of the acquisition, blocks of voltages are checked against the thresholds before their
+    temperature is calculated. Trend alarms are checked once the temperature is known, on the slope of a line fitted
+    to the latest samples, which anticipates a limit before it's crossed.
+    """
+
+    def __init__(self, trend_window=st.DEFAULT_WINDOW_LENGTH):
+        self.alarms = [None] * len(alarm_types)
+        self.calibration = None
+        self.hysteresis = 0.0
+        self.debounce = 0
+        self.trend_hysteresis = [None] * len(trend_alarm_types)  # in the unit of every trend alarm
+        self.trend = st.WindowTrend(trend_window)
+        self.log = []
+        self.last_time = None
+
+    def __len__(self):
+        return len(self.log)
+
+    def set_limit(self, alarm_type, limit):
+        """
+        Sets the limit of an alarm, ending its episode in progress. Trend alarms take their own hysteresis, in their
+        unit, since the fitted rate still hovers around a limit with the noise of the samples.
+        :param alarm_type: one of alarm_types
+        :param limit: limit in the unit of the alarm type, see alarm_units, None to disable the alarm. Time to limit
+        alarms are raised when the trend reaches a threshold limit within this time
+        :return:
+        """
+        index = alarm_types.index(alarm_type)
+        if self.alarms[index] is not None:
+            self.alarms[index].close(self.last_time)
+        if limit is None:
+            self.alarms[index] = None
+        elif alarm_type in threshold_alarm_types:
+            self.alarms[index] = ThresholdAlarm(alarm_type, limit, self.hysteresis, self.debounce, self.calibration)
+        else:
+            hysteresis = self.trend_hysteresis[trend_alarm_types.index(alarm_type)]
+            if hysteresis is None:
+                hysteresis = DEFAULT_TREND_HYSTERESIS * abs(limit)
+            self.alarms[index] = ThresholdAlarm(alarm_type, limit, hysteresis, self.debounce)
+
+    def set_calibration(self, calibration):
+        """
+        Sets the calibration voltages are converted with, the limits are inverted with it
+        :param calibration: calibration object, None to only check temperatures
+        :return:
+        """
+        self.calibration = calibration
+        for alarm in self.alarms[:len(threshold_alarm_types)]:
+            if alarm is not None:
+                alarm.set_calibration(calibration)
+
+    def set_hysteresis(self, hysteresis, debounce=0):
+        """
+        Sets the hysteresis of the threshold alarms and the debounce of every alarm, ending their episodes in progress
+        :param hysteresis: temperature in [ºC] the temperature has to get back within the limit to clear an alarm
+        :param debounce: time in [ns] the signal has to stay beyond the limit to raise an alarm
+        :return:
+        """
+        if hysteresis < 0 or debounce < 0:
+            raise ValueError(f"Hysteresis and debounce can't be negative.\nGot {hysteresis} and {debounce} instead.")
+        self.hysteresis = hysteresis
+        self.debounce = debounce
+        for alarm_type, alarm in zip(alarm_types, self.alarms):
+            if alarm is not None:
+                self.set_limit(alarm_type, alarm.limit)
+
+    def set_trend_hysteresis(self, rate_hysteresis=None, time_to_limit_hysteresis=None):
+        """
+        Sets the hysteresis of the trend alarms, ending their episodes in progress
+        :param rate_hysteresis: rate in [ºC/s] the rate has to get back within its limit to clear the alarm, None for
+        DEFAULT_TREND_HYSTERESIS of the limit
+        :param time_to_limit_hysteresis: time in [s] the time to limit has to get back above its limit to clear the
+        alarm, None for DEFAULT_TREND_HYSTERESIS of the limit
+        :return:
+        """
+        if any(hysteresis is not None and hysteresis < 0 for hysteresis in [rate_hysteresis, time_to_limit_hysteresis]):
+            raise ValueError(f"Hysteresis can't be negative.\nGot {rate_hysteresis} and {time_to_limit_hysteresis} "
+                             f"instead.")
+        self.trend_hysteresis = [rate_hysteresis, time_to_limit_hysteresis]
+        for alarm_type, alarm in zip(trend_alarm_types, self.alarms[len(threshold_alarm_types):]):
+            if alarm is not None:
+                self.set_limit(alarm_type, alarm.limit)
+
+    def set_trend_window(self, length):
+        """
+        Sets the number of samples the trend is fitted to, the fit starts again
+        :param length: number of samples, at least 2
+        :return:
+        """
+        self.trend.set_length(length)
+
+    def update(self, times, voltages=None, temperatures=None):
+        """
+        Evaluates a block with the threshold alarms, logging the episodes that start. Alarms check the voltages while
+        they're within a monotonic range of the calibration, and the temperatures otherwise, which are calculated if
+        they aren't given.
+        :param times: array with the time of every sample in [ns]
+        :param voltages: array of voltages, rounded like the calibration stage does, None to check temperatures
+        :param temperatures: array of temperatures, None if they haven't been calculated
+        :return: temperatures, None if they weren't given nor needed
+        """
+        if len(times) == 0:
+            return temperatures
+        if voltages is not None and self.calibration is not None:
+            low, high = float(np.min(voltages)), float(np.max(voltages))
+        for alarm in self.alarms[:len(threshold_alarm_types)]:
+            if alarm is None:
+                continue
+            branch = None if voltages is None or self.calibration is None else alarm.find_branch(low, high)
+            if branch is not None:
+                self.log.extend(alarm.update(times, voltages, branch))
+                continue
+            if temperatures is None:
+                temperatures = self.calibration.calculate_temperature_array(voltages)
+            self.log.extend(alarm.update(times, temperatures))
+        self.last_time = int(times[-1])
+        return temperatures
+
+    def update_trend(self, times, temperatures):
+        """
+        Fits the trend of a block and evaluates it with the trend alarms, logging the episodes that start
+        :param times: array with the time of every sample in [ns]
+        :param temperatures: array of temperatures
+        :return: array with the rate of change of every sample in [ºC/s], nan until the fit window is full
+        """
+        rates, levels = self.trend.update(times, temperatures)
+        if len(times) == 0:
+            return rates
+        rate_alarm, time_to_limit_alarm = self.alarms[len(threshold_alarm_types):]
+        if rate_alarm is not None:
+            self.log.extend(rate_alarm.update(times, np.abs(rates)))
+        if time_to_limit_alarm is not None:
+            self.log.extend(time_to_limit_alarm.update(times, self.get_time_to_limit(rates, levels)))
+        self.last_time = int(times[-1])
+        return rates
+
+    def get_time_to_limit(self, rates, levels):
+        """
+        Predicts how long the temperature will take to reach the nearest threshold limit if it keeps its trend
+        :param rates: array of rates of change in [ºC/s]
+        :param levels: array with the temperature of the fitted line at every sample in [ºC]
+        :return: array of times in [s], 0 once the temperature is beyond a limit, inf if it's moving away from both
+        or they aren't set, nan where there's no trend yet
+        """
+        time_to_limit = np.full(len(rates), np.inf)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            for sign, alarm in zip([-1, 1], self.alarms[:len(threshold_alarm_types)]):
+                if alarm is None:
+                    continue
+                time = np.where(sign * rates > 0, (alarm.limit - levels) / rates, np.inf)
+                time_to_limit = np.minimum(time_to_limit, np.where(sign * (levels - alarm.limit) >= 0, 0.0, time))
+        time_to_limit[np.isnan(rates)] = np.nan
+        return time_to_limit
+
+    def get_states(self):
+        """
+        Returns whether every alarm is raised
+        :return: list ordered as alarm_types, False for alarms that aren't set
+        """
+        return [alarm is not None and alarm.is_raised for alarm in self.alarms]
+
+    def get_raised_times(self):
+        """
+        Returns the time of the sample that last raised every alarm
+        :return: list ordered as alarm_types, None for alarms that aren't set or haven't been raised
+        """
+        return [None if alarm is None else alarm.raised_time for alarm in self.alarms]
+
+    def clear(self):
+        """
+        Clears the log, the alarm states and the trend, keeping the limits
+        :return:
+        """
+        for alarm in self.alarms:
+            if alarm is not None:
+                alarm.reset()
+        self.trend.clear()
+        self.log.clear()
+        self.last_time = None
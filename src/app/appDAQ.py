@@ -2,9 +2,10 @@ import src.daqTools as dt
 import src.gui.guiDAQ as guiDAQ
 
 
-def run_select_daq():
+def run_select_daq(create_daq=dt.niDAQ):
     """
     Runs daq selection
+    :param create_daq: function(model, exit_requested) that creates the DAQ object, e.g. a DAQ in another process
     :return:
     """
     while True:
@@ -12,7 +13,7 @@ def run_select_daq():
             # creates object where DAQ information is stored
             modelsDAQ, exitFlag = guiDAQ.select_daq_window(dt.modelsDAQ)
             # DAQ initiation with its corresponding model
-            niDAQ = dt.niDAQ(modelsDAQ, exitFlag)
+            niDAQ = create_daq(modelsDAQ, exitFlag)
             if not exitFlag:
                 niDAQ.initiate_daq()
             return niDAQ
@@ -12,4 +12,6 @@ def run_data_acquisition(niDAQ):
     niDAQ.set_task_start(1)
     niDAQ.set_task_write(1)
     guiDataAcquisition.data_acquisition_window_behavior(niDAQ, window, fig, figure_canvas_agg)
+    # leaving the window while acquiring, e.g. to recalibrate, stops the acquisition
+    niDAQ.stop_data_acquisition()
     niDAQ.set_task_stop(1)
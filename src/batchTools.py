@@ -0,0 +1,230 @@
+import argparse
+import csv
+import itertools
+import json
+import os
+import time
+
+import numpy as np
+import src.calibrationTools as ct
+import src.storageTools as storage
+
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+CHUNK_SIZE = 100000  # rows read, converted and written at a time
+RAW_FILE_EXTENSIONS = ('.csv', '.txt')
+COLUMN_FILE_NAMES = {'voltage': 'voltage.npy', 'temperature': 'temperature.npy'}
+
+
+def _is_number(field):
+    """
+    Private method that checks if a csv field can be converted to float
+    :param field: string
+    :return: True if it can
+    """
+    try:
+        float(field)
+        return True
+    except ValueError:
+        return False
+
+
+def _scan_raw_file(file_name):
+    """
+    Private method that finds where the voltages start in a raw file and how many rows there are. Files saved by
+    niDAQ.save_data_acquisition start after the 'DATA' section header, other files at their first numeric row.
+    :param file_name: path to the raw file
+    :return: number of lines before the first voltage, number of voltage rows
+    """
+    data_start, first_numeric, n_lines = None, None, 0
+    n_data_rows, n_numeric_rows = 0, 0
+    with open(file_name, mode='r', newline='') as file:
+        for n_lines, row in enumerate(csv.reader(file), start=1):
+            if data_start is None and row == ["DATA"]:
+                # skips section header and column names
+                data_start = n_lines + 1
+            elif data_start is not None and n_lines > data_start and row:
+                n_data_rows += 1
+            if first_numeric is None and row and _is_number(row[0]):
+                first_numeric = n_lines - 1
+            if first_numeric is not None and row:
+                n_numeric_rows += 1
+    if data_start is not None:
+        return data_start, n_data_rows
+    if first_numeric is not None:
+        return first_numeric, n_numeric_rows
+    return n_lines, 0
+
+
+def iter_voltage_chunks(file_name, chunk_size=CHUNK_SIZE):
+    """
+    Reads the voltages of a raw file in chunks so the file is never loaded whole
+    :param file_name: path to the raw file
+    :param chunk_size: maximum number of voltages per chunk
+    :return: generator of voltage arrays
+    """
+    data_start, _ = _scan_raw_file(file_name)
+    with open(file_name, mode='r', newline='') as file:
+        reader = csv.reader(file)
+        for _ in itertools.islice(reader, data_start):
+            pass
+        while True:
+            rows = [row[0] for row in itertools.islice(reader, chunk_size) if row]
+            if not rows:
+                break
+            yield np.array(rows, dtype=float)
+
+
+def convert_file(file_name, output_dir, calibration_dict, chunk_size=CHUNK_SIZE):
+    """
+    Converts a raw voltage file to temperature, writing one .npy file per column. Voltages are streamed in chunks and
+    written to memory mapped columns so memory use doesn't depend on the size of the file.
+    :param file_name: path to the raw file
+    :param output_dir: directory where the columns will be written
+    :param calibration_dict: calibration as made by Calibration.to_dict, so it can be sent to other processes
+    :param chunk_size: number of rows converted at a time
+    :return: file name, number of rows converted and bytes read
+    """
+    calibration = ct.calibration_from_dict(calibration_dict)
+    _, n_rows = _scan_raw_file(file_name)
+    Path(output_dir).mkdir(parents=True, exist_ok=True)
+    columns = {name: np.lib.format.open_memmap(os.path.join(output_dir, column_file), mode='w+', dtype=np.float64,
+                                               shape=(n_rows,))
+               for name, column_file in COLUMN_FILE_NAMES.items()}
+    n_converted = 0
+    for voltages in iter_voltage_chunks(file_name, chunk_size):
+        end = n_converted + len(voltages)
+        columns['voltage'][n_converted:end] = voltages
+        columns['temperature'][n_converted:end] = calibration.calculate_temperature_array(voltages)
+        n_converted = end
+    for column in columns.values():
+        column.flush()
+    del columns
+
+    with open(os.path.join(output_dir, "calibration.json"), mode='w') as file:
+        json.dump({'source': str(file_name), 'rows': n_converted, 'calibration': calibration_dict}, file, indent=2)
+    return str(file_name), n_converted, os.path.getsize(file_name)
+
+
+def find_raw_files(input_dir):
+    """
+    Walks a directory looking for raw voltage files
+    :param input_dir: directory with raw files
+    :return: sorted list of paths
+    """
+    return sorted(path for path in Path(input_dir).rglob('*') if path.suffix.lower() in RAW_FILE_EXTENSIONS)
+
+
+def convert_directory(input_dir, output_dir, calibration, workers=None, chunk_size=CHUNK_SIZE):
+    """
+    Converts every raw voltage file in a directory to temperature, spreading the files across a process pool.
+    Every file is written to its own sub-directory, keeping the relative path of the raw file.
+    :param input_dir: directory with raw files
+    :param output_dir: directory where the converted files will be written
+    :param calibration: calibration object used in the conversion
+    :param workers: number of processes, if None the number of CPUs is used
+    :param chunk_size: number of rows converted at a time in every process
+    :return: total number of rows converted
+    """
+    files = find_raw_files(input_dir)
+    calibration_dict = calibration.to_dict()
+    total_rows, total_bytes = 0, 0
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(convert_file, file_name,
+                                   Path(output_dir).joinpath(file_name.relative_to(input_dir).with_suffix('')),
+                                   calibration_dict, chunk_size)
+                   for file_name in files]
+        for n_done, future in enumerate(as_completed(futures), start=1):
+            file_name, n_rows, n_bytes = future.result()
+            total_rows += n_rows
+            total_bytes += n_bytes
+            elapsed = time.perf_counter() - start
+            print(f"[{n_done}/{len(files)}] {file_name}: {n_rows} rows | "
+                  f"{total_rows / elapsed:,.0f} rows/s, {total_bytes / elapsed / 1e6:.2f} MB/s")
+    elapsed = time.perf_counter() - start
+    print(f"Converted {len(files)} files, {total_rows} rows in {elapsed:.2f} s")
+    return total_rows
+
+
+def load_sensor_table(file_name):
+    """
+    Reads a table with (sensor_id, voltage, temperature) rows, skipping a header row if there is one
+    :param file_name: path to the csv file
+    :return: lists of sensor ids, voltages and temperatures
+    """
+    sensor_ids, voltages, temperatures = [], [], []
+    with open(file_name, mode='r', newline='') as file:
+        for row in csv.reader(file):
+            if len(row) < 3 or not (_is_number(row[1]) and _is_number(row[2])):
+                continue
+            sensor_ids.append(row[0].strip())
+            voltages.append(float(row[1]))
+            temperatures.append(float(row[2]))
+    return sensor_ids, voltages, temperatures
+
+
+def calibrate_sensors_file(file_name, report_file_name, expression_type='LINEAR_EQUATION', library=None):
+    """
+    Calibrates every sensor of a bulk table at once and writes a report with the goodness of fit of each one
+    :param file_name: path to the csv file with (sensor_id, voltage, temperature) rows
+    :param report_file_name: path where the report will be written
+    :param expression_type: 'LINEAR_EQUATION' or 'NON_LINEAR_EQUATION'
+    :param library: CalibrationLibrary object where the calibrations will be saved, None to not save them
+    :return: list of dictionaries with the calibration and metrics of every sensor
+    """
+    start = time.perf_counter()
+    results = ct.fit_calibrations_batch(*load_sensor_table(file_name), expression_type=expression_type)
+    elapsed = time.perf_counter() - start
+
+    if not report_file_name.lower().endswith(".csv"):
+        report_file_name += ".csv"
+    with open(report_file_name, mode='w', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow(ct.fit_report_fieldnames)
+        for result in results:
+            writer.writerow([result['sensor_id'], repr(result['calibration']), result['n_points'],
+                             result['r_squared'], result['rmse'], result['max_residual']])
+    if library is not None:
+        for result in results:
+            library.save(result['calibration'])
+    print(f"Calibrated {len(results)} sensors in {elapsed * 1000:.1f} ms")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Batch tools for raw voltage files and sensor calibration")
+    parser.add_argument('--library', default=storage.CALIBRATION_LIBRARY_PATH, help="path to the calibration library")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    convert_parser = subparsers.add_parser('convert', help="converts directories of raw voltage files to temperature")
+    convert_parser.add_argument('input_dir', help="directory with raw voltage files")
+    convert_parser.add_argument('output_dir', help="directory where the converted files will be written")
+    convert_parser.add_argument('--sensor-id', default=ct.DEFAULT_SENSOR_ID, help="sensor whose calibration is used")
+    convert_parser.add_argument('--workers', type=int, default=None, help="number of processes")
+    convert_parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help="rows converted at a time")
+
+    calibrate_parser = subparsers.add_parser('calibrate', help="calibrates many sensors from a bulk table")
+    calibrate_parser.add_argument('table', help="csv file with sensor_id, voltage, temperature rows")
+    calibrate_parser.add_argument('report', help="csv file where the fit report will be written")
+    calibrate_parser.add_argument('--non-linear', action='store_true', help="fits non-linear expressions")
+    calibrate_parser.add_argument('--no-save', action='store_true', help="doesn't save calibrations to the library")
+    arguments = parser.parse_args()
+
+    match arguments.command:
+        case 'convert':
+            calibration = storage.load_calibration(arguments.sensor_id, arguments.library)
+            convert_directory(arguments.input_dir, arguments.output_dir, calibration, arguments.workers,
+                              arguments.chunk_size)
+        case 'calibrate':
+            expression_type = 'NON_LINEAR_EQUATION' if arguments.non_linear else 'LINEAR_EQUATION'
+            if arguments.no_save:
+                calibrate_sensors_file(arguments.table, arguments.report, expression_type)
+            else:
+                with storage.CalibrationLibrary(arguments.library) as library:
+                    calibrate_sensors_file(arguments.table, arguments.report, expression_type, library)
+
+
+if __name__ == "__main__":
+    main()
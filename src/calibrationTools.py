@@ -1,9 +1,15 @@
 from abc import ABC, abstractmethod
+import math
 import src.guiTools as gt
+import src.profilingTools as prof
 import numpy as np
 from scipy.optimize import curve_fit
 import warnings
 
+DEFAULT_SENSOR_ID = "default"
+
+fit_report_fieldnames = ['Sensor ID', 'Expression', 'Points', 'R squared', 'RMSE [ºC]', 'Max residual [ºC]']
+
 
 def linear_func(x, m, n):
     """
@@ -43,6 +49,8 @@ class Calibration(ABC):
         self.parameters = {}  # dictionary where parameters are stored {'coefficient_g2', 'coefficient_g1', 'constant'}
         self.data = []
         self.interpolation_points = []  # only used for interpolation
+        self.sensor_id = DEFAULT_SENSOR_ID
+        self.timestamp = None  # moment when the calibration was saved to the library
 
     def __len__(self):
         """
@@ -84,6 +92,22 @@ class Calibration(ABC):
         """
         self.interpolation_points = chosen_points
 
+    def set_sensor_id(self, sensor_id):
+        """
+        Assigns the id of the sensor that has been calibrated
+        :param sensor_id: string that identifies the sensor
+        :return:
+        """
+        self.sensor_id = sensor_id
+
+    def set_timestamp(self, timestamp):
+        """
+        Assigns the moment when the calibration was saved
+        :param timestamp: string in ISO format
+        :return:
+        """
+        self.timestamp = timestamp
+
     def set_data_list(self, data):
         """
         Takes a list (data) containing pairs of data points and assigns it to a list in an object.
@@ -201,6 +225,22 @@ class Calibration(ABC):
         """
         return (len(self) > 1 and self.is_linear()) or (len(self) > 2 and self.is_nonlinear())
 
+    def to_dict(self):
+        """
+        Converts the calibration to a dictionary with built-in types, used to store it
+        :return: dictionary with type, coefficients, data points, fit method, timestamp and sensor id
+        """
+        return {
+            'expression_type': self.expression_type,
+            'calculation_method': getattr(self, 'calculation_method', ""),
+            'parameters': {name: None if value is None else float(value) for name, value in self.parameters.items()},
+            'data': [[float(voltage), float(temperature)] for voltage, temperature in self.data],
+            'interpolation_points': [[float(voltage), float(temperature)]
+                                     for voltage, temperature in self.interpolation_points],
+            'sensor_id': self.sensor_id,
+            'timestamp': self.timestamp
+        }
+
     def to_linear_calibration(self, m=0, n=0):
         """
         Converts a NonLinearCalibration object to a LinearCalibration one, updating parameters and passing data
@@ -217,6 +257,7 @@ class Calibration(ABC):
             linear_cal.update_parameters(parameters_dictionary(m, n))
             # assigns data list to new object
             linear_cal.set_data_list(self.data)
+            linear_cal.set_sensor_id(self.sensor_id)
             return linear_cal
         else:
             raise ValueError("Cannot convert to LinearCalibration. Current equation type is linear.")
@@ -238,6 +279,7 @@ class Calibration(ABC):
             non_linear_cal.update_parameters(parameters_dictionary(a, b, c))
             # assigns data list to new object
             non_linear_cal.set_data_list(self.data)
+            non_linear_cal.set_sensor_id(self.sensor_id)
             return non_linear_cal
         else:
             raise ValueError("Cannot convert to NonLinearCalibration. Current equation type is not linear.")
@@ -308,6 +350,34 @@ class Calibration(ABC):
         """
         pass
 
+    @abstractmethod
+    def calculate_temperature_array(self, voltages):
+        """
+        Abstract method, vectorized version of calculate_temperature for blocks of voltages
+        :param voltages: array of voltage values
+        :return:
+        """
+        pass
+
+    @abstractmethod
+    def get_monotonic_ranges(self):
+        """
+        Abstract method, returns the voltage ranges where the expression is strictly monotonic, so it can be inverted
+        :return: list of [low, high, direction] with direction 1 if the temperature rises with the voltage, -1 if it
+        falls
+        """
+        pass
+
+    @abstractmethod
+    def calculate_voltage(self, temperature, voltage_range):
+        """
+        Abstract method, inverts the expression: returns the voltage of a temperature within a monotonic range
+        :param temperature: temperature value, before rounding
+        :param voltage_range: [low, high, ...] as returned by get_monotonic_ranges
+        :return: voltage value, None if the temperature isn't reached within the range
+        """
+        pass
+
     def plot_expression(self, axes, known_expression, x_plot=None):
         """
         Abstract method, given an x_plot and axes it will be overriden by the appropriate subclass method that will
@@ -327,6 +397,96 @@ class Calibration(ABC):
         return not all(pair in self.data for pair in self.interpolation_points)
 
 
+def calibration_from_dict(calibration_dict):
+    """
+    Creates a calibration object from a dictionary made with Calibration.to_dict
+    :param calibration_dict: dictionary with the calibration information
+    :return: LinearCalibration or NonLinearCalibration object
+    """
+    match calibration_dict['expression_type']:
+        case 'LINEAR_EQUATION':
+            calibration = LinearCalibration(calibration_dict.get('calculation_method', ""))
+        case 'NON_LINEAR_EQUATION':
+            calibration = NonLinearCalibration()
+        case _:
+            raise ValueError(f"Unknown expression type: {calibration_dict['expression_type']}")
+    calibration.update_parameters(calibration_dict['parameters'])
+    calibration.set_data_list([list(pair) for pair in calibration_dict['data']])
+    calibration.set_chosen_points([list(pair) for pair in calibration_dict.get('interpolation_points', [])])
+    calibration.set_sensor_id(calibration_dict.get('sensor_id', DEFAULT_SENSOR_ID))
+    calibration.set_timestamp(calibration_dict.get('timestamp'))
+    return calibration
+
+
+def fit_calibrations_batch(sensor_ids, voltages, temperatures, expression_type='LINEAR_EQUATION'):
+    """
+    Fits the calibration of many sensors at once by least squares. The normal equations of every sensor are built
+    with np.bincount over all rows and solved as one stacked system, instead of one fit per sensor. Voltages are
+    centered per sensor to keep the systems well conditioned.
+    :param sensor_ids: sensor id of every row
+    :param voltages: voltage of every row
+    :param temperatures: temperature of every row
+    :param expression_type: 'LINEAR_EQUATION' or 'NON_LINEAR_EQUATION'
+    :return: list of dictionaries, one per sensor, with the calibration and its goodness of fit metrics
+    """
+    match expression_type:
+        case 'LINEAR_EQUATION':
+            degree = 1
+        case 'NON_LINEAR_EQUATION':
+            degree = 2
+        case _:
+            raise ValueError(f"Unknown expression type: {expression_type}")
+    x = np.asarray(voltages, dtype=float)
+    y = np.asarray(temperatures, dtype=float)
+    names, index = np.unique(np.asarray(sensor_ids, dtype=str), return_inverse=True)
+    n_sensors = len(names)
+    counts = np.bincount(index, minlength=n_sensors)
+    if np.any(counts <= degree):
+        raise ValueError(f"Every sensor needs at least {degree + 1} points. "
+                         f"Not enough points for: {list(names[counts <= degree])}")
+
+    x_mean = np.bincount(index, x, minlength=n_sensors) / counts
+    x_centered = x - x_mean[index]
+    power_sums = np.array([np.bincount(index, x_centered ** k, minlength=n_sensors) for k in range(2 * degree + 1)])
+    normal_matrix = power_sums[np.add.outer(np.arange(degree + 1), np.arange(degree + 1))].transpose(2, 0, 1)
+    normal_vector = np.array([np.bincount(index, x_centered ** k * y, minlength=n_sensors)
+                              for k in range(degree + 1)]).T
+    # coefficients in ascending powers of the centered voltage, pinv also handles sensors with repeated voltages
+    centered_coefficients = (np.linalg.pinv(normal_matrix) @ normal_vector[..., None])[..., 0]
+
+    fitted = sum(centered_coefficients[index, k] * x_centered ** k for k in range(degree + 1))
+    residuals = y - fitted
+    sse = np.bincount(index, residuals ** 2, minlength=n_sensors)
+    y_mean = np.bincount(index, y, minlength=n_sensors) / counts
+    sst = np.bincount(index, (y - y_mean[index]) ** 2, minlength=n_sensors)
+    max_residuals = np.zeros(n_sensors)
+    np.maximum.at(max_residuals, index, np.abs(residuals))
+
+    order = np.argsort(index, kind='stable')
+    points = np.split(np.column_stack((x, y))[order], np.cumsum(counts)[:-1])
+
+    results = []
+    for i, sensor_id in enumerate(names):
+        c, m = centered_coefficients[i], x_mean[i]
+        if degree == 1:
+            calibration = LinearCalibration('LEAST_SQUARES')
+            calibration.set_parameters(c[1], c[0] - c[1] * m)
+        else:
+            calibration = NonLinearCalibration()
+            calibration.set_parameters(float(c[2]), float(c[1] - 2 * c[2] * m), float(c[0] - c[1] * m + c[2] * m ** 2))
+        calibration.set_data_list(points[i].tolist())
+        calibration.set_sensor_id(str(sensor_id))
+        results.append({
+            'sensor_id': str(sensor_id),
+            'calibration': calibration,
+            'n_points': int(counts[i]),
+            'r_squared': float(1 - sse[i] / sst[i]) if sst[i] > 0 else float('nan'),
+            'rmse': float(np.sqrt(sse[i] / counts[i])),
+            'max_residual': float(max_residuals[i])
+        })
+    return results
+
+
 def check_all_floats(*args):
     """
     Given a list of values, checks if they all are float. If any isn't raises an error.
@@ -348,6 +508,38 @@ def get_sign(number):
     return ' ' if number < 0 else ' + '
 
 
+def get_linear_monotonic_ranges(m):
+    """
+    Returns the monotonic range of a linear expression
+    :param m: slope
+    :return: list with [low, high, direction], empty if the expression is constant
+    """
+    return [] if m == 0 else [[-np.inf, np.inf, 1 if m > 0 else -1]]
+
+
+def solve_in_range(coefficients, voltage_range):
+    """
+    Returns the root of a linear or quadratic polynomial within a voltage range
+    :param coefficients: polynomial coefficients, highest grade first
+    :param voltage_range: [low, high, ...]
+    :return: voltage, None if no real root is within the range
+    """
+    a, b, c = [0.0] * (3 - len(coefficients)) + [float(coefficient) for coefficient in coefficients]
+    if a == 0:
+        roots = [] if b == 0 else [-c / b]
+    else:
+        discriminant = b ** 2 - 4 * a * c
+        if discriminant < 0:
+            return None
+        # stable form of the quadratic formula, it doesn't subtract close numbers
+        q = -(b + math.copysign(math.sqrt(discriminant), b)) / 2
+        roots = [q / a] + ([c / q] if q != 0 else [])
+    for root in roots:
+        if voltage_range[0] <= root <= voltage_range[1]:
+            return root
+    return None
+
+
 def parameters_dictionary(*args):
     """
     Given the expression parameters, creates a dictionary format in order to save to the object
@@ -401,6 +593,7 @@ class LinearCalibration(Calibration):
         m, n = gt.to_number_n_dec(gt.N_DECIMALS, m, n)
         self.update_parameters(parameters_dictionary(m, n))
 
+    @prof.profiled
     def calculate_expression(self, point_1: list = None, point_2: list = None):
         """
         Given at least 2 point, calculates the coefficients for a linear expression
@@ -417,6 +610,7 @@ class LinearCalibration(Calibration):
                 raise ValueError('Calibration calculation method not accepted')
         self.set_parameters(coefficients[0], coefficients[1])
 
+    @prof.profiled
     def calculate_temperature(self, voltage: float):
         """
         Calculates the temperature with calibration equation rounded to 3 decimal points.
@@ -426,6 +620,33 @@ class LinearCalibration(Calibration):
         check_all_floats(voltage)
         return round(linear_func(voltage, self.get_parameter('coefficient_g1'), self.get_parameter('constant')), 3)
 
+    @prof.profiled
+    def calculate_temperature_array(self, voltages):
+        """
+        Calculates the temperatures of an array of voltages at once, rounded to 3 decimal points.
+        :param voltages: array of voltage values
+        :return: numpy array of temperature values
+        """
+        return np.round(linear_func(np.asarray(voltages, dtype=float), self.get_parameter('coefficient_g1'),
+                                    self.get_parameter('constant')), 3)
+
+    def get_monotonic_ranges(self):
+        """
+        Returns the voltage ranges where the expression is strictly monotonic, every voltage unless it's constant
+        :return: list of [low, high, direction]
+        """
+        return get_linear_monotonic_ranges(self.get_parameter('coefficient_g1'))
+
+    def calculate_voltage(self, temperature, voltage_range):
+        """
+        Inverts the expression within a monotonic range
+        :param temperature: temperature value, before rounding
+        :param voltage_range: [low, high, ...] as returned by get_monotonic_ranges
+        :return: voltage value, None if the temperature isn't reached within the range
+        """
+        return solve_in_range([self.get_parameter('coefficient_g1'), self.get_parameter('constant') - temperature],
+                              voltage_range)
+
     def plot_expression(self, axes, known_expression, x_plot=None):
         """
         Plots linear calibration graph on axes
@@ -472,6 +693,7 @@ class NonLinearCalibration(Calibration):
         check_all_floats(a, b, c)
         self.update_parameters(parameters_dictionary(a, b, c))
 
+    @prof.profiled
     def calculate_expression(self):
         """
         Calculated non-linear coefficient for the expression
@@ -485,6 +707,7 @@ class NonLinearCalibration(Calibration):
         a, b, c = popt
         self.set_parameters(a, b, c)
 
+    @prof.profiled
     def calculate_temperature(self, voltage: float):
         """
         Calculates the temperature with calibration equation rounded to 3 decimal points.
@@ -496,6 +719,39 @@ class NonLinearCalibration(Calibration):
             non_linear_func(voltage, self.get_parameter('coefficient_g2'), self.get_parameter('coefficient_g1'),
                             self.get_parameter('constant')), 3)
 
+    @prof.profiled
+    def calculate_temperature_array(self, voltages):
+        """
+        Calculates the temperatures of an array of voltages at once, rounded to 3 decimal points.
+        :param voltages: array of voltage values
+        :return: numpy array of temperature values
+        """
+        return np.round(non_linear_func(np.asarray(voltages, dtype=float), self.get_parameter('coefficient_g2'),
+                                        self.get_parameter('coefficient_g1'), self.get_parameter('constant')), 3)
+
+    def get_monotonic_ranges(self):
+        """
+        Returns the voltage ranges where the expression is strictly monotonic, on each side of the vertex of the
+        parabola
+        :return: list of [low, high, direction]
+        """
+        a, b = self.get_parameter('coefficient_g2'), self.get_parameter('coefficient_g1')
+        if a == 0:
+            return get_linear_monotonic_ranges(b)
+        vertex = -b / (2 * a)
+        direction = 1 if a > 0 else -1
+        return [[-np.inf, vertex, -direction], [vertex, np.inf, direction]]
+
+    def calculate_voltage(self, temperature, voltage_range):
+        """
+        Inverts the expression within a monotonic range
+        :param temperature: temperature value, before rounding
+        :param voltage_range: [low, high, ...] as returned by get_monotonic_ranges
+        :return: voltage value, None if the temperature isn't reached within the range
+        """
+        return solve_in_range([self.get_parameter('coefficient_g2'), self.get_parameter('coefficient_g1'),
+                               self.get_parameter('constant') - temperature], voltage_range)
+
     def plot_expression(self, axes, known_expression, x_plot=None):
         """
         Plots nonlinear calibration graph on axes
@@ -0,0 +1,152 @@
+import numpy as np
+import src.pipelineTools as pt
+import src.timingTools as tm
+
+DEFAULT_OUTPUT_LIMITS = (0.0, 5.0)  # [V] full range of the analog output
+
+control_log_fieldnames = ['Time [ns]', 'Setpoint [ºC]', 'Temperature [ºC]', 'Error [ºC]', 'Output [V]']
+
+
+class SetpointProfile:
+    """
+    Setpoint that follows a profile of ramps and soaks: linear between (time, temperature) points and constant before
+    the first one and after the last one. Times count from the start of the acquisition.
+    """
+
+    def __init__(self, points):
+        """
+        :param points: list of [time in [s], temperature in [ºC]] pairs, in time order
+        """
+        if len(points) == 0:
+            raise ValueError("Setpoint profile must have at least one point.")
+        times, temperatures = zip(*points)
+        if any(later < earlier for earlier, later in zip(times, times[1:])):
+            raise ValueError(f"Setpoint profile times must be in order.\nGot {list(times)} instead.")
+        self.times = np.array(times, dtype=float)
+        self.temperatures = np.array(temperatures, dtype=float)
+
+    def __repr__(self):
+        return ", ".join(f"{time:g} s: {temperature:g} ºC" for time, temperature in zip(self.times, self.temperatures))
+
+    def get_setpoint(self, time_ns):
+        """
+        Returns the setpoint at a time of the acquisition
+        :param time_ns: time since the acquisition started in [ns]
+        :return: temperature in [ºC]
+        """
+        return float(np.interp(time_ns / pt.NS_PER_S, self.times, self.temperatures))
+
+
+def create_profile(text):
+    """
+    Creates a setpoint profile from text, e.g. '60' for a constant setpoint or '0:25, 300:80, 900:80' for a ramp from
+    25 to 80 ºC in 5 minutes followed by a 10 minute soak
+    :param text: a temperature in [ºC], or time [s]:temperature [ºC] pairs separated by commas
+    :return: SetpointProfile object
+    """
+    try:
+        if ':' not in text:
+            return SetpointProfile([[0.0, float(text)]])
+        return SetpointProfile([[float(value) for value in point.split(':')] for point in text.split(',')])
+    except ValueError as e:
+        raise ValueError(f"Setpoint must be a temperature or time:temperature pairs separated by commas.\n"
+                         f"Got {text} instead.") from e
+
+
+class PIDController:
+    """
+    PID temperature controller with output limits and anti-windup. It's updated once per block, with the mean
+    temperature of the block at the time of its last sample, so when blocks are a fixed number of samples of a hardware
+    clocked acquisition the loop runs at a fixed rate paced by the sample clock, whatever the GUI is doing.
+
+    The derivative acts on the temperature instead of the error, so steps of the setpoint don't kick the output. The
+    integral only changes while the output isn't saturated, or when the change brings it back within its limits, so
+    it doesn't wind up while the output is held at a limit.
+    """
+
+    def __init__(self, kp, ki=0.0, kd=0.0, profile=None, output_limits=DEFAULT_OUTPUT_LIMITS):
+        """
+        :param kp: proportional gain in [V/ºC]
+        :param ki: integral gain in [V/(ºC·s)]
+        :param kd: derivative gain in [V·s/ºC]
+        :param profile: SetpointProfile object, None for a constant 0 ºC setpoint
+        :param output_limits: [min, max] output in [V]
+        """
+        if output_limits[0] >= output_limits[1]:
+            raise ValueError(f"Minimum output must be lower than maximum output.\nGot {list(output_limits)} instead.")
+        self.kp = kp
+        self.ki = ki
+        self.kd = kd
+        self.profile = SetpointProfile([[0.0, 0.0]]) if profile is None else profile
+        self.output_limits = list(output_limits)
+        self.integral = 0.0  # [V]
+        self.last_time = None
+        self.last_temperature = None
+        self.output = None
+        self.latency = tm.LatencyHistogram()
+        self.log = []
+
+    def __repr__(self):
+        return f"PID Kp={self.kp} Ki={self.ki} Kd={self.kd}, setpoint [{self.profile}], " \
+               f"output {self.output_limits[0]}-{self.output_limits[1]} V"
+
+    def update(self, times, temperatures):
+        """
+        Calculates the output for a block and logs it
+        :param times: array with the time of every sample in [ns]
+        :param temperatures: array of temperatures
+        :return: output in [V]
+        """
+        time_ns, temperature = int(times[-1]), float(np.mean(temperatures))
+        setpoint = self.profile.get_setpoint(time_ns)
+        error = setpoint - temperature
+        period = 0.0 if self.last_time is None else (time_ns - self.last_time) / pt.NS_PER_S
+        derivative = 0.0 if period <= 0 else -(temperature - self.last_temperature) / period
+
+        low, high = self.output_limits
+        integral = min(max(self.integral + self.ki * error * period, low), high)
+        unclamped = self.kp * error + integral + self.kd * derivative
+        output = min(max(unclamped, low), high)
+        if unclamped == output or (unclamped > high and integral < self.integral) or \
+                (unclamped < low and integral > self.integral):
+            self.integral = integral
+
+        self.last_time, self.last_temperature = time_ns, temperature
+        self.output = output
+        self.log.append({'Time [ns]': time_ns, 'Setpoint [ºC]': setpoint, 'Temperature [ºC]': temperature,
+                         'Error [ºC]': error, 'Output [V]': output})
+        return output
+
+    def hold(self):
+        """
+        Pauses the loop, e.g. while an interlock holds the output. The next update starts again without
+        differentiating nor integrating over the pause.
+        :return:
+        """
+        self.last_time = None
+        self.last_temperature = None
+
+    def clear(self):
+        """
+        Clears the state and log, keeping the gains, profile and limits
+        :return:
+        """
+        self.integral = 0.0
+        self.hold()
+        self.output = None
+        self.latency.clear()
+        self.log.clear()
+
+    def get_counters(self):
+        """
+        Returns the updates of the loop and how long after the last sample of their block the output was written
+        :return: dictionary with counter names and values
+        """
+        latency_p50, latency_p99, latency_max = self.latency.get_summary()
+        return {
+            'Control updates': len(self.log),
+            'Control output [V]': None if self.output is None else round(self.output, 3),
+            'Control p50 [ms]': latency_p50,
+            'Control p99 [ms]': latency_p99,
+            'Control max [ms]': latency_max
+        }
@@ -1,21 +1,39 @@
 import csv
 import nidaqmx
+import numpy as np
+import time
 
 import datetime as dt
+import src.alarmTools as at
+import src.calibrationTools as ct
+import src.controlTools as control
 import src.guiTools as gt
-
-from nidaqmx.constants import (TerminalConfiguration)
+import src.filterTools as ft
+import src.interlockTools as it
+import src.pipelineTools as pt
+import src.profilingTools as prof
+import src.pyramidTools as pyr
+import src.simulationTools as sim
+import src.statisticsTools as st
+import src.timingTools as tm
+import src.triggerTools as tt
+
+from nidaqmx.constants import (AcquisitionType, OverwriteMode, ReadRelativeTo, SampleTimingType,
+                               TerminalConfiguration)
 
 # DAQ model list
-modelsDAQ = ['USB-6211', 'USB-6001', 'USB-6002']
-
-alarm_log_fieldnames = ['Alarm Type', 'Temperature', 'Time Interval']
+modelsDAQ = ['USB-6211', 'USB-6001', 'USB-6002', sim.SIMULATED_MODEL]
 
 AO_DAQ_NAME = "wheatstone_vcc"
 AO_DAQ_MIN_VAL = 0
 AO_DAQ_VAL = 1
 AO_DAQ_MAX_VAL = 5
 
+BURST_N_SAMPLES = 1000  # samples averaged per calibration point
+BURST_N_DECIMALS = 5  # averaged voltages are more precise than a single reading
+
+BUFFER_SECONDS = 10  # seconds of samples the driver buffer holds in buffered acquisition
+
 
 def is_daq_connected():
     system = nidaqmx.system.System.local()
@@ -23,6 +41,40 @@ def is_daq_connected():
     return len(devices) > 0
 
 
+def load_data_acquisition(file_name):
+    """
+    Reads the data section of a file saved with niDAQ.save_data_acquisition
+    :param file_name: path to the csv file
+    :return: list of pairs [voltage, temperature]
+    """
+    data = []
+    with open(file_name, mode='r', newline='') as file:
+        reader = csv.reader(file)
+        for row in reader:
+            if row == ["DATA"]:
+                # skips column names
+                next(reader)
+                break
+        for row in reader:
+            if row:
+                data.append([float(row[0]), float(row[1])])
+    return data
+
+
+def reprocess_data_acquisition(file_name, voltage_filter, calibration):
+    """
+    Filters the voltages of a saved run offline and calculates their temperature again
+    :param file_name: path to the csv file
+    :param voltage_filter: StreamFilter object
+    :param calibration: calibration object used to calculate the temperatures
+    :return: list of pairs [voltage, temperature]
+    """
+    voltages = [voltage for voltage, temperature in load_data_acquisition(file_name)]
+    filtered = np.round(ft.filter_signal(voltage_filter, voltages), 3)
+    temperatures = calibration.calculate_temperature_array(filtered)
+    return [[voltage, temperature] for voltage, temperature in zip(filtered.tolist(), temperatures.tolist())]
+
+
 class niDAQ:
     """
         Class with DAQ information.
@@ -37,14 +89,45 @@ class niDAQ:
         self.exit_requested = exit_requested
         self.calibration = ""
         self.calibrations_log = []
+        self.calibration_library = None
+        self.sensor_id = ct.DEFAULT_SENSOR_ID
+        self.voltage_filter = None
+        self.publisher = None
+        self.shared_ring = None
+        self.pipeline = None
+        self.sink_policy = None
+        self.trigger = None
+        self.trigger_window = [0, 0]  # [pre-trigger, post-trigger] samples
+        self.trigger_stage = None
+        self.interlock = None
+        self.task_do = None  # digital output task of the interlock
+        self.controller = None  # drives the analog output towards a setpoint, None while there is no control loop
+        self.block_callback = None
+        self.deadband = None
+        self.max_interval = None
+        self.monitoring = False  # True to only check the alarms, without calculating nor storing temperatures
         self.alarm_min = None
         self.alarm_max = None
+        self.alarm_hysteresis = 0.0
+        self.alarm_debounce = 0.0
+        self.alarm_rate = None  # [ºC/s]
+        self.alarm_time_to_limit = None  # [s]
+        self.alarm_trend_window = st.DEFAULT_WINDOW_LENGTH  # samples the trend is fitted to
+        self.alarm_trend_hysteresis = [None, None]  # [[ºC/s], [s]] of the rate and time to limit alarms
         self.sample_rate = None
         self.n_samples = None
         self.start_acquisition_time = ""
+        self.start_time_ns = None  # [ns] since the epoch when the acquisition started
+        self.start_counter_ns = None  # perf_counter_ns when the acquisition started, sample times count from it
+        self.clock_start_ns = 0  # [ns] since the acquisition started when the sample clock started
         self.data = []
-        self.time_intervals = []
-        self.alarms_log = []
+        self.times = pt.Column(np.int64)  # [ns] since the acquisition started
+        self.alarm_engine = at.AlarmEngine()
+        self.alarm_states = [False] * len(at.alarm_types)  # ordered as at.alarm_types, True while raised
+        self.pyramid = pyr.SummaryPyramid()
+        self.plot_view = None  # [start, end] time range shown in the plot, None to show the whole run
+        self.run_statistics = st.RunningStatistics()
+        self.window_statistics = st.WindowStatistics()
 
     def __len__(self):
         return len(self.data)
@@ -63,7 +146,10 @@ class niDAQ:
                f"alarm: [min, max] = {[self.alarm_min, self.alarm_max]} ºC"
 
     def set_tasks(self):
-        if is_daq_connected():
+        if self.model == sim.SIMULATED_MODEL:
+            for channel in range(2):
+                self.task_ai_ao.append(sim.SimulatedTask())
+        elif is_daq_connected():
             for channel in range(2):
                 self.task_ai_ao.append(nidaqmx.Task())
         else:
@@ -83,6 +169,7 @@ class niDAQ:
         :return:
         """
         self.alarm_min = alarm_min
+        self.alarm_engine.set_limit('Below Minimum', alarm_min)
 
     def set_alarm_max(self, alarm_max):
         """
@@ -91,6 +178,56 @@ class niDAQ:
         :return:
         """
         self.alarm_max = alarm_max
+        self.alarm_engine.set_limit('Above Maximum', alarm_max)
+
+    def set_alarm_hysteresis(self, hysteresis, debounce=0.0):
+        """
+        Sets how the alarms ignore noise around their limits: an alarm is raised when the temperature has been
+        beyond its limit for the debounce time, and cleared when it gets back within the limit by the hysteresis
+        :param hysteresis: temperature in [ºC]
+        :param debounce: time in [ms]
+        :return:
+        """
+        self.alarm_engine.set_hysteresis(hysteresis, round(debounce * pt.NS_PER_MS))
+        self.alarm_hysteresis = hysteresis
+        self.alarm_debounce = debounce
+
+    def set_alarm_rate(self, alarm_rate):
+        """
+        Sets the rate of change alarm, raised when the temperature rises or falls faster than the rate
+        :param alarm_rate: rate in [ºC/s], None to disable the alarm
+        :return:
+        """
+        self.alarm_rate = alarm_rate
+        self.alarm_engine.set_limit('Rate of Change', alarm_rate)
+
+    def set_alarm_time_to_limit(self, time_to_limit):
+        """
+        Sets the predictive alarm, raised when the trend of the temperature reaches the min or max alarm within a time
+        :param time_to_limit: time in [s], None to disable the alarm
+        :return:
+        """
+        self.alarm_time_to_limit = time_to_limit
+        self.alarm_engine.set_limit('Time to Limit', time_to_limit)
+
+    def set_alarm_trend_hysteresis(self, rate_hysteresis=None, time_to_limit_hysteresis=None):
+        """
+        Sets how much the rate and time to limit have to get back within their limits to clear their alarms
+        :param rate_hysteresis: rate in [ºC/s], None for at.DEFAULT_TREND_HYSTERESIS of the limit
+        :param time_to_limit_hysteresis: time in [s], None for at.DEFAULT_TREND_HYSTERESIS of the limit
+        :return:
+        """
+        self.alarm_engine.set_trend_hysteresis(rate_hysteresis, time_to_limit_hysteresis)
+        self.alarm_trend_hysteresis = [rate_hysteresis, time_to_limit_hysteresis]
+
+    def set_alarm_trend_window(self, length):
+        """
+        Sets how many of the latest samples the trend of the rate and time to limit alarms is fitted to
+        :param length: number of samples, at least 2
+        :return:
+        """
+        self.alarm_engine.set_trend_window(length)
+        self.alarm_trend_window = length
 
     def set_calibration(self, expression):
         """
@@ -99,12 +236,207 @@ class niDAQ:
         """
         self.calibration = expression
 
+    def set_calibration_library(self, calibration_library, sensor_id=ct.DEFAULT_SENSOR_ID):
+        """
+        Sets library where new calibrations are saved and the id of the sensor being calibrated
+        :param calibration_library: CalibrationLibrary object
+        :param sensor_id: string that identifies the sensor
+        :return:
+        """
+        self.calibration_library = calibration_library
+        self.sensor_id = sensor_id
+
+    def load_calibrations_from_library(self):
+        """
+        Adds the latest calibrations of the sensor in the library to the log and sets the newest one
+        :return: True if a calibration was loaded
+        """
+        if self.calibration_library is None:
+            return False
+        calibrations = self.calibration_library.load(self.sensor_id)
+        self.calibrations_log.extend(calibrations)
+        if calibrations:
+            self.set_calibration(repr(calibrations[-1]))
+        return len(calibrations) > 0
+
+    def set_publisher(self, publisher):
+        """
+        Sets publisher that streams acquired data to external subscribers
+        :param publisher: DataPublisher object, None to stop streaming
+        :return:
+        """
+        self.publisher = publisher
+
+    def set_shared_ring(self, shared_ring):
+        """
+        Sets shared memory ring where acquired data is written for other processes
+        :param shared_ring: SharedRingWriter object, None to stop writing
+        :return:
+        """
+        self.shared_ring = shared_ring
+
+    def set_sink_policy(self, sink_policy):
+        """
+        Sets what the publisher and shared memory sinks do when they can't keep up with the acquisition
+        :param sink_policy: one of pipelineTools.backpressure_policies, None to write to them in the acquisition loop
+        :return:
+        """
+        self.sink_policy = sink_policy
+
+    def set_trigger(self, trigger, pre_samples=0, post_samples=1):
+        """
+        Sets the trigger, only the samples around it are stored
+        :param trigger: Trigger object, None to store every sample
+        :param pre_samples: samples stored before the trigger
+        :param post_samples: samples stored from the trigger on
+        :return:
+        """
+        self.trigger = trigger
+        self.trigger_window = [pre_samples, post_samples]
+
+    def set_interlock(self, interlock_type, alarm_types=tuple(at.alarm_types), value=None, latch=False,
+                      line=it.DEFAULT_DIGITAL_LINE):
+        """
+        Maps alarms to a hardware output, written from the acquisition as soon as a block raises them. The analog
+        output is the AO task of the DAQ, which is back at AO_DAQ_VAL while no alarm is raised.
+        :param interlock_type: one of it.interlock_types
+        :param alarm_types: alarms that trip the interlock, from at.alarm_types
+        :param value: voltage in [V] the analog output is set to while tripped, None for the default; for a digital
+        line True to set it high while tripped or False to set it low, None for high
+        :param latch: True to stay tripped until reset_interlock, False to restore the output when the alarms clear
+        :param line: digital output line
+        :return:
+        """
+        self.close_interlock()
+        match interlock_type:
+            case 'None':
+                return
+            case 'Analog Output':
+                voltage = it.DEFAULT_TRIPPED_VOLTAGE if value is None else value
+                if not AO_DAQ_MIN_VAL <= voltage <= AO_DAQ_MAX_VAL:
+                    raise ValueError(f"Interlock voltage must be between {AO_DAQ_MIN_VAL} and {AO_DAQ_MAX_VAL} V.\n"
+                                     f"Got {voltage} instead.")
+                self.interlock = it.AnalogInterlock(self.task_ai_ao[1], AO_DAQ_VAL, voltage, alarm_types, latch)
+            case 'Digital Line':
+                self.task_do = sim.SimulatedTask() if self.model == sim.SIMULATED_MODEL else nidaqmx.Task()
+                self.task_do.do_channels.add_do_chan(line)
+                self.interlock = it.DigitalInterlock(self.task_do, True if value is None else bool(value),
+                                                     alarm_types, latch)
+            case _:
+                raise ValueError(f"No matching interlock found.\nExpected: {it.interlock_types}\n"
+                                 f"Got: {interlock_type}.")
+        # starts from the safe value, in case an earlier run left the output tripped
+        self.interlock.write(False)
+
+    def reset_interlock(self):
+        """
+        Restores the output of a tripped interlock, it trips again with the next block if an alarm is still raised
+        :return:
+        """
+        if self.interlock is not None:
+            self.interlock.reset(None if self.start_counter_ns is None else self.get_elapsed_time_ns())
+
+    def close_interlock(self):
+        """
+        Removes the interlock and closes its digital output task, if it has one
+        :return:
+        """
+        self.interlock = None
+        if self.task_do is not None:
+            self.task_do.close()
+            self.task_do = None
+
+    def update_interlock(self):
+        """
+        Trips or restores the interlock output with the alarm states, timing it from the sample that raised them
+        :return:
+        """
+        if self.interlock is not None:
+            self.interlock.update(self.alarm_states, self.alarm_engine.get_raised_times(), self.get_elapsed_time_ns)
+
+    def set_controller(self, controller):
+        """
+        Sets a closed loop temperature controller that drives the analog output. It's updated with every block of the
+        acquisition, so it runs at a fixed rate when blocks are read from a buffered or callback acquisition.
+        :param controller: PIDController object, None to stop controlling
+        :return:
+        """
+        if controller is not None and not AO_DAQ_MIN_VAL <= controller.output_limits[0] < \
+                controller.output_limits[1] <= AO_DAQ_MAX_VAL:
+            raise ValueError(f"Control output limits must be between {AO_DAQ_MIN_VAL} and {AO_DAQ_MAX_VAL} V.\n"
+                             f"Got {controller.output_limits} instead.")
+        self.controller = controller
+
+    def apply_control(self, times, temperatures):
+        """
+        Updates the controller with a block and writes its output to the analog output, timing the write from the last
+        sample of the block. While an analog interlock is tripped it holds the output instead, and the loop pauses.
+        :param times: array with the time of every sample
+        :param temperatures: array of temperatures
+        :return:
+        """
+        if self.controller is None or len(times) == 0:
+            return
+        if self.interlock is not None and self.interlock.interlock_type == 'Analog Output' and \
+                self.interlock.is_tripped:
+            self.controller.hold()
+            return
+        self.task_ai_ao[1].write(self.controller.update(times, temperatures))
+        self.controller.latency.add(self.get_elapsed_time_ns() - int(times[-1]))
+
+    def stop_control(self):
+        """
+        Sets the analog output to the minimum output of the controller, e.g. to switch a heater off after a run
+        :return:
+        """
+        if self.controller is not None:
+            self.task_ai_ao[1].write(self.controller.output_limits[0])
+
+    def set_deadband(self, deadband, max_interval=None):
+        """
+        Sets change based recording, a sample is only stored when its temperature differs from the last one stored
+        by more than the deadband or when the maximum interval has elapsed
+        :param deadband: temperature difference in [ºC], None to store every sample
+        :param max_interval: time in [ms], None to store samples only when the temperature changes
+        :return:
+        """
+        self.deadband = deadband
+        self.max_interval = max_interval
+
+    def set_monitoring(self, monitoring):
+        """
+        Sets alarm monitoring, where the pipeline only checks the alarms and drives the interlock. Blocks are checked
+        on the voltages and only converted to temperature when they can't be, since nothing is stored nor plotted.
+        :param monitoring: True to only monitor the alarms
+        :return:
+        """
+        self.monitoring = monitoring
+
+    def set_plot_view(self, plot_view):
+        """
+        Sets time range shown in the plot
+        :param plot_view: [start, end] in [ns], None to show the whole run
+        :return:
+        """
+        self.plot_view = plot_view
+
+    def set_filter(self, voltage_filter):
+        """
+        Sets filter applied to voltage readings before the calibration
+        :param voltage_filter: StreamFilter object, None to disable filtering
+        :return:
+        """
+        self.voltage_filter = voltage_filter
+
     def set_time_log(self):
         """
-        Sets time log to current date/month/year hour:minute:second
+        Sets the start of the acquisition: the moment since the epoch, and the clock sample times are measured with
         :return:
         """
-        self.start_acquisition_time = dt.datetime.now().strftime("%d/%m/%Y %H:%M:%S.%f")
+        self.start_time_ns = time.time_ns()
+        self.start_counter_ns = time.perf_counter_ns()
+        self.start_acquisition_time = dt.datetime.fromtimestamp(self.start_time_ns / pt.NS_PER_S).strftime(
+            "%d/%m/%Y %H:%M:%S.%f")
 
     def set_sample_rate(self, sample_rate):
         """
@@ -122,6 +454,14 @@ class niDAQ:
         """
         self.n_samples = n_samples
 
+    def set_statistics_window(self, length):
+        """
+        Sets number of samples used by the sliding window statistics
+        :param length: number of samples introduced by user
+        :return:
+        """
+        self.window_statistics.set_length(length)
+
     def get_sample_rate(self):
         """
         Sets sample rate of data acquisition
@@ -136,6 +476,16 @@ class niDAQ:
         """
         return self.n_samples
 
+    def get_n_samples_read(self):
+        """
+        Returns number of samples read from the DAQ in this acquisition, including those the deadband or the trigger
+        don't store
+        :return: number of samples read by the pipeline source
+        """
+        if self.pipeline is None:
+            return 0
+        return self.pipeline.timing[self.pipeline.source.name].samples
+
     def get_time_log(self):
         """
         Returns moment when the data acquisition started
@@ -143,6 +493,16 @@ class niDAQ:
         """
         return self.start_acquisition_time
 
+    def get_elapsed_time_ns(self):
+        """
+        Returns time since the acquisition started, measured with a monotonic clock so it never jumps when the
+        system time changes. The acquisition starts now if it hasn't been started with set_time_log.
+        :return: time in [ns]
+        """
+        if self.start_counter_ns is None:
+            self.set_time_log()
+        return time.perf_counter_ns() - self.start_counter_ns
+
     def get_alarm_min(self):
         """
         Returns min alarm value
@@ -172,6 +532,12 @@ class niDAQ:
         """
         self.alarm_max = None
         self.alarm_min = None
+        self.alarm_rate = None
+        self.alarm_time_to_limit = None
+        for alarm_type in at.alarm_types:
+            self.alarm_engine.set_limit(alarm_type, None)
+        self.alarm_states = [False] * len(at.alarm_types)
+        self.update_interlock()
 
     def is_exit_requested(self):
         """
@@ -208,12 +574,44 @@ class niDAQ:
         """
         return self.calibration != ""
 
+    def get_counters(self):
+        """
+        Returns buffer and backpressure counters of the acquisition, the trips of the interlock and the updates of the
+        control loop
+        :return: dictionary with counter names and values, None if there is no acquisition
+        """
+        if self.pipeline is None:
+            return None
+        counters = self.pipeline.get_counters()
+        if self.interlock is not None:
+            counters.update(self.interlock.get_counters())
+        if self.controller is not None:
+            counters.update(self.controller.get_counters())
+        return counters
+
+    def get_plot_range(self):
+        """
+        Returns time range shown in the plot
+        :return: [start, end] in [ns]
+        """
+        if self.plot_view is not None:
+            return self.plot_view
+        return [0, int(self.times[-1]) if len(self.times) else 10 * pt.NS_PER_MS]
+
+    def is_trigger_finished(self):
+        """
+        Checks if a triggered acquisition has recorded its post-trigger window
+        :return: True if it has, False if it hasn't or there is no trigger
+        """
+        return self.trigger_stage is not None and self.trigger_stage.is_finished()
+
     def is_sampling_underway(self):
         """
         Checks if finite data acquisition is underway
-        :return: True is the number of samples taken is smaller than the number of samples introduced by the user
+        :return: True is the number of samples read is smaller than the number of samples introduced by the user.
+        Samples are counted as they're read, since the deadband doesn't store most of them in slow runs.
         """
-        return len(self) < self.n_samples
+        return self.get_n_samples_read() < self.n_samples
 
     def calculate_time_interval_ms(self):
         """
@@ -224,12 +622,21 @@ class niDAQ:
             raise ValueError("Sample rate cannot be zero.")
         return (1 / self.sample_rate) * 1000
 
+    @prof.profiled
     def read_voltage(self):
         """
         Simulates the reading of the voltage by the DAQ
 
         returns:
-            voltage (float): reading of voltage by the DAQ
+            voltage (float): reading of voltage by the DAQ rounded to 3 decimal points
+        """
+        return round(self.read_raw_voltage(), 3)
+
+    @prof.profiled
+    def read_raw_voltage(self):
+        """
+        Reads one voltage value from the DAQ without rounding
+        :return: voltage in [V]
         """
         self.set_task_start(0)
         match self.model:
@@ -242,58 +649,301 @@ class niDAQ:
             case 'USB-6002':
                 # simulation of temperature reading by the DAQ
                 voltage = self.task_ai_ao[0].read()
+            case sim.SIMULATED_MODEL:
+                voltage = self.task_ai_ao[0].read()
             case _:
                 raise ValueError(f"No matching model found.\nExpected: {modelsDAQ}\nGot: {self.model}.")
         self.set_task_stop(0)
-        return round(voltage, 3)
+        return voltage
+
+    def read_voltage_burst(self, n_samples=BURST_N_SAMPLES, sample_rate=None):
+        """
+        Reads a hardware timed burst of voltages and averages it rejecting outliers, used to measure calibration
+        points with less noise than a single reading
+        :param n_samples: number of samples in the burst
+        :param sample_rate: sample rate in [Sa/s], if None the maximum rate of the device is used
+        :return: mean voltage, standard error of the mean and number of samples kept
+        """
+        task = self.task_ai_ao[0]
+        if sample_rate is None:
+            sample_rate = task.timing.samp_clk_max_rate
+        task.timing.cfg_samp_clk_timing(sample_rate, sample_mode=AcquisitionType.FINITE, samps_per_chan=n_samples)
+        try:
+            self.set_task_start(0)
+            samples = task.read(number_of_samples_per_channel=n_samples, timeout=n_samples / sample_rate + 1)
+        finally:
+            # the task is stopped even if the read failed, its timing can't be changed while it runs
+            self.set_task_stop(0)
+            # goes back to software timed single readings
+            task.timing.samp_timing_type = SampleTimingType.ON_DEMAND
+        mean, std_error, n_kept = st.robust_mean(samples)
+        return round(mean, BURST_N_DECIMALS), std_error, n_kept
+
+    def start_buffered_acquisition(self, sample_rate, buffer_seconds=BUFFER_SECONDS):
+        """
+        Starts a continuous hardware timed acquisition, samples are then read in blocks with read_voltage_block
+        :param sample_rate: sample rate in [Sa/s]
+        :param buffer_seconds: seconds of samples the driver buffer holds
+        :return:
+        """
+        self.set_sample_rate(sample_rate)
+        task = self.task_ai_ao[0]
+        task.timing.cfg_samp_clk_timing(sample_rate, sample_mode=AcquisitionType.CONTINUOUS,
+                                        samps_per_chan=int(sample_rate * buffer_seconds))
+        # the device keeps acquiring when the buffer is full, overwritten samples are detected and skipped on read
+        task.in_stream.over_write = OverwriteMode.OVERWRITE_UNREAD_SAMPLES
+        # the sample clock starts with the task, the time of every sample is counted from it
+        self.clock_start_ns = self.get_elapsed_time_ns()
+        self.set_task_start(0)
+
+    def start_callback_acquisition(self, sample_rate, samples_per_block, callback, buffer_seconds=BUFFER_SECONDS):
+        """
+        Starts a continuous hardware timed acquisition where the driver calls back every time a block of samples
+        has been acquired, instead of the blocks being polled with read_voltage_block
+        :param sample_rate: sample rate in [Sa/s]
+        :param samples_per_block: samples acquired between calls
+        :param callback: function(task_handle, every_n_samples_event_type, number_of_samples, callback_data) that
+        returns 0, called from a driver thread
+        :param buffer_seconds: seconds of samples the driver buffer holds
+        :return:
+        """
+        self.set_sample_rate(sample_rate)
+        task = self.task_ai_ao[0]
+        task.timing.cfg_samp_clk_timing(sample_rate, sample_mode=AcquisitionType.CONTINUOUS,
+                                        samps_per_chan=int(sample_rate * buffer_seconds))
+        task.in_stream.over_write = OverwriteMode.OVERWRITE_UNREAD_SAMPLES
+        # callbacks must be registered before the task starts
+        task.register_every_n_samples_acquired_into_buffer_event(samples_per_block, callback)
+        self.block_callback = callback
+        self.clock_start_ns = self.get_elapsed_time_ns()
+        self.set_task_start(0)
+
+    def get_buffer_status(self):
+        """
+        Returns the state of the driver buffer of a buffered acquisition
+        :return: dictionary with buffer size, samples available to read, samples acquired and read position
+        """
+        in_stream = self.task_ai_ao[0].in_stream
+        return {
+            'buffer_size': in_stream.input_buf_size,
+            'available': in_stream.avail_samp_per_chan,
+            'acquired': in_stream.total_samp_per_chan_acquired,
+            'read_position': in_stream.curr_read_pos
+        }
+
+    def read_voltage_block(self, n_samples):
+        """
+        Reads a block of samples from a buffered acquisition, waiting until they have been acquired
+        :param n_samples: number of samples
+        :return: list of voltages in [V]
+        """
+        return self.task_ai_ao[0].read(number_of_samples_per_channel=n_samples,
+                                       timeout=n_samples / self.sample_rate + 1)
+
+    def read_latest_voltage_block(self, n_samples):
+        """
+        Reads the latest samples of a buffered acquisition, skipping any older unread ones. Used to resume reading
+        after unread samples have been overwritten.
+        :param n_samples: number of samples
+        :return: list of voltages in [V] and index of the first sample since the acquisition started
+        """
+        in_stream = self.task_ai_ao[0].in_stream
+        in_stream.relative_to = ReadRelativeTo.MOST_RECENT_SAMPLE
+        in_stream.offset = -n_samples
+        try:
+            voltages = self.read_voltage_block(n_samples)
+        finally:
+            in_stream.relative_to = ReadRelativeTo.CURRENT_READ_POSITION
+            in_stream.offset = 0
+        return voltages, in_stream.curr_read_pos - n_samples
+
+    def stop_buffered_acquisition(self):
+        """
+        Stops a buffered or callback acquisition and goes back to software timed single readings
+        :return:
+        """
+        self.set_task_stop(0)
+        if self.block_callback is not None:
+            self.task_ai_ao[0].register_every_n_samples_acquired_into_buffer_event(0, None)
+            self.block_callback = None
+        self.task_ai_ao[0].timing.samp_timing_type = SampleTimingType.ON_DEMAND
 
     def add_calibration_to_log(self, calibration):
         """
-        Adds calibration parameters to log
+        Adds calibration parameters to log and saves it to the library if there is one
         :param calibration: calibration object
         :return:
         """
         self.calibrations_log.append(calibration)
+        if self.calibration_library is not None:
+            calibration.set_sensor_id(self.sensor_id)
+            self.calibration_library.save(calibration)
 
-    def add_data(self, voltage_temperature: list, time_interval):
+    def add_data(self, voltage_temperature: list, time_ns=None):
         """
-        Given a voltage and temperature and time_interval, adds to data
+        Given a voltage and temperature, adds them to data with the time they were measured
         :param voltage_temperature: list [voltage, temperature]
-        :param time_interval: time interval between sampling
+        :param time_ns: time since the acquisition started in [ns], None to use the current time
         :return:
         """
         self.data.append(voltage_temperature)
-        self.add_time(time_interval)
+        self.add_time(time_ns)
 
-    def acquire_data(self, calibration, time_interval):
+    def add_block(self, times, voltages, temperatures):
         """
-        Reads voltage from DAQ, converts to temperature with calibration, adds points to data
-        :param time_interval:
-        :param calibration:
+        Adds a block of samples to data
+        :param times: time of every sample in [ns]
+        :param voltages: voltage of every sample
+        :param temperatures: temperature of every sample
         :return:
         """
-        # reads voltage
-        voltage = self.read_voltage()
-        # calculates temperature
-        temperature = calibration.calculate_temperature(voltage)
-        # adds data
-        self.add_data([voltage, temperature], time_interval)
+        self.data.extend([voltage, temperature] for voltage, temperature in zip(np.asarray(voltages).tolist(),
+                                                                                  np.asarray(temperatures).tolist()))
+        self.times.append(times)
+        self.pyramid.update(times, temperatures)
 
-    def add_time(self, time_interval):
-        if not self.time_intervals:
-            # If the list is empty, adds the first value starting from 0
-            self.time_intervals.append(0)
-        else:
-            # If the list is not empty, adds the next value with the given interval
-            self.time_intervals.append(int(self.time_intervals[-1] + time_interval))
-
-    def add_alarms_log(self, is_min):
-        alarm_entry = {
-            'Alarm Type': 'Below Minimum' if is_min else 'Above Maximum',
-            'Temperature': self[-1][1],
-            'Time Interval': self.time_intervals[-1]
+    def update_statistics(self, temperatures, times):
+        """
+        Updates run and window statistics with a block of new temperatures
+        :param temperatures: block of temperatures
+        :param times: time of each temperature in [ns]
+        :return:
+        """
+        self.run_statistics.update(temperatures, times)
+        self.window_statistics.update(temperatures, times)
+
+    def create_pipeline(self, calibration, extra_sinks=(), samples_per_block=1, use_callback=False):
+        """
+        Creates the acquisition pipeline: reads from the DAQ, filters, checks alarms, calibrates, derives the rate of
+        change, checks the trend alarms and updates the control loop, then stores the blocks and sends them to the
+        statistics, the publisher and the shared ring. With alarm monitoring it only reads, filters and checks the
+        alarms.
+        :param calibration: calibration object
+        :param extra_sinks: sinks added after the default ones, e.g. the plot
+        :param samples_per_block: 1 to read on demand, more to read blocks from a buffered acquisition
+        :param use_callback: True to have the driver hand over every block, started with pipeline.source.start
+        :return:
+        """
+        stages = [] if self.voltage_filter is None else [pt.FilterStage(self.voltage_filter)]
+        # alarms are checked on the voltages, the limits are inverted with the calibration
+        self.alarm_engine.set_calibration(calibration)
+        stages.append(pt.AlarmStage(self))
+        source = pt.CallbackSource(self, samples_per_block) if use_callback else pt.DAQSource(self, samples_per_block)
+        if self.monitoring:
+            # without the calibration stage, blocks checked in volts are never converted
+            self.check_monitoring(extra_sinks)
+            self.trigger_stage = None
+            self.pipeline = pt.Pipeline(source, stages, [])
+            return
+        stages += [pt.CalibrateStage(calibration), pt.DeriveStage(), pt.TrendStage(self)]
+        # the output is written after the alarms, so a tripped interlock holds it from the block that trips it
+        if self.controller is not None:
+            stages.append(pt.ControlStage(self))
+        # alarms are checked on every sample, only storing is limited to the samples around the trigger
+        self.trigger_stage = None if self.trigger is None else tt.TriggerStage(self.trigger, *self.trigger_window)
+        if self.trigger_stage is not None:
+            stages.append(self.trigger_stage)
+        # statistics are calculated with every sample, even those the deadband doesn't store
+        sinks = [self.create_recording_sink(pt.StoreSink(self)), pt.StatisticsSink(self)]
+        stream_sinks = []
+        if self.publisher is not None:
+            stream_sinks.append(pt.SocketSink(self.publisher))
+        if self.shared_ring is not None:
+            stream_sinks.append(pt.SharedMemorySink(self.shared_ring, self.sample_rate, calibration))
+        if self.sink_policy is not None:
+            # other processes are served from their own threads so they can't stall the acquisition
+            stream_sinks = [pt.QueuedSink(sink, self.sink_policy) for sink in stream_sinks]
+        sinks += stream_sinks
+        self.pipeline = pt.Pipeline(source, stages,
+                                    sinks + list(extra_sinks))
+
+    def check_monitoring(self, extra_sinks=()):
+        """
+        Checks nothing used in the acquisition needs the temperatures of every sample, which alarm monitoring doesn't
+        calculate. If anything does, raises an error.
+        :param extra_sinks: sinks the acquisition would add
+        :return:
+        """
+        uses = {
+            'trend alarms': self.alarm_rate is not None or self.alarm_time_to_limit is not None,
+            'a control loop': self.controller is not None,
+            'a trigger': self.trigger is not None,
+            'a publisher': self.publisher is not None,
+            'a shared memory ring': self.shared_ring is not None,
+            'other sinks': len(extra_sinks) > 0
         }
-        self.alarms_log.append(alarm_entry)
+        if any(uses.values()):
+            raise ValueError(f"Alarm monitoring only checks the temperature alarms.\n"
+                             f"Got {', '.join(name for name, is_used in uses.items() if is_used)} too.")
+
+    def create_recording_sink(self, sink):
+        """
+        Wraps a sink that records samples so it only gets the samples kept by the deadband, if there is one
+        :param sink: Sink object
+        :return: Sink object
+        """
+        if self.deadband is None:
+            return sink
+        max_interval = None if self.max_interval is None else round(self.max_interval * pt.NS_PER_MS)
+        return pt.Branch([pt.DeadbandStage(self.deadband, max_interval)], sink)
+
+    def close_pipeline(self):
+        """
+        Closes the sinks of the acquisition pipeline and removes it
+        :return:
+        """
+        if self.pipeline is not None:
+            try:
+                self.pipeline.close()
+            finally:
+                self.pipeline = None
+                self.trigger_stage = None
+
+    @prof.profiled
+    def acquire_data(self, calibration, time_interval=None):
+        """
+        Reads voltage from DAQ, converts to temperature with calibration, adds points to data
+        :param calibration: calibration object
+        :param time_interval: time between on demand readings in [ms], used to measure how late they are
+        :return:
+        """
+        if self.pipeline is None:
+            self.create_pipeline(calibration)
+        self.pipeline.source.set_read_interval(None if time_interval is None else round(time_interval * pt.NS_PER_MS))
+        self.pipeline.run_once()
+
+    def add_time(self, time_ns=None):
+        """
+        Adds the time a sample was measured
+        :param time_ns: time since the acquisition started in [ns], None to use the current time
+        :return:
+        """
+        self.times.append([self.get_elapsed_time_ns() if time_ns is None else time_ns])
+
+    def check_alarms(self, times, voltages=None, temperatures=None):
+        """
+        Checks a block with the alarm engine, which logs every alarm episode, and updates the alarm states
+        :param times: array with the time of every sample
+        :param voltages: array of voltages, None to check the temperatures
+        :param temperatures: array of temperatures, None if they haven't been calculated
+        :return: temperatures, None if they weren't given nor needed to check the alarms
+        """
+        temperatures = self.alarm_engine.update(times, voltages, temperatures)
+        self.alarm_states = self.alarm_engine.get_states()
+        self.update_interlock()
+        return temperatures
+
+    def check_trend_alarms(self, times, temperatures):
+        """
+        Fits the trend of a block and checks it with the rate and time to limit alarms, which log every episode
+        :param times: array with the time of every sample
+        :param temperatures: array of temperatures
+        :return: array with the fitted rate of change of every sample in [ºC/s]
+        """
+        rates = self.alarm_engine.update_trend(times, temperatures)
+        self.alarm_states = self.alarm_engine.get_states()
+        self.update_interlock()
+        return rates
 
     def clear_data_acquisition(self):
         """
@@ -301,12 +951,32 @@ class niDAQ:
         :return:
         """
         self.data.clear()
-        self.time_intervals.clear()
-        self.alarms_log.clear()
+        self.times.clear()
+        self.alarm_engine.clear()
+        self.alarm_states = [False] * len(at.alarm_types)
+        if self.interlock is not None:
+            self.interlock.clear()
+        if self.controller is not None:
+            self.controller.clear()
+        self.pyramid.clear()
+        self.plot_view = None
+        self.close_pipeline()
+        self.run_statistics.clear()
+        self.window_statistics.clear()
+        if self.voltage_filter is not None:
+            self.voltage_filter.reset()
+        if self.trigger is not None:
+            self.trigger.reset()
+        if self.shared_ring is not None:
+            self.shared_ring.reset()
         self.sample_rate = None
         self.n_samples = None
         self.start_acquisition_time = ""
+        self.start_time_ns = None
+        self.start_counter_ns = None
+        self.clock_start_ns = 0
 
+    @prof.profiled
     def save_data_acquisition(self, file_name):
         if not file_name.lower().endswith(".csv"):
             file_name += ".csv"
@@ -315,6 +985,7 @@ class niDAQ:
 
             # writes date and time
             writer.writerow([self.start_acquisition_time])
+            writer.writerow(["Start [ns since epoch]", self.start_time_ns])
             writer.writerow([])
 
             # writes calibration
@@ -322,27 +993,104 @@ class niDAQ:
             writer.writerow([self.calibration])
             writer.writerow([])
 
+            # writes voltage filter
+            writer.writerow(["FILTER"])
+            writer.writerow([repr(self.voltage_filter) if self.voltage_filter is not None else 'None'])
+            writer.writerow([])
+
+            # writes change based recording
+            writer.writerow(["RECORDING"])
+            writer.writerow(["Deadband [ºC]", "Max interval [ms]"])
+            writer.writerow([self.deadband, self.max_interval])
+            writer.writerow([])
+
+            # writes trigger
+            writer.writerow(["TRIGGER"])
+            if self.trigger is None:
+                writer.writerow(['None'])
+            else:
+                writer.writerow(["Trigger", "Pre-trigger samples", "Post-trigger samples", "Trigger time [ns]"])
+                writer.writerow([repr(self.trigger)] + self.trigger_window +
+                                [None if self.trigger_stage is None else self.trigger_stage.trigger_time])
+            writer.writerow([])
+
             # writes number of samples and sample rate
             writer.writerow(["PARAMETERS"])
             writer.writerow(["Number of samples", "Sample rate [Sa/s]"])
             writer.writerow([self.n_samples, self.sample_rate])
             writer.writerow([])
 
-            # writes alarm logs
+            # writes run summary
+            writer.writerow(["STATISTICS"])
+            writer.writerow(st.statistics_fieldnames)
+            writer.writerow(["Run"] + self.run_statistics.get_summary())
+            writer.writerow([f"Window ({self.window_statistics.length} samples)"] +
+                            self.window_statistics.get_summary())
+            writer.writerow([])
+
+            # writes alarm logs, one row per episode
             writer.writerow(["ALARM LOGS"])
-            writer.writerow(["Min alarm", "Max alarm"])
-            writer.writerow([self.alarm_min, self.alarm_max])
-            dic_writer = csv.DictWriter(file, fieldnames=alarm_log_fieldnames)
+            writer.writerow(["Min alarm", "Max alarm", "Hysteresis [ºC]", "Debounce [ms]", "Rate alarm [ºC/s]",
+                             "Time to limit alarm [s]", "Trend window [samples]", "Rate hysteresis [ºC/s]",
+                             "Time to limit hysteresis [s]"])
+            writer.writerow([self.alarm_min, self.alarm_max, self.alarm_hysteresis, self.alarm_debounce,
+                             self.alarm_rate, self.alarm_time_to_limit, self.alarm_trend_window] +
+                            [None if alarm is None else alarm.hysteresis
+                             for alarm in self.alarm_engine.alarms[len(at.threshold_alarm_types):]])
+            dic_writer = csv.DictWriter(file, fieldnames=at.alarm_log_fieldnames)
             dic_writer.writeheader()
-            for entry in self.alarms_log:
-                dic_writer.writerow(entry)
+            dic_writer.writerows(self.alarm_engine.log)
             writer.writerow([])
 
+            # writes interlock settings, how long it took to actuate and every time it was written
+            if self.interlock is not None:
+                writer.writerow(["INTERLOCK"])
+                writer.writerow(["Output", "Alarms", "Safe value", "Tripped value", "Latch"])
+                writer.writerow([self.interlock.interlock_type, " | ".join(self.interlock.alarm_types)] +
+                                self.interlock.get_values() + [self.interlock.latch])
+                writer.writerow(tm.histogram_fieldnames)
+                writer.writerows(self.interlock.latency.get_rows())
+                dic_writer = csv.DictWriter(file, fieldnames=it.interlock_log_fieldnames)
+                dic_writer.writeheader()
+                dic_writer.writerows(self.interlock.log)
+                writer.writerow([])
+
+            # writes control settings, how long after its block every output was written and every update of the loop
+            if self.controller is not None:
+                writer.writerow(["CONTROL"])
+                writer.writerow(["Kp [V/ºC]", "Ki [V/(ºC·s)]", "Kd [V·s/ºC]", "Setpoint profile", "Min output [V]",
+                                 "Max output [V]"])
+                writer.writerow([self.controller.kp, self.controller.ki, self.controller.kd, self.controller.profile] +
+                                self.controller.output_limits)
+                writer.writerow(tm.histogram_fieldnames)
+                writer.writerows(self.controller.latency.get_rows())
+                dic_writer = csv.DictWriter(file, fieldnames=control.control_log_fieldnames)
+                dic_writer.writeheader()
+                dic_writer.writerows(self.controller.log)
+                writer.writerow([])
+
+            # writes buffer and backpressure counters, time spent in every stage of the pipeline and how late reads were
+            if self.pipeline is not None:
+                writer.writerow(["BUFFER"])
+                writer.writerows(self.pipeline.get_counters().items())
+                writer.writerow([])
+                writer.writerow(["PIPELINE TIMING"])
+                writer.writerow(pt.pipeline_timing_fieldnames)
+                writer.writerows(self.pipeline.get_timing_report())
+                writer.writerow([])
+                writer.writerow(["JITTER"])
+                writer.writerow(tm.histogram_fieldnames)
+                writer.writerows(self.pipeline.source.jitter.get_rows())
+                writer.writerow([])
+
             # writes data
             writer.writerow(["DATA"])
-            writer.writerow(["Voltage [V]", "Temperature [ºC]"])
-            for voltage, temperature in self.data:
-                writer.writerow([voltage, temperature])
+            writer.writerow(["Voltage [V]", "Temperature [ºC]", "Time [ns]"])
+            for (voltage, temperature), time_ns in zip(self.data, self.times.get().tolist()):
+                writer.writerow([voltage, temperature, time_ns])
+
+        # saves the summary pyramid next to the data, so long runs can be browsed without reading every sample
+        self.pyramid.save(pyr.get_pyramid_file_name(file_name))
 
     def generate_index_list(self):
         """
@@ -351,25 +1099,18 @@ class niDAQ:
         """
         return [i for i in range(1, len(self.data) + 1)]
 
+    @prof.profiled
     def trigger_alarms(self, window, alarm_icon_keys):
         """
-        Checks if alarms should be triggered and if so logs and triggers them
+        Triggers the alarm icons with the alarm states checked by the pipeline
         :param window: gui window
         :param alarm_icon_keys: ['-MIN_TEMP_ICON-', '-MAX_TEMP_ICON-']
         :return:
         """
         if self.is_alarm_min_set():
-            if self[-1][1] < self.get_alarm_min():
-                self.add_alarms_log(is_min=True)
-                window[alarm_icon_keys[0]].metadata = True
-            else:
-                window[alarm_icon_keys[0]].metadata = False
+            window[alarm_icon_keys[0]].metadata = self.alarm_states[0]
         if self.is_alarm_max_set():
-            if self[-1][1] > self.get_alarm_max():
-                self.add_alarms_log(is_min=False)
-                window[alarm_icon_keys[1]].metadata = True
-            else:
-                window[alarm_icon_keys[1]].metadata = False
+            window[alarm_icon_keys[1]].metadata = self.alarm_states[1]
 
     def trigger_alarm_icon(self, window, alarm_icon_keys):
         # update min alarm image
@@ -381,28 +1122,41 @@ class niDAQ:
             source=gt.ALARM_MAX_ON_PATH if window[alarm_icon_keys[1]].metadata else
             (gt.ALARM_MAX_OFF_PATH if self.is_alarm_max_set() else gt.ALARM_UNSET_PATH))
 
+    def stop_data_acquisition(self):
+        """
+        Stops acquiring. Acquisitions in this process only read when perform_data_acquisition is called, so there is
+        nothing to stop; acquisitions in another process stop there.
+        :return:
+        """
+        pass
+
     def perform_data_acquisition(self, window, fig, figure_canvas_agg, calibration, time_interval, alarm_icon_keys):
+        if self.pipeline is None:
+            self.create_pipeline(calibration, [pt.PlotSink(self, fig, figure_canvas_agg)])
         self.acquire_data(calibration, time_interval)
-        self.update_figure(fig, figure_canvas_agg)
         self.trigger_alarms(window, alarm_icon_keys)
 
+    @prof.profiled
     def update_figure(self, fig, figure_canvas_agg):
         axes = fig.axes  # getting the subplots
         axes[0].clear()
-        axes[0].set_xlabel("Readings (ms)")
+        axes[0].set_xlabel("Time (s)")
         axes[0].set_ylabel("Temperature (ºC)")
         axes[0].grid()
         if self.has_data():
-            self.plot_temperature_points(axes)
+            # one point per pixel of the plot width
+            self.plot_temperature_points(axes, int(fig.get_size_inches()[0] * fig.dpi))
         if self.is_alarm_min_set() or self.is_alarm_max_set():
             self.plot_temperature_alarms(axes)
+        if self.plot_view is not None:
+            axes[0].set_xlim(np.divide(self.plot_view, pt.NS_PER_S))
 
         figure_canvas_agg.draw()
         figure_canvas_agg.get_tk_widget().pack(side='top', fill='both', expand=1)
 
     def plot_temperature_alarms(self, axes):
 
-        x = [0, self.time_intervals[-1] if self.has_data() else 10]
+        x = np.divide(self.get_plot_range(), pt.NS_PER_S)
 
         if self.is_alarm_min_set():
             y = [self.alarm_min] * 2
@@ -411,10 +1165,21 @@ class niDAQ:
             y = [self.alarm_max] * 2
             axes[0].plot(x, y, 'r--')
 
-    def plot_temperature_points(self, axes):
-        x = self.time_intervals
-        y = [temperature[1] for temperature in self.data]
-        axes[0].plot(x, y, color='orange', linestyle='-')
+    def plot_temperature_points(self, axes, n_points):
+        """
+        Plots the temperatures of the time range shown from the summary pyramid: the mean of every point and, when
+        points summarize several samples, the band between their min and max
+        :param axes: plot axes
+        :param n_points: maximum number of points plotted
+        :return:
+        """
+        start, end = self.get_plot_range()
+        buckets = self.pyramid.query(start, end, n_points, self.times.get(),
+                                     lambda first, last: [pair[1] for pair in self.data[first:last]])
+        seconds = buckets['start'] / pt.NS_PER_S
+        axes[0].plot(seconds, buckets['mean'], color='orange', linestyle='-')
+        if np.any(buckets['min'] != buckets['max']):
+            axes[0].fill_between(seconds, buckets['min'], buckets['max'], color='orange', alpha=0.3, linewidth=0)
 
     def set_task_start(self, index_ai_ao):
         self.task_ai_ao[index_ai_ao].start()
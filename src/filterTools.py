@@ -0,0 +1,220 @@
+from abc import ABC, abstractmethod
+
+import numpy as np
+from scipy.signal import butter, lfilter, lfilter_zi, sosfilt, sosfilt_zi
+
+# Filter type list
+filter_types = ['None', 'Moving Average', 'Single-pole IIR', 'Butterworth Low-pass', 'Median']
+
+# text shown next to the parameter input for every filter type
+filter_parameter_names = {
+    'None': '',
+    'Moving Average': 'Length [Sa]',
+    'Single-pole IIR': 'Alpha (0-1]',
+    'Butterworth Low-pass': 'Cutoff [Hz]',
+    'Median': 'Length [Sa]'
+}
+
+BUTTERWORTH_ORDER = 2
+
+
+class StreamFilter(ABC):
+    """
+    Filter parent class. Filters are applied to blocks of samples as they arrive and keep their state between
+    calls, so that filtering a signal in blocks gives the same result as filtering it at once, at O(block) per call.
+    """
+
+    def __init__(self, filter_type):
+        self.filter_type = filter_type
+
+    def __repr__(self):
+        return self.filter_type
+
+    @abstractmethod
+    def process(self, block):
+        """
+        Abstract method, filters a block of samples continuing from the previous block
+        :param block: array of samples
+        :return: array of filtered samples with the same length
+        """
+        pass
+
+    @abstractmethod
+    def reset(self):
+        """
+        Abstract method, clears filter state so the next block starts a new signal
+        :return:
+        """
+        pass
+
+
+class MovingAverageFilter(StreamFilter):
+    """
+    Moving average over the latest n samples. While there are less than n samples it averages the available ones.
+    """
+
+    def __init__(self, length):
+        if length < 1:
+            raise ValueError(f"Moving average length must be at least 1.\nGot {length} instead.")
+        super().__init__('Moving Average')
+        self.length = int(length)
+        self.history = np.empty(0)
+
+    def __repr__(self):
+        return f"{self.filter_type} ({self.length} Sa)"
+
+    def process(self, block):
+        block = np.asarray(block, dtype=float)
+        extended = np.concatenate((self.history, block))
+        cumulative = np.concatenate(([0.0], np.cumsum(extended)))
+        end = np.arange(len(self.history), len(extended)) + 1
+        start = np.maximum(end - self.length, 0)
+        self.history = extended[-(self.length - 1):] if self.length > 1 else np.empty(0)
+        return (cumulative[end] - cumulative[start]) / (end - start)
+
+    def reset(self):
+        self.history = np.empty(0)
+
+
+class SinglePoleIIRFilter(StreamFilter):
+    """
+    Exponential smoothing y[n] = y[n-1] + alpha * (x[n] - y[n-1]). The first sample initializes the output.
+    """
+
+    def __init__(self, alpha):
+        if not 0 < alpha <= 1:
+            raise ValueError(f"Alpha must be between 0 and 1.\nGot {alpha} instead.")
+        super().__init__('Single-pole IIR')
+        self.alpha = alpha
+        self.b = [alpha]
+        self.a = [1, alpha - 1]
+        self.zi = None
+
+    def __repr__(self):
+        return f"{self.filter_type} (alpha = {self.alpha})"
+
+    def process(self, block):
+        block = np.asarray(block, dtype=float)
+        if block.size == 0:
+            return block
+        if self.zi is None:
+            self.zi = lfilter_zi(self.b, self.a) * block[0]
+        filtered, self.zi = lfilter(self.b, self.a, block, zi=self.zi)
+        return filtered
+
+    def reset(self):
+        self.zi = None
+
+
+class ButterworthFilter(StreamFilter):
+    """
+    Low-pass Butterworth filter implemented as second order sections. The first sample initializes the state as a
+    steady signal, avoiding the start transient.
+    """
+
+    def __init__(self, cutoff, sample_rate, order=BUTTERWORTH_ORDER):
+        if not 0 < cutoff < sample_rate / 2:
+            raise ValueError(f"Cutoff must be between 0 and {sample_rate / 2:.3f} Hz (half the sample rate).\n"
+                             f"Got {cutoff} instead.")
+        super().__init__('Butterworth Low-pass')
+        self.cutoff = cutoff
+        self.sample_rate = sample_rate
+        self.order = order
+        self.sos = butter(order, cutoff, btype='lowpass', output='sos', fs=sample_rate)
+        self.zi = None
+
+    def __repr__(self):
+        return f"{self.filter_type} (order {self.order}, {self.cutoff} Hz at {self.sample_rate:.3f} Sa/s)"
+
+    def process(self, block):
+        block = np.asarray(block, dtype=float)
+        if block.size == 0:
+            return block
+        if self.zi is None:
+            self.zi = sosfilt_zi(self.sos) * block[0]
+        filtered, self.zi = sosfilt(self.sos, block, zi=self.zi)
+        return filtered
+
+    def reset(self):
+        self.zi = None
+
+
+class MedianFilter(StreamFilter):
+    """
+    Median over the latest n samples. Before n samples have arrived the window is padded with the first sample.
+    """
+
+    def __init__(self, length):
+        if length < 1:
+            raise ValueError(f"Median length must be at least 1.\nGot {length} instead.")
+        super().__init__('Median')
+        self.length = int(length)
+        self.history = None
+
+    def __repr__(self):
+        return f"{self.filter_type} ({self.length} Sa)"
+
+    def process(self, block):
+        block = np.asarray(block, dtype=float)
+        if block.size == 0:
+            return block
+        if self.history is None:
+            self.history = np.full(self.length - 1, block[0])
+        extended = np.concatenate((self.history, block))
+        windows = np.lib.stride_tricks.sliding_window_view(extended, self.length)
+        self.history = extended[len(extended) - (self.length - 1):]
+        return np.median(windows, axis=1)
+
+    def reset(self):
+        self.history = None
+
+
+def _get_length(parameter):
+    """
+    Private method that checks a filter length is a whole number of samples, e.g. 5 or 5.0 from a gui input
+    :param parameter: length in samples
+    :return: length as int
+    """
+    if float(parameter) < 1 or not float(parameter).is_integer():
+        raise ValueError(f"Filter length must be a positive integer.\nGot {parameter} instead.")
+    return int(parameter)
+
+
+def create_filter(filter_type, parameter=None, sample_rate=None):
+    """
+    Creates a filter given its type and parameter
+    :param filter_type: one of filter_types
+    :param parameter: length in samples, alpha or cutoff frequency in [Hz], depending on the filter type
+    :param sample_rate: sample rate in [Sa/s], only used by the Butterworth filter
+    :return: StreamFilter object, None if filter_type is 'None'
+    """
+    match filter_type:
+        case 'None':
+            return None
+        case 'Moving Average':
+            return MovingAverageFilter(_get_length(parameter))
+        case 'Single-pole IIR':
+            return SinglePoleIIRFilter(float(parameter))
+        case 'Butterworth Low-pass':
+            if sample_rate is None:
+                raise ValueError("Butterworth filter needs a sample rate.")
+            return ButterworthFilter(float(parameter), sample_rate)
+        case 'Median':
+            return MedianFilter(_get_length(parameter))
+        case _:
+            raise ValueError(f"No matching filter found.\nExpected: {filter_types}\nGot: {filter_type}.")
+
+
+def filter_signal(stream_filter, signal, block_size=1024):
+    """
+    Filters a whole signal in blocks from a clean filter state, used to reprocess saved runs offline
+    :param stream_filter: StreamFilter object
+    :param signal: array of samples
+    :param block_size: number of samples filtered per call
+    :return: array of filtered samples
+    """
+    signal = np.asarray(signal, dtype=float)
+    stream_filter.reset()
+    filtered = [stream_filter.process(signal[i:i + block_size]) for i in range(0, len(signal), block_size)]
+    stream_filter.reset()
+    return np.concatenate(filtered) if filtered else np.empty(0)
@@ -1,9 +1,26 @@
+import src.alarmTools as at
+import src.filterTools as ft
 import src.guiTools as gt
+import src.interlockTools as it
+import src.pipelineTools as pt
+import src.profilingTools as prof
+import src.statisticsTools as st
+import src.triggerTools as tt
 from src.guiTools import sg
 
+PLOT_ZOOM_FACTOR = 2
+PLOT_PAN_FRACTION = 0.25  # fraction of the time range shown the plot moves
+PLOT_MIN_RANGE_NS = 10 * pt.NS_PER_MS
+
 alarm_input_keys = ['-MIN_TEMP_INPUT-', '-MAX_TEMP_INPUT-']
+alarm_hysteresis_input_keys = ['-ALARM_HYSTERESIS_INPUT-', '-ALARM_DEBOUNCE_INPUT-']
+alarm_trend_input_keys = ['-ALARM_RATE_INPUT-', '-ALARM_TIME_TO_LIMIT_INPUT-']
+alarm_trend_hysteresis_input_keys = ['-ALARM_RATE_HYSTERESIS_INPUT-', '-ALARM_TIME_TO_LIMIT_HYSTERESIS_INPUT-']
 alarm_icon_keys = ['-MIN_ALARM_ICON-', '-MAX_ALARM_ICON-']
 parameters_input_keys = ['-N_SAMPLES_INPUT-', '-SAMPLE_RATE_INPUT-']
+plot_view_keys = ['-PAN_LEFT-', '-ZOOM_OUT-', '-ZOOM_FIT-', '-ZOOM_IN-', '-PAN_RIGHT-']
+trigger_input_keys = ['-TRIGGER_LEVEL_INPUT-', '-TRIGGER_HYSTERESIS_INPUT-', '-TRIGGER_PRE_INPUT-',
+                      '-TRIGGER_POST_INPUT-']
 
 
 def data_acquisition_window(calibration_expression):
@@ -43,7 +60,23 @@ def data_acquisition_window(calibration_expression):
                     [sg.Push(), sg.Button('Set', k='-SET-')],
                     [sg.Push(), sg.Button('Disable', k='-DISABLE-', visible=False)]
                 ], element_justification='right')
-            ]
+            ],
+            [sg.Text('Max rate:', pad=((10, 0), 0)),
+             sg.Input(size=gt.SIZE_INPUT, key='-ALARM_RATE_INPUT-', enable_events=True),
+             sg.Text('[ºC/s]  Time to limit:'),
+             sg.Input(size=gt.SIZE_INPUT, key='-ALARM_TIME_TO_LIMIT_INPUT-', enable_events=True),
+             sg.Text('[s]')],
+            [sg.Text('Rate hysteresis:', pad=((10, 0), 0)),
+             sg.Input(size=gt.SIZE_INPUT, key='-ALARM_RATE_HYSTERESIS_INPUT-', enable_events=True),
+             sg.Text('[ºC/s]  Time to limit hysteresis:'),
+             sg.Input(size=gt.SIZE_INPUT, key='-ALARM_TIME_TO_LIMIT_HYSTERESIS_INPUT-', enable_events=True),
+             sg.Text('[s]')],
+            [sg.Text('', key='-TREND_ALARM_TXT-', pad=((10, 0), 0))],
+            [sg.Text('Hysteresis:', pad=((10, 0), (0, 10))),
+             sg.Input('0', size=gt.SIZE_INPUT, key='-ALARM_HYSTERESIS_INPUT-', enable_events=True, pad=(0, (0, 10))),
+             sg.Text('[ºC]  Debounce:', pad=(0, (0, 10))),
+             sg.Input('0', size=gt.SIZE_INPUT, key='-ALARM_DEBOUNCE_INPUT-', enable_events=True, pad=(0, (0, 10))),
+             sg.Text('[ms]', pad=((0, 10), (0, 10)))]
         ], expand_x=True, pad=(10, 10), relief=sg.RELIEF_SUNKEN)],
         [sg.Frame('Choose Data Acquisition Type:', [
             [sg.Radio(gt.DATA_ON_DEMAND,
@@ -62,6 +95,43 @@ def data_acquisition_window(calibration_expression):
                       disabled_readonly_background_color=sg.theme_button_color()[1], pad=(0, (0, 10))),
              sg.Text('Sa/s', pad=((0, 10), (0, 10)))]
         ], expand_x=True, pad=(10, 10), relief=sg.RELIEF_SUNKEN)],
+        [sg.Frame('Voltage Filter', [
+            [sg.Combo(ft.filter_types, default_value='None', key='-FILTER_TYPE-', readonly=True, enable_events=True,
+                      pad=(10, 10)),
+             sg.Text('', key='-FILTER_PARAMETER_TXT-'),
+             sg.Input(size=gt.SIZE_INPUT, key='-FILTER_PARAMETER_INPUT-', disabled=True, enable_events=True,
+                      disabled_readonly_background_color=sg.theme_button_color()[1])]
+        ], expand_x=True, pad=(10, 10), relief=sg.RELIEF_SUNKEN)],
+        [sg.Frame('Trigger', [
+            [sg.Combo(tt.trigger_types, default_value='None', key='-TRIGGER_TYPE-', readonly=True,
+                      enable_events=True, pad=(10, (10, 0))),
+             sg.Combo(tt.trigger_directions, default_value='Rising', key='-TRIGGER_DIRECTION-', readonly=True,
+                      disabled=True, pad=(0, (10, 0)))],
+            [sg.Text('', key='-TRIGGER_LEVEL_TXT-', pad=((10, 0), 0)),
+             sg.Input(size=gt.SIZE_INPUT, key='-TRIGGER_LEVEL_INPUT-', disabled=True, enable_events=True,
+                      disabled_readonly_background_color=sg.theme_button_color()[1]),
+             sg.Text('Hysteresis:'),
+             sg.Input('0', size=gt.SIZE_INPUT, key='-TRIGGER_HYSTERESIS_INPUT-', disabled=True, enable_events=True,
+                      disabled_readonly_background_color=sg.theme_button_color()[1])],
+            [sg.Text('Pre-trigger:', pad=((10, 0), (0, 10))),
+             sg.Input('100', size=gt.SIZE_INPUT, key='-TRIGGER_PRE_INPUT-', disabled=True, enable_events=True,
+                      disabled_readonly_background_color=sg.theme_button_color()[1], pad=(0, (0, 10))),
+             sg.Text('Post-trigger:', pad=(0, (0, 10))),
+             sg.Input('1000', size=gt.SIZE_INPUT, key='-TRIGGER_POST_INPUT-', disabled=True, enable_events=True,
+                      disabled_readonly_background_color=sg.theme_button_color()[1], pad=(0, (0, 10))),
+             sg.Text('samples', pad=((0, 10), (0, 10)))]
+        ], expand_x=True, pad=(10, 10), relief=sg.RELIEF_SUNKEN)],
+        [sg.Frame('Interlock', [
+            [sg.Combo(it.interlock_types, default_value='None', key='-INTERLOCK_TYPE-', readonly=True,
+                      enable_events=True, pad=(10, 10)),
+             sg.Text('Tripped:'),
+             sg.Input(str(it.DEFAULT_TRIPPED_VOLTAGE), size=gt.SIZE_INPUT, key='-INTERLOCK_VOLTAGE_INPUT-',
+                      disabled=True, enable_events=True,
+                      disabled_readonly_background_color=sg.theme_button_color()[1]),
+             sg.Text('[V]'),
+             sg.Checkbox('Latch', key='-INTERLOCK_LATCH-', disabled=True),
+             sg.Button('Reset', k='-INTERLOCK_RESET-', disabled=True, pad=((0, 10), 10))]
+        ], expand_x=True, pad=(10, 10), relief=sg.RELIEF_SUNKEN)],
         [sg.Push(), sg.Button('Acquire Data', k='-ACQUIRE-', metadata=False)],
         [sg.Frame('Time Interval [ms]', [
             [sg.Slider(range=(gt.MIN_TIME_UPDATE_MS, gt.MAX_TIME_INTERVAL_MS), default_value=500, resolution=10,
@@ -77,6 +147,19 @@ def data_acquisition_window(calibration_expression):
          sg.Text("Samples Collected: ", key='-SAMPLES_COLLECTED_TXT-', visible=False),
          sg.Text("", key='-SAMPLES_COLLECTED_VALUE-', size=gt.SIZE_INPUT, visible=False)],
         [sg.Canvas(k='-CANVAS-', size=(200, 200))],
+        [sg.Button('◀', k='-PAN_LEFT-'), sg.Button('−', k='-ZOOM_OUT-'), sg.Button('Fit', k='-ZOOM_FIT-'),
+         sg.Button('+', k='-ZOOM_IN-'), sg.Button('▶', k='-PAN_RIGHT-')],
+        [sg.Frame('Statistics', [
+            [sg.Text('Run:', size=(7, 1)), sg.Text(st.format_summary([None] * 5), key='-RUN_STATS_TXT-')],
+            [sg.Text('Window:', size=(7, 1)), sg.Text(st.format_summary([None] * 5), key='-WINDOW_STATS_TXT-')],
+            [sg.Text('Window length:'),
+             sg.Input(str(st.DEFAULT_WINDOW_LENGTH), size=gt.SIZE_INPUT, key='-STATS_WINDOW_INPUT-',
+                      enable_events=True),
+             sg.Text('samples')]
+        ], expand_x=True, pad=(10, 0), relief=sg.RELIEF_SUNKEN)],
+        [sg.Frame('Buffer', [
+            [sg.Text('No acquisition', key='-BUFFER_TXT-', size=(60, 3))]
+        ], expand_x=True, pad=(10, (10, 0)), relief=sg.RELIEF_SUNKEN)],
         [sg.Button('Stop', k='-STOP-', visible=False, pad=(10, 10)),
          sg.Button('Reset', k='-RESET-', visible=False, pad=(10, 10))],
         [sg.Push(), sg.Button('Save Data', k='-SAVE-', visible=False)]
@@ -90,6 +173,125 @@ def data_acquisition_window(calibration_expression):
     return gt.gui_window_with_graph('Data Acquisition', layout, gt.FIG_SIZE_WIDTH, gt.FIG_SIZE_HEIGHT, False)
 
 
+def set_voltage_filter(niDAQ, values, sample_rate):
+    """
+    Creates the voltage filter chosen by the user and assigns it to the DAQ
+    :param niDAQ: object where the filter will be stored
+    :param values: list of values in gui window
+    :param sample_rate: sample rate of the acquisition in [Sa/s]
+    :return:
+    """
+    filter_type = values['-FILTER_TYPE-']
+    if filter_type == 'None':
+        niDAQ.set_filter(None)
+    else:
+        [parameter] = gt.check_if_valid_input(values, gt.N_DECIMALS, '-FILTER_PARAMETER_INPUT-')
+        niDAQ.set_filter(ft.create_filter(filter_type, parameter, sample_rate))
+
+
+def set_trend_alarms(niDAQ, values):
+    """
+    Sets the rate and time to limit alarms whose inputs aren't empty
+    :param niDAQ: object where the alarms will be stored
+    :param values: list of values in gui window
+    :return:
+    """
+    for key, set_alarm in zip(alarm_trend_input_keys, [niDAQ.set_alarm_rate, niDAQ.set_alarm_time_to_limit]):
+        if values[key] == "":
+            continue
+        [limit] = gt.check_if_valid_input(values, gt.N_DECIMALS, key)
+        if limit <= 0:
+            raise ValueError(f"Rate and time to limit alarms must be positive.\nGot {limit} instead.")
+        set_alarm(limit)
+    if values['-ALARM_TIME_TO_LIMIT_INPUT-'] != "" and not (niDAQ.is_alarm_min_set() or niDAQ.is_alarm_max_set()):
+        raise ValueError("Time to limit alarm needs a min or max alarm to predict")
+
+
+def set_trend_alarm_hysteresis(niDAQ, values):
+    """
+    Sets the hysteresis of the rate and time to limit alarms, empty inputs take at.DEFAULT_TREND_HYSTERESIS of the limit
+    :param niDAQ: object where the hysteresis will be stored
+    :param values: list of values in gui window
+    :return:
+    """
+    hysteresis = [None if values[key] == "" else gt.check_if_valid_input(values, gt.N_DECIMALS, key)[0]
+                  for key in alarm_trend_hysteresis_input_keys]
+    niDAQ.set_alarm_trend_hysteresis(*hysteresis)
+
+
+def set_interlock(niDAQ, values):
+    """
+    Creates the interlock chosen by the user, tripped by any alarm, and assigns it to the DAQ
+    :param niDAQ: object where the interlock will be stored
+    :param values: list of values in gui window
+    :return:
+    """
+    interlock_type = values['-INTERLOCK_TYPE-']
+    value = None
+    if interlock_type == 'Analog Output':
+        [value] = gt.check_if_valid_input(values, gt.N_DECIMALS, '-INTERLOCK_VOLTAGE_INPUT-')
+    niDAQ.set_interlock(interlock_type, at.alarm_types, value, values['-INTERLOCK_LATCH-'])
+
+
+def format_trend_alarms(niDAQ):
+    """
+    Formats the limits and states of the trend alarms to be shown in the gui
+    :param niDAQ: object with the alarms
+    :return: string with the alarms
+    """
+    names = ['Rate', 'Time to limit']
+    limits = [niDAQ.alarm_rate, niDAQ.alarm_time_to_limit]
+    states = niDAQ.alarm_states[len(at.threshold_alarm_types):]
+    return "   ".join(f"{name}: " + ('Unset' if limit is None else
+                                     f"{limit} [{at.alarm_units[alarm_type]}] {'ON' if state else 'OFF'}")
+                      for name, alarm_type, limit, state in zip(names, at.trend_alarm_types, limits, states))
+
+
+def move_plot_view(niDAQ, event):
+    """
+    Zooms or pans the time range shown in the plot
+    :param niDAQ: object with the plot view
+    :param event: one of plot_view_keys
+    :return:
+    """
+    if event == '-ZOOM_FIT-':
+        niDAQ.set_plot_view(None)
+        return
+    start, end = niDAQ.get_plot_range()
+    center, width = (start + end) / 2, end - start
+    match event:
+        case '-ZOOM_IN-':
+            width = max(width / PLOT_ZOOM_FACTOR, PLOT_MIN_RANGE_NS)
+        case '-ZOOM_OUT-':
+            width *= PLOT_ZOOM_FACTOR
+        case '-PAN_LEFT-':
+            center -= width * PLOT_PAN_FRACTION
+        case '-PAN_RIGHT-':
+            center += width * PLOT_PAN_FRACTION
+    niDAQ.set_plot_view([center - width / 2, center + width / 2])
+
+
+def set_trigger(niDAQ, values):
+    """
+    Creates the trigger chosen by the user and assigns it to the DAQ
+    :param niDAQ: object where the trigger will be stored
+    :param values: list of values in gui window
+    :return:
+    """
+    trigger_type = values['-TRIGGER_TYPE-']
+    if trigger_type == 'None':
+        niDAQ.set_trigger(None)
+    else:
+        level, hysteresis = gt.check_if_valid_input(values, gt.N_DECIMALS, '-TRIGGER_LEVEL_INPUT-',
+                                                    '-TRIGGER_HYSTERESIS_INPUT-')
+        pre_samples, post_samples = gt.check_if_valid_input(values, 0, '-TRIGGER_PRE_INPUT-', '-TRIGGER_POST_INPUT-')
+        if not 0 <= pre_samples <= 100000 or not 1 <= post_samples <= 100000:
+            raise ValueError(f"Pre-trigger samples must be between 0 and 100k and post-trigger samples between 1 "
+                             f"and 100k.\nGot {pre_samples} and {post_samples} instead.")
+        niDAQ.set_trigger(tt.create_trigger(trigger_type, level, values['-TRIGGER_DIRECTION-'], hysteresis),
+                          int(pre_samples), int(post_samples))
+
+
 def data_acquisition_window_behavior(niDAQ, window, fig, figure_canvas_agg):
     """
     Data acquisition window behavior
@@ -104,7 +306,9 @@ def data_acquisition_window_behavior(niDAQ, window, fig, figure_canvas_agg):
     max_frequency = gt.calculate_frequency(gt.MIN_TIME_UPDATE_MS) * 1000
 
     while True:
-        event, values = window.read(timeout=time_interval)
+        # time spent waiting for events and redrawing the window
+        with prof.profile_block('data_acquisition_window.read'):
+            event, values = window.read(timeout=time_interval)
         if event == sg.WIN_CLOSED:
             niDAQ.set_exit_request()
             break
@@ -116,15 +320,73 @@ def data_acquisition_window_behavior(niDAQ, window, fig, figure_canvas_agg):
         if event in alarm_input_keys:
             gt.filter_numeric_characters(window, values, event, alarm_input_keys)
 
+        # only accepts digits and decimal point '.'
+        if event in alarm_hysteresis_input_keys:
+            gt.filter_numeric_characters(window, values, event, alarm_hysteresis_input_keys)
+
+        # only accepts digits and decimal point '.'
+        if event in alarm_trend_input_keys:
+            gt.filter_numeric_characters(window, values, event, alarm_trend_input_keys)
+
+        # only accepts digits and decimal point '.'
+        if event in alarm_trend_hysteresis_input_keys:
+            gt.filter_numeric_characters(window, values, event, alarm_trend_hysteresis_input_keys)
+
         # only accepts digits
         if event in parameters_input_keys:
             gt.filter_digits(window, values, event, ['-N_SAMPLES_INPUT-'])
             gt.filter_numeric_characters(window, values, event, ['-SAMPLE_RATE_INPUT-'])
 
+        if event == '-FILTER_TYPE-':
+            window['-FILTER_PARAMETER_TXT-'].update(ft.filter_parameter_names[values['-FILTER_TYPE-']])
+            gt.set_disabled(window, values['-FILTER_TYPE-'] == 'None', '-FILTER_PARAMETER_INPUT-')
+            gt.empty_inputs(window, '-FILTER_PARAMETER_INPUT-')
+
+        if event in plot_view_keys:
+            move_plot_view(niDAQ, event)
+            niDAQ.update_figure(fig, figure_canvas_agg)
+
+        if event == '-TRIGGER_TYPE-':
+            window['-TRIGGER_LEVEL_TXT-'].update(tt.trigger_level_names[values['-TRIGGER_TYPE-']])
+            gt.set_disabled(window, values['-TRIGGER_TYPE-'] == 'None', '-TRIGGER_DIRECTION-', *trigger_input_keys)
+
+        # only accepts digits, decimal point '.' and '-'
+        if event in trigger_input_keys[:2]:
+            gt.filter_numeric_characters(window, values, event, trigger_input_keys[:2])
+
+        # only accepts digits
+        if event in trigger_input_keys[2:]:
+            gt.filter_digits(window, values, event, trigger_input_keys[2:])
+
+        if event == '-INTERLOCK_TYPE-':
+            gt.set_disabled(window, values['-INTERLOCK_TYPE-'] != 'Analog Output', '-INTERLOCK_VOLTAGE_INPUT-')
+            gt.set_disabled(window, values['-INTERLOCK_TYPE-'] == 'None', '-INTERLOCK_LATCH-', '-INTERLOCK_RESET-')
+
+        # only accepts digits and decimal point '.'
+        if event == '-INTERLOCK_VOLTAGE_INPUT-':
+            gt.filter_numeric_characters(window, values, event, ['-INTERLOCK_VOLTAGE_INPUT-'])
+
+        if event == '-INTERLOCK_RESET-':
+            niDAQ.reset_interlock()
+
+        # only accepts digits and decimal point '.'
+        if event == '-FILTER_PARAMETER_INPUT-':
+            gt.filter_numeric_characters(window, values, event, ['-FILTER_PARAMETER_INPUT-'])
+
+        # only accepts digits
+        if event == '-STATS_WINDOW_INPUT-':
+            gt.filter_digits(window, values, event, ['-STATS_WINDOW_INPUT-'])
+
         if event == '-SET-':
             try:
-                # checks if both inputs are empty
-                if all(values[key] == "" for key in alarm_input_keys):
+                hysteresis, debounce = gt.check_if_valid_input(values, gt.N_DECIMALS, *alarm_hysteresis_input_keys)
+                if hysteresis < 0 or debounce < 0:
+                    raise ValueError(f"Alarm hysteresis and debounce can't be negative.\n"
+                                     f"Got {hysteresis} and {debounce} instead.")
+                niDAQ.set_alarm_hysteresis(hysteresis, debounce)
+                set_trend_alarm_hysteresis(niDAQ, values)
+                # checks if every input is empty
+                if all(values[key] == "" for key in alarm_input_keys + alarm_trend_input_keys):
                     raise ValueError("Values must be assigned")
                 elif all(values[key] != "" for key in alarm_input_keys):
                     alarm_min, alarm_max = gt.to_number_n_dec(gt.N_DECIMALS, values['-MIN_TEMP_INPUT-'],
@@ -146,13 +408,14 @@ def data_acquisition_window_behavior(niDAQ, window, fig, figure_canvas_agg):
                             raise ValueError("Max alarm can't be bigger or equal to already set min alarm")
                         else:
                             niDAQ.set_alarm_max(alarm_max)
+                set_trend_alarms(niDAQ, values)
                 niDAQ.update_figure(fig, figure_canvas_agg)
                 niDAQ.trigger_alarm_icon(window, alarm_icon_keys)
                 gt.set_visible(window, True, '-DISABLE-')
             except Exception as e:
                 sg.popup_error(str(e), title="Error")
 
-            gt.empty_inputs(window, '-MIN_TEMP_INPUT-', '-MAX_TEMP_INPUT-')
+            gt.empty_inputs(window, '-MIN_TEMP_INPUT-', '-MAX_TEMP_INPUT-', *alarm_trend_input_keys)
 
         if event == '-DISABLE-':
             niDAQ.disable_alarms()
@@ -172,13 +435,30 @@ def data_acquisition_window_behavior(niDAQ, window, fig, figure_canvas_agg):
             # saves moment in time when acquisition starts
             niDAQ.clear_data_acquisition()
             niDAQ.set_time_log()
+            try:
+                [window_length] = gt.check_if_valid_input(values, 0, '-STATS_WINDOW_INPUT-')
+                if not 2 <= window_length <= 10000:
+                    raise ValueError(f"Statistics window must be between 2 and 10k samples.\n"
+                                     f"Got {window_length} instead.")
+                niDAQ.set_statistics_window(window_length)
+            except Exception as e:
+                sg.popup_error(str(e), title="Error")
+                window['-STATS_WINDOW_INPUT-'].update(str(niDAQ.window_statistics.length))
             # if on demand data acquisition is selected
             if values['-ON_DEMAND-']:
-                # from not reading to on demand
-                window['-ACQUIRE-'].metadata = True
-                gt.set_visible(window, True, '-STOP-', '-TIME_INTERVAL-')
-                gt.set_visible(window, False, '-SAVE-')
-                gt.set_disabled(window, True, '-FINITE_SAMPLING-')
+                try:
+                    # filter is designed for the time interval set when the acquisition starts
+                    set_voltage_filter(niDAQ, values, gt.calculate_frequency(values['-SLIDER-']) * 1000)
+                    set_trigger(niDAQ, values)
+                    set_interlock(niDAQ, values)
+                    # from not reading to on demand
+                    window['-ACQUIRE-'].metadata = True
+                    gt.set_visible(window, True, '-STOP-', '-TIME_INTERVAL-')
+                    gt.set_visible(window, False, '-SAVE-')
+                    gt.set_disabled(window, True, '-FINITE_SAMPLING-')
+                except Exception as e:
+                    sg.popup_error(str(e), title="Error")
+                    gt.empty_inputs(window, '-FILTER_PARAMETER_INPUT-', '-TRIGGER_LEVEL_INPUT-')
             elif values['-FINITE_SAMPLING-']:
                 try:
                     [sample_rate] = gt.check_if_valid_input(values, gt.N_DECIMALS, '-SAMPLE_RATE_INPUT-')
@@ -191,6 +471,9 @@ def data_acquisition_window_behavior(niDAQ, window, fig, figure_canvas_agg):
                         raise ValueError(f"Number of samples must be between  2 and 10k.\n"
                                          f"Got {n_samples} instead.")
                     else:
+                        set_voltage_filter(niDAQ, values, sample_rate)
+                        set_trigger(niDAQ, values)
+                        set_interlock(niDAQ, values)
                         niDAQ.set_sample_rate(sample_rate)
                         niDAQ.set_n_samples(n_samples)
                         # from not reading to finite sampling
@@ -204,6 +487,7 @@ def data_acquisition_window_behavior(niDAQ, window, fig, figure_canvas_agg):
                     gt.empty_inputs(window, '-SAMPLE_RATE_INPUT-', '-N_SAMPLES_INPUT-')
 
         if event == '-STOP-':
+            niDAQ.stop_data_acquisition()
             window['-ACQUIRE-'].metadata = False
             gt.set_visible(window, False, '-STOP-')
             gt.set_visible(window, True, '-RESET-', '-ACQUIRE-')
@@ -230,10 +514,14 @@ def data_acquisition_window_behavior(niDAQ, window, fig, figure_canvas_agg):
         if event == '-RESET-':
             niDAQ.clear_data_acquisition()
             niDAQ.update_figure(fig, figure_canvas_agg)
+            window['-RUN_STATS_TXT-'].update(st.format_summary([None] * 5))
+            window['-WINDOW_STATS_TXT-'].update(st.format_summary([None] * 5))
+            window['-BUFFER_TXT-'].update('No acquisition')
             gt.set_visible(window, False, '-RESET-', '-SAVE-', '-SAMPLES_COLLECTED_TXT-', '-SAMPLES_COLLECTED_VALUE-')
 
         window['-MIN_TEMP_TXT-'].update(f"{niDAQ.get_alarm_min()} [ºC]" if niDAQ.is_alarm_min_set() else 'Unset')
         window['-MAX_TEMP_TXT-'].update(f"{niDAQ.get_alarm_max()} [ºC]" if niDAQ.is_alarm_max_set() else 'Unset')
+        window['-TREND_ALARM_TXT-'].update(format_trend_alarms(niDAQ))
 
         if window['-ACQUIRE-'].metadata:
             gt.set_disabled(window, True, '-N_SAMPLES_INPUT-', '-SAMPLE_RATE_INPUT-')
@@ -253,7 +541,17 @@ def data_acquisition_window_behavior(niDAQ, window, fig, figure_canvas_agg):
                     gt.set_visible(window, False, '-STOP-')
             else:
                 raise ValueError("Acquiring data incorrectly")
+            # a triggered acquisition ends once its post-trigger window is recorded
+            if niDAQ.is_trigger_finished() and window['-ACQUIRE-'].metadata:
+                window['-ACQUIRE-'].metadata = False
+                gt.set_visible(window, True, '-RESET-', '-SAVE-', '-ACQUIRE-')
+                gt.set_visible(window, False, '-STOP-')
+                gt.set_disabled(window, False, '-FINITE_SAMPLING-')
             window['-SAMPLES_COLLECTED_VALUE-'].update(len(niDAQ))
+            window['-RUN_STATS_TXT-'].update(st.format_summary(niDAQ.run_statistics.get_summary()))
+            window['-WINDOW_STATS_TXT-'].update(st.format_summary(niDAQ.window_statistics.get_summary()))
+            if niDAQ.get_counters() is not None:
+                window['-BUFFER_TXT-'].update(pt.format_counters(niDAQ.get_counters()))
             niDAQ.trigger_alarm_icon(window, alarm_icon_keys)
 
         else:
@@ -74,7 +74,8 @@ def expression_calibrate_window():
                       key='-V_INPUT-',
                       enable_events=True,
                       disabled_readonly_background_color=sg.theme_button_color()[1]),
-             sg.Text('[V]')]
+             sg.Text('[V]')],
+            [sg.Text('', k='-BURST_TXT-', pad=(10, (0, 10)))]
         ], expand_x=True, pad=(10, 10), relief=sg.RELIEF_SUNKEN)],
         [sg.Push(), sg.Button('Calculate', k='-CALCULATE-', disabled=True)]
     ])
@@ -228,7 +229,9 @@ def expression_input_calibrate_window_behavior(niDAQ, window, fig, figure_canvas
                     if inputVoltage in calibration.data:
                         raise ValueError("Data input is repeated.")
                 else:
-                    inputVoltage = niDAQ.read_voltage()
+                    # averages a burst of readings so the point is less noisy than a single reading
+                    inputVoltage, std_error, n_kept = niDAQ.read_voltage_burst()
+                    window['-BURST_TXT-'].update(gt.format_burst_reading(inputVoltage, std_error, n_kept))
 
                 calibration.add_voltage(inputVoltage)
 
@@ -150,7 +150,8 @@ def temp_volt_calibrate_window():
                               disabled_readonly_background_color=sg.theme_button_color()[1]),
                      sg.Text('T ='),
                      sg.Input(size=gt.SIZE_INPUT, key='-T_INPUT-', enable_events=True),
-                     sg.Button('Enter', k='-ENTER-', bind_return_key=True, pad=((10, 0), (10, 10)))]
+                     sg.Button('Enter', k='-ENTER-', bind_return_key=True, pad=((10, 0), (10, 10)))],
+                    [sg.Text('', k='-BURST_TXT-', pad=(10, (0, 10)))]
                 ], expand_x=True, pad=(10, 10), relief=sg.RELIEF_SUNKEN)],
                 [sg.Table(values=[],
                           headings=['Voltage (V)', 'Temperature (ºC)'],
@@ -249,7 +250,10 @@ def temp_volt_calibrate_window_behavior(niDAQ, window, fig, figure_canvas_agg):
                         raise ValueError("Values must be a numeric value.")
                     inputValues = [float(values['-V_INPUT-']), float(values['-T_INPUT-'])]
                 else:
-                    inputValues = [niDAQ.read_voltage(), float(values['-T_INPUT-'])]
+                    # averages a burst of readings so the point is less noisy than a single reading
+                    voltage, std_error, n_kept = niDAQ.read_voltage_burst()
+                    window['-BURST_TXT-'].update(gt.format_burst_reading(voltage, std_error, n_kept))
+                    inputValues = [voltage, float(values['-T_INPUT-'])]
 
                 if calibration.data_exists(inputValues):
                     raise ValueError("Data input is repeated.")
@@ -230,6 +230,17 @@ def calculate_frequency(period):
     return 1 / period
 
 
+def format_burst_reading(voltage, std_error, n_kept):
+    """
+    Formats an averaged voltage measurement to be shown in the gui
+    :param voltage: mean voltage
+    :param std_error: standard error of the mean
+    :param n_kept: number of samples averaged
+    :return: string with the measurement
+    """
+    return f"Measured: {voltage} \u00B1 {std_error:.5f} V ({n_kept} samples)"
+
+
 def gui_toggle_behaviour(window):
     window['-TOGGLE-'].metadata = not window['-TOGGLE-'].metadata
     if window['-TOGGLE-'].metadata:
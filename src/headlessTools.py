@@ -0,0 +1,221 @@
+import argparse
+import time
+
+import src.calibrationTools as ct
+import src.alarmTools as at
+import src.controlTools as control
+import src.daqTools as daq
+import src.interlockTools as it
+import src.pipelineTools as pt
+import src.profilingTools as profiling
+import src.simulationTools as sim
+import src.statisticsTools as st
+import src.storageTools as storage
+import src.triggerTools as tt
+
+DEFAULT_SAMPLE_RATE = 1000  # [Sa/s]
+DEFAULT_BLOCK_SIZE = 100  # samples read from the DAQ at a time
+
+
+def run_headless_acquisition(model, calibration, n_samples, sample_rate=DEFAULT_SAMPLE_RATE,
+                             block_size=DEFAULT_BLOCK_SIZE, file_name=None, policy=None, trigger=None,
+                             trigger_window=(0, 1), use_callback=False, deadband=None, max_interval=None,
+                             alarms=(None, None), alarm_hysteresis=0.0, alarm_debounce=0.0, alarm_rate=None,
+                             alarm_time_to_limit=None, alarm_trend_window=st.DEFAULT_WINDOW_LENGTH,
+                             interlock=None, controller=None, alarm_trend_hysteresis=(None, None), monitoring=False):
+    """
+    Runs a buffered or callback acquisition through the pipeline without the GUI
+    :param model: DAQ model
+    :param calibration: calibration object
+    :param n_samples: number of samples acquired, rounded up to whole blocks. With a trigger, the acquisition
+    also ends when the post-trigger window has been recorded
+    :param sample_rate: sample rate in [Sa/s]
+    :param block_size: samples read from the DAQ at a time
+    :param file_name: csv file where samples are streamed, None to only keep them in memory
+    :param policy: backpressure policy of the file sink, None to write the file in the acquisition loop
+    :param trigger: Trigger object, None to store every sample
+    :param trigger_window: [pre-trigger, post-trigger] samples stored around the trigger
+    :param use_callback: True to have the driver call back with every block instead of polling for them
+    :param deadband: temperature difference in [ºC] for a sample to be recorded, None to record every sample
+    :param max_interval: time in [ms] after which a sample is recorded even without a change
+    :param alarms: [min, max] alarm temperatures in [ºC], None for alarms that aren't set
+    :param alarm_hysteresis: temperature in [ºC] the temperature has to get back within a limit to clear its alarm
+    :param alarm_debounce: time in [ms] the temperature has to stay beyond a limit to raise its alarm
+    :param alarm_rate: rate of change in [ºC/s] that raises an alarm, None to not set it
+    :param alarm_time_to_limit: time in [s] that raises an alarm when the trend reaches the min or max alarm within
+    it, None to not set it
+    :param alarm_trend_window: samples the trend of the rate and time to limit alarms is fitted to
+    :param interlock: arguments of niDAQ.set_interlock, None to not drive an output with the alarms
+    :param controller: PIDController object that drives the analog output once per block, None to not control it
+    :param alarm_trend_hysteresis: [rate in [ºC/s], time in [s]] the rate and time to limit have to get back within
+    their limits to clear their alarms, None for at.DEFAULT_TREND_HYSTERESIS of the limit
+    :param monitoring: True to only check the temperature alarms and drive the interlock, without converting every
+    sample to temperature nor storing them
+    :return: niDAQ object with the acquired data
+    """
+    niDAQ = daq.niDAQ(model, False)
+    niDAQ.initiate_daq()
+    niDAQ.add_calibration_to_log(calibration)
+    niDAQ.set_calibration(repr(calibration))
+    niDAQ.set_time_log()
+    niDAQ.set_trigger(trigger, *trigger_window)
+    niDAQ.set_deadband(deadband, max_interval)
+    niDAQ.set_sample_rate(sample_rate)
+    niDAQ.set_alarm_hysteresis(alarm_hysteresis, alarm_debounce)
+    niDAQ.set_alarm_min(alarms[0])
+    niDAQ.set_alarm_max(alarms[1])
+    niDAQ.set_alarm_trend_window(alarm_trend_window)
+    niDAQ.set_alarm_trend_hysteresis(*alarm_trend_hysteresis)
+    niDAQ.set_alarm_rate(alarm_rate)
+    niDAQ.set_alarm_time_to_limit(alarm_time_to_limit)
+    if interlock is not None:
+        niDAQ.set_interlock(*interlock)
+    niDAQ.set_controller(controller)
+    niDAQ.set_monitoring(monitoring)
+    extra_sinks = []
+    if file_name is not None:
+        file_sink = niDAQ.create_recording_sink(pt.FileSink(file_name))
+        extra_sinks.append(file_sink if policy is None else pt.QueuedSink(file_sink, policy))
+    niDAQ.create_pipeline(calibration, extra_sinks, block_size, use_callback)
+    if use_callback:
+        niDAQ.pipeline.source.start(sample_rate)
+    else:
+        niDAQ.start_buffered_acquisition(sample_rate)
+    try:
+        while niDAQ.get_n_samples_read() < n_samples and not niDAQ.is_trigger_finished():
+            niDAQ.pipeline.run_once()
+    finally:
+        niDAQ.stop_control()
+        niDAQ.stop_buffered_acquisition()
+        niDAQ.pipeline.close()
+    return niDAQ
+
+
+def get_interlock_arguments(arguments):
+    """
+    Returns the arguments of niDAQ.set_interlock given on the command line
+    :param arguments: parsed command line arguments
+    :return: list of arguments, None if there is no interlock
+    """
+    match arguments.interlock:
+        case 'None':
+            return None
+        case 'Analog Output':
+            value = arguments.interlock_voltage
+        case _:
+            value = not arguments.interlock_low
+    return [arguments.interlock, arguments.interlock_alarms, value, arguments.interlock_latch, arguments.interlock_line]
+
+
+def get_controller(arguments):
+    """
+    Returns the temperature controller given on the command line
+    :param arguments: parsed command line arguments
+    :return: PIDController object, None if there is no setpoint
+    """
+    if arguments.setpoint is None:
+        return None
+    return control.PIDController(arguments.kp, arguments.ki, arguments.kd, control.create_profile(arguments.setpoint),
+                                 arguments.control_limits)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Runs the acquisition pipeline without the GUI")
+    parser.add_argument('--model', default=sim.SIMULATED_MODEL, help="DAQ model")
+    parser.add_argument('--sensor-id', default=None, help="sensor whose calibration is loaded from the library")
+    parser.add_argument('--library', default=storage.CALIBRATION_LIBRARY_PATH, help="path to the calibration library")
+    parser.add_argument('--samples', type=int, default=10 * DEFAULT_SAMPLE_RATE, help="number of samples")
+    parser.add_argument('--rate', type=float, default=DEFAULT_SAMPLE_RATE, help="sample rate in [Sa/s]")
+    parser.add_argument('--block-size', type=int, default=DEFAULT_BLOCK_SIZE, help="samples read at a time")
+    parser.add_argument('--output', default=None, help="csv file where samples are streamed")
+    parser.add_argument('--callback', action='store_true',
+                        help="the driver calls back with every block instead of the blocks being polled")
+    parser.add_argument('--policy', default=None, choices=pt.backpressure_policies,
+                        help="writes the output file from its own thread with this backpressure policy")
+    parser.add_argument('--deadband', type=float, default=None,
+                        help="records a sample only when the temperature changes more than this [ºC]")
+    parser.add_argument('--max-interval', type=float, default=None,
+                        help="with a deadband, records a sample at least every this [ms]")
+    parser.add_argument('--trigger', default='None', choices=tt.trigger_types, help="stores only samples around it")
+    parser.add_argument('--level', type=float, default=0, help="trigger level in [ºC] or [ºC/s]")
+    parser.add_argument('--direction', default='Rising', choices=tt.trigger_directions, help="trigger direction")
+    parser.add_argument('--hysteresis', type=float, default=0, help="trigger hysteresis in [ºC] or [ºC/s]")
+    parser.add_argument('--pre', type=int, default=0, help="samples stored before the trigger")
+    parser.add_argument('--post', type=int, default=DEFAULT_SAMPLE_RATE, help="samples stored from the trigger on")
+    parser.add_argument('--alarm-min', type=float, default=None, help="minimum temperature alarm [ºC]")
+    parser.add_argument('--alarm-max', type=float, default=None, help="maximum temperature alarm [ºC]")
+    parser.add_argument('--alarm-hysteresis', type=float, default=0,
+                        help="an alarm clears when the temperature gets back within its limit by this [ºC]")
+    parser.add_argument('--alarm-debounce', type=float, default=0,
+                        help="an alarm is raised when the temperature stays beyond its limit for this [ms]")
+    parser.add_argument('--alarm-rate', type=float, default=None, help="rate of change alarm [ºC/s]")
+    parser.add_argument('--alarm-time-to-limit', type=float, default=None,
+                        help="alarm when the trend reaches the min or max alarm within this [s]")
+    parser.add_argument('--alarm-trend-window', type=int, default=st.DEFAULT_WINDOW_LENGTH,
+                        help="samples the trend of the rate and time to limit alarms is fitted to")
+    parser.add_argument('--alarm-rate-hysteresis', type=float, default=None,
+                        help=f"rate in [ºC/s] the rate has to get back within its alarm to clear it, "
+                             f"{at.DEFAULT_TREND_HYSTERESIS:.0%}% of the alarm by default")
+    parser.add_argument('--alarm-time-to-limit-hysteresis', type=float, default=None,
+                        help=f"time in [s] the time to limit has to get back above its alarm to clear it, "
+                             f"{at.DEFAULT_TREND_HYSTERESIS:.0%}% of the alarm by default")
+    parser.add_argument('--interlock', default='None', choices=it.interlock_types,
+                        help="output written as soon as an alarm is raised")
+    parser.add_argument('--interlock-alarms', nargs='+', default=at.alarm_types, choices=at.alarm_types,
+                        metavar='ALARM', help=f"alarms that trip the interlock, from {at.alarm_types}")
+    parser.add_argument('--interlock-voltage', type=float, default=it.DEFAULT_TRIPPED_VOLTAGE,
+                        help="analog output voltage while tripped [V]")
+    parser.add_argument('--interlock-line', default=it.DEFAULT_DIGITAL_LINE, help="digital output line")
+    parser.add_argument('--interlock-low', action='store_true', help="sets the digital line low while tripped")
+    parser.add_argument('--interlock-latch', action='store_true', help="stays tripped until the end of the run")
+    parser.add_argument('--setpoint', default=None,
+                        help="drives the analog output with a PID loop towards a setpoint in [ºC], or a profile of "
+                             "time [s]:temperature [ºC] pairs, e.g. '0:25,300:80,900:80'")
+    parser.add_argument('--kp', type=float, default=1.0, help="proportional gain of the control loop [V/ºC]")
+    parser.add_argument('--ki', type=float, default=0.0, help="integral gain of the control loop [V/(ºC·s)]")
+    parser.add_argument('--kd', type=float, default=0.0, help="derivative gain of the control loop [V·s/ºC]")
+    parser.add_argument('--control-limits', type=float, nargs=2, default=list(control.DEFAULT_OUTPUT_LIMITS),
+                        metavar=('MIN', 'MAX'), help="output limits of the control loop [V]")
+    parser.add_argument('--monitor', action='store_true',
+                        help="only checks the temperature alarms and drives the interlock, nothing is stored")
+    parser.add_argument('--profile', action='store_true', help="prints the time of the instrumented functions at exit")
+    parser.add_argument('--cprofile', default=None, metavar='FILE', help="profiles the run with cProfile into FILE")
+    arguments = parser.parse_args()
+    profiling.configure(arguments.profile, arguments.cprofile)
+
+    if arguments.sensor_id is None:
+        # without a sensor, temperature equals voltage
+        calibration = ct.LinearCalibration()
+        calibration.set_parameters(1, 0)
+    else:
+        calibration = storage.load_calibration(arguments.sensor_id, arguments.library)
+    start, start_cpu = time.perf_counter(), time.process_time()
+    niDAQ = run_headless_acquisition(arguments.model, calibration, arguments.samples, arguments.rate,
+                                     arguments.block_size, arguments.output, arguments.policy,
+                                     tt.create_trigger(arguments.trigger, arguments.level, arguments.direction,
+                                                       arguments.hysteresis), (arguments.pre, arguments.post),
+                                     arguments.callback, arguments.deadband, arguments.max_interval,
+                                     (arguments.alarm_min, arguments.alarm_max), arguments.alarm_hysteresis,
+                                     arguments.alarm_debounce, arguments.alarm_rate, arguments.alarm_time_to_limit,
+                                     arguments.alarm_trend_window, get_interlock_arguments(arguments),
+                                     get_controller(arguments),
+                                     (arguments.alarm_rate_hysteresis, arguments.alarm_time_to_limit_hysteresis),
+                                     arguments.monitor)
+    elapsed, elapsed_cpu = time.perf_counter() - start, time.process_time() - start_cpu
+    print(f"{niDAQ.pipeline}\n{niDAQ.get_n_samples_read()} samples read, {len(niDAQ)} stored in {elapsed:.2f} s, "
+          f"{elapsed_cpu:.2f} s of CPU\n")
+    print(pt.format_timing_report(niDAQ.pipeline.get_timing_report()))
+    print(f"\n{pt.format_counters(niDAQ.get_counters())}")
+    if niDAQ.trigger_stage is not None and niDAQ.trigger_stage.is_triggered():
+        print(f"Triggered at {niDAQ.trigger_stage.trigger_time / pt.NS_PER_S:.6f} s")
+    elif niDAQ.trigger_stage is not None:
+        print("Trigger didn't fire")
+    if any(limit is not None for limit in [niDAQ.alarm_min, niDAQ.alarm_max, niDAQ.alarm_rate,
+                                           niDAQ.alarm_time_to_limit]):
+        print(f"{len(niDAQ.alarm_engine)} alarm episodes")
+    if niDAQ.controller is not None:
+        print(niDAQ.controller)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+from abc import ABC, abstractmethod
+
+import src.alarmTools as at
+import src.timingTools as tm
+
+# Interlock type list
+interlock_types = ['None', 'Analog Output', 'Digital Line']
+
+DEFAULT_TRIPPED_VOLTAGE = 0.0  # [V] the analog output is set to while tripped, e.g. a heater supply cut off
+DEFAULT_DIGITAL_LINE = "Dev1/port0/line0"
+
+interlock_log_fieldnames = ['Event', 'Sample [ns]', 'Actuated [ns]', 'Latency [ms]']
+
+
+class Interlock(ABC):
+    """
+    Interlock parent class: a hardware output driven by the alarm states. It trips, writing its tripped value, as
+    soon as any of the alarms mapped to it is raised, and it's restored to its safe value once they have all cleared,
+    unless it latches, in which case it stays tripped until it's reset.
+
+    It's written by the thread that checks the alarms, right after the block that raised them, so the output never
+    waits for the GUI. The time from the sample that raised the alarm to the end of the write is recorded as the
+    actuation latency.
+    """
+
+    def __init__(self, interlock_type, alarm_types=tuple(at.alarm_types), latch=False):
+        """
+        :param interlock_type: one of interlock_types
+        :param alarm_types: alarms that trip the interlock, from at.alarm_types
+        :param latch: True to stay tripped until reset, False to restore the output when the alarms clear
+        """
+        if not alarm_types or any(alarm_type not in at.alarm_types for alarm_type in alarm_types):
+            raise ValueError(f"No matching alarm found.\nExpected: {at.alarm_types}\nGot: {list(alarm_types)}.")
+        self.interlock_type = interlock_type
+        self.alarm_types = list(alarm_types)
+        self.indexes = [at.alarm_types.index(alarm_type) for alarm_type in alarm_types]
+        self.latch = latch
+        self.is_tripped = False
+        self.reset_time = None  # [ns] when it was last reset by hand, alarms raised before don't time a trip
+        self.latency = tm.LatencyHistogram()
+        self.log = []
+
+    def __repr__(self):
+        return f"{self.interlock_type} on {', '.join(self.alarm_types)}{' (latching)' if self.latch else ''}"
+
+    @abstractmethod
+    def write(self, is_tripped):
+        """
+        Abstract method, writes the tripped or the safe value to the output
+        :param is_tripped: True to write the tripped value
+        :return:
+        """
+        pass
+
+    @abstractmethod
+    def get_values(self):
+        """
+        Abstract method, returns the values the output is written with
+        :return: [safe value, tripped value]
+        """
+        pass
+
+    def update(self, states, raised_times, clock):
+        """
+        Trips or restores the output when the mapped alarms change
+        :param states: alarm states ordered as at.alarm_types
+        :param raised_times: time in [ns] of the sample that last raised every alarm, ordered as at.alarm_types
+        :param clock: function that returns the current time in [ns] on the same clock as the sample times
+        :return: True if the output was written
+        """
+        raised = [raised_times[index] for index in self.indexes if states[index]]
+        if bool(raised) == self.is_tripped or (self.is_tripped and self.latch):
+            return False
+        self.write(bool(raised))
+        actuated = clock()
+        self.is_tripped = bool(raised)
+        if not raised:
+            self.log.append({'Event': 'Restore', 'Sample [ns]': None, 'Actuated [ns]': actuated,
+                             'Latency [ms]': None})
+            return True
+        # the earliest of the alarms raised since the last reset is the one whose sample tripped the output
+        sample = min((time for time in raised if time is not None and (self.reset_time is None or
+                                                                      time >= self.reset_time)), default=None)
+        if sample is None:
+            latency = None
+        else:
+            latency = actuated - sample
+            self.latency.add(latency)
+        self.log.append({'Event': 'Trip', 'Sample [ns]': sample, 'Actuated [ns]': actuated,
+                         'Latency [ms]': None if latency is None else tm.to_ms(latency)})
+        return True
+
+    def reset(self, time_ns=None):
+        """
+        Restores the safe value of a tripped interlock, it trips again with the next block if an alarm is still raised
+        :param time_ns: time of the reset in [ns], None if the acquisition hasn't started
+        :return:
+        """
+        self.write(False)
+        self.is_tripped = False
+        self.reset_time = time_ns
+        self.log.append({'Event': 'Reset', 'Sample [ns]': None, 'Actuated [ns]': time_ns, 'Latency [ms]': None})
+
+    def clear(self):
+        """
+        Clears the log and latency, and restores the output, keeping the settings
+        :return:
+        """
+        if self.is_tripped:
+            self.write(False)
+        self.is_tripped = False
+        self.reset_time = None
+        self.latency.clear()
+        self.log.clear()
+
+    def get_counters(self):
+        """
+        Returns the trips and their actuation latency
+        :return: dictionary with counter names and values
+        """
+        latency_p50, latency_p99, latency_max = self.latency.get_summary()
+        return {
+            'Interlock trips': sum(entry['Event'] == 'Trip' for entry in self.log),
+            'Interlock tripped': self.is_tripped,
+            'Actuation p50 [ms]': latency_p50,
+            'Actuation p99 [ms]': latency_p99,
+            'Actuation max [ms]': latency_max
+        }
+
+
+class AnalogInterlock(Interlock):
+    """
+    Interlock that sets the voltage of an analog output task
+    """
+
+    def __init__(self, task, safe_voltage, tripped_voltage=DEFAULT_TRIPPED_VOLTAGE, alarm_types=tuple(at.alarm_types),
+                 latch=False):
+        """
+        :param task: task with an analog output channel, already started
+        :param safe_voltage: voltage in [V] while no alarm is raised
+        :param tripped_voltage: voltage in [V] while tripped
+        :param alarm_types: alarms that trip the interlock, from at.alarm_types
+        :param latch: True to stay tripped until reset
+        """
+        super().__init__('Analog Output', alarm_types, latch)
+        self.task = task
+        self.safe_voltage = safe_voltage
+        self.tripped_voltage = tripped_voltage
+
+    def write(self, is_tripped):
+        self.task.write(self.tripped_voltage if is_tripped else self.safe_voltage)
+
+    def get_values(self):
+        return [self.safe_voltage, self.tripped_voltage]
+
+
+class DigitalInterlock(Interlock):
+    """
+    Interlock that switches a digital output line, e.g. the coil of a relay
+    """
+
+    def __init__(self, task, tripped_high=True, alarm_types=tuple(at.alarm_types), latch=False):
+        """
+        :param task: task with a digital output channel of a single line
+        :param tripped_high: True to set the line high while tripped, False to set it low, e.g. for fail-safe relays
+        that are held closed while everything is fine
+        :param alarm_types: alarms that trip the interlock, from at.alarm_types
+        :param latch: True to stay tripped until reset
+        """
+        super().__init__('Digital Line', alarm_types, latch)
+        self.task = task
+        self.tripped_high = tripped_high
+
+    def write(self, is_tripped):
+        self.task.write(is_tripped == self.tripped_high)
+
+    def get_values(self):
+        return [not self.tripped_high, self.tripped_high]
@@ -0,0 +1,910 @@
+import csv
+import queue
+import threading
+import time
+
+from abc import ABC, abstractmethod
+from collections import deque
+from nidaqmx.error_codes import DAQmxErrors
+from nidaqmx.errors import DaqError
+
+import numpy as np
+import src.timingTools as tm
+
+DEADBAND_SEARCH_LENGTH = 64  # samples compared at a time when looking for the next sample to keep
+DEFAULT_QUEUE_SIZE = 16  # blocks a queued sink holds before its backpressure policy applies
+NS_PER_MS = 1_000_000
+NS_PER_S = 1_000_000_000
+VOLTAGE_DECIMALS = 3  # voltages are rounded to before the calibration
+
+# what a queued sink does with a new block when its queue is full
+backpressure_policies = ['Block', 'Drop oldest', 'Decimate']
+
+pipeline_timing_fieldnames = ['Stage', 'Calls', 'Samples', 'Total [ms]', 'Mean [ms]', 'p50 [ms]', 'p99 [ms]',
+                              'Max [ms]']
+
+
+class Block:
+    """
+    Block of consecutive samples that flows through the pipeline. Columns are NumPy arrays with one value per sample,
+    times are int64 [ns] since the acquisition started; temperatures are None until the calibration stage has run.
+    """
+
+    def __init__(self, times, voltages, temperatures=None):
+        self.times = np.asarray(times, dtype=np.int64)
+        self.voltages = np.asarray(voltages, dtype=float)
+        self.temperatures = None if temperatures is None else np.asarray(temperatures, dtype=float)
+        self.derived = {}  # derived columns, e.g. {'rate': dT/dt}
+
+    def __len__(self):
+        return len(self.times)
+
+    def select(self, index):
+        """
+        Returns a block with only some of the samples
+        :param index: boolean mask or array of indexes
+        :return: Block object
+        """
+        block = Block(self.times[index], self.voltages[index],
+                      None if self.temperatures is None else self.temperatures[index])
+        block.derived = {name: column[index] for name, column in self.derived.items()}
+        return block
+
+
+def concatenate_blocks(blocks):
+    """
+    Joins consecutive blocks into one
+    :param blocks: list of Block objects with the same columns
+    :return: Block object
+    """
+    block = Block(np.concatenate([block.times for block in blocks]),
+                  np.concatenate([block.voltages for block in blocks]),
+                  None if blocks[0].temperatures is None else np.concatenate([block.temperatures for block in blocks]))
+    block.derived = {name: np.concatenate([block.derived[name] for block in blocks]) for name in blocks[0].derived}
+    return block
+
+
+class Column:
+    """
+    Column of samples stored in a NumPy array that grows as blocks are appended. Its capacity doubles when it's full,
+    so appending stays O(1) amortized.
+    """
+
+    def __init__(self, dtype, capacity=1024):
+        self.values = np.empty(capacity, dtype=dtype)
+        self.n_values = 0
+
+    def __len__(self):
+        return self.n_values
+
+    def __getitem__(self, index):
+        return self.get()[index]
+
+    def get(self):
+        """
+        Returns the values stored, as a view of the array
+        :return: NumPy array
+        """
+        return self.values[:self.n_values]
+
+    def append(self, values):
+        """
+        Appends a block of values
+        :param values: array of values
+        :return:
+        """
+        values = np.asarray(values, dtype=self.values.dtype).ravel()
+        if self.n_values + len(values) > len(self.values):
+            grown = np.empty(max(2 * len(self.values), self.n_values + len(values)), dtype=self.values.dtype)
+            grown[:self.n_values] = self.get()
+            self.values = grown
+        self.values[self.n_values:self.n_values + len(values)] = values
+        self.n_values += len(values)
+
+    def clear(self):
+        self.n_values = 0
+
+
+class Stage(ABC):
+    """
+    Stage parent class. Stages process a block and return the block for the next stage, or None to drop it.
+    """
+
+    def __init__(self, name):
+        self.name = name
+
+    def __repr__(self):
+        return self.name
+
+    @abstractmethod
+    def process(self, block):
+        """
+        Abstract method, processes a block
+        :param block: Block object
+        :return: Block object, None if the block is dropped
+        """
+        pass
+
+    def reset(self):
+        """
+        Clears stage state so the next block starts a new acquisition
+        :return:
+        """
+        pass
+
+
+class Sink(ABC):
+    """
+    Sink parent class. Sinks receive every block that goes through all the stages.
+    """
+
+    def __init__(self, name):
+        self.name = name
+
+    def __repr__(self):
+        return self.name
+
+    @abstractmethod
+    def write(self, block):
+        """
+        Abstract method, consumes a block
+        :param block: Block object
+        :return:
+        """
+        pass
+
+    def close(self):
+        """
+        Releases the resources of the sink
+        :return:
+        """
+        pass
+
+    def get_counters(self):
+        """
+        Returns the counters of the sink, sinks without counters return an empty dictionary
+        :return: dictionary with counter names and values
+        """
+        return {}
+
+
+class DAQSource:
+    """
+    Source of the pipeline, reads blocks from the DAQ. With one sample per block it reads on demand and every sample
+    is timestamped with the clock of the computer when it's read; with more, it reads blocks from a buffered
+    acquisition started with niDAQ.start_buffered_acquisition and times come from the sample clock, counted from the
+    moment the acquisition started. Buffered reads monitor the driver buffer:
+    when unread samples have been overwritten, reading resumes from the latest samples and the skipped ones are
+    counted as dropped, so the times of later samples stay right.
+
+    How late every read is goes to a histogram: an on demand read is late when it comes more than one read interval
+    after the previous one, and every whole interval late is a missed read; a block is late from the moment its last
+    sample was acquired.
+    """
+
+    def __init__(self, niDAQ, samples_per_block=1):
+        self.name = 'source'
+        self.niDAQ = niDAQ
+        self.samples_per_block = samples_per_block
+        self.read_interval = None
+        self.n_read = 0
+        self.last_time = None
+        self.jitter = tm.LatencyHistogram()
+        self.missed_reads = 0
+        self.buffer_fill = None
+        self.max_buffer_fill = None
+        self.overruns = 0
+        self.dropped_samples = 0
+        self.late_blocks = 0
+
+    def __repr__(self):
+        return self.name
+
+    def set_read_interval(self, read_interval):
+        """
+        Sets time between on demand readings, used to measure how late they are
+        :param read_interval: time in [ns], None if readings aren't scheduled
+        :return:
+        """
+        self.read_interval = read_interval
+
+    def read(self):
+        """
+        Reads the next block from the DAQ
+        :return: Block object
+        """
+        if self.samples_per_block == 1:
+            # the sample is taken somewhere during the read, its time is the middle of it
+            start = self.niDAQ.get_elapsed_time_ns()
+            voltages = [self.niDAQ.read_raw_voltage()]
+            times = [(start + self.niDAQ.get_elapsed_time_ns()) // 2]
+            if self.read_interval is not None and self.last_time is not None:
+                lateness = times[0] - self.last_time - self.read_interval
+                self.jitter.add(lateness)
+                self.missed_reads += max(lateness // self.read_interval, 0)
+        else:
+            voltages = self.read_buffered()
+            indexes = np.arange(self.n_read, self.n_read + self.samples_per_block)
+            times = self.niDAQ.clock_start_ns + np.round(indexes * NS_PER_S / self.niDAQ.get_sample_rate())
+            self.jitter.add(self.niDAQ.get_elapsed_time_ns() - times[-1])
+        self.n_read += len(voltages)
+        self.last_time = times[-1]
+        return Block(times, voltages)
+
+    def read_buffered(self):
+        """
+        Reads the next block of a buffered acquisition, updating the buffer counters
+        :return: list of voltages
+        """
+        status = self.niDAQ.get_buffer_status()
+        self.buffer_fill = status['available'] / status['buffer_size']
+        self.max_buffer_fill = max(self.buffer_fill, self.max_buffer_fill or 0)
+        backlog = status['acquired'] - status['read_position']
+        if backlog <= status['buffer_size']:
+            # more than a whole block was already waiting, the pipeline is falling behind the device
+            if backlog >= 2 * self.samples_per_block:
+                self.late_blocks += 1
+            try:
+                return self.niDAQ.read_voltage_block(self.samples_per_block)
+            except DaqError as e:
+                # the buffer filled up between checking it and reading
+                if e.error_code != DAQmxErrors.SAMPLES_NO_LONGER_AVAILABLE.value:
+                    raise
+        self.overruns += 1
+        voltages, first_index = self.niDAQ.read_latest_voltage_block(self.samples_per_block)
+        self.dropped_samples += first_index - self.n_read
+        self.n_read = first_index
+        return voltages
+
+    def reset(self):
+        self.n_read = 0
+        self.last_time = None
+        self.jitter.clear()
+        self.missed_reads = 0
+        self.buffer_fill = None
+        self.max_buffer_fill = None
+        self.overruns = 0
+        self.dropped_samples = 0
+        self.late_blocks = 0
+
+    def get_counters(self):
+        """
+        Returns the buffer and jitter counters, fill levels are None when reading on demand
+        :return: dictionary with counter names and values
+        """
+        jitter_p50, jitter_p99, jitter_max = self.jitter.get_summary()
+        return {
+            'Buffer fill [%]': None if self.buffer_fill is None else round(self.buffer_fill * 100, 1),
+            'Max buffer fill [%]': None if self.max_buffer_fill is None else round(self.max_buffer_fill * 100, 1),
+            'Overruns': self.overruns,
+            'Dropped samples': self.dropped_samples,
+            'Late blocks': self.late_blocks,
+            'Jitter p50 [ms]': jitter_p50,
+            'Jitter p99 [ms]': jitter_p99,
+            'Jitter max [ms]': jitter_max,
+            'Missed reads': self.missed_reads
+        }
+
+
+class CallbackSource(DAQSource):
+    """
+    Source of the pipeline for callback acquisitions: the driver calls back when every block has been acquired, the
+    callback only reads it and queues it, and the pipeline processes it from its own thread. If the pipeline falls
+    behind and the queue fills up, the oldest queued block is dropped.
+    """
+
+    def __init__(self, niDAQ, samples_per_block, queue_size=DEFAULT_QUEUE_SIZE):
+        super().__init__(niDAQ, samples_per_block)
+        self.blocks = queue.Queue(maxsize=queue_size)
+        self.dropped_blocks = 0
+        self.callback_error = None
+
+    def start(self, sample_rate):
+        """
+        Starts the acquisition with this source's callback
+        :param sample_rate: sample rate in [Sa/s]
+        :return:
+        """
+        self.niDAQ.start_callback_acquisition(sample_rate, self.samples_per_block, self.on_block_acquired)
+
+    def on_block_acquired(self, task_handle, every_n_samples_event_type, number_of_samples, callback_data):
+        """
+        Called by the driver when a block has been acquired
+        :return: 0, as the driver expects
+        """
+        try:
+            block = super().read()
+        except Exception as e:
+            # errors can't be raised in the driver thread, they are raised by the next read
+            self.callback_error = e
+            return 0
+        if self.blocks.full():
+            self.blocks.get_nowait()
+            self.dropped_blocks += 1
+        self.blocks.put_nowait(block)
+        return 0
+
+    def read(self):
+        """
+        Waits for the next block acquired
+        :return: Block object
+        """
+        timeout = self.samples_per_block / self.niDAQ.get_sample_rate() + 1
+        while True:
+            if self.callback_error is not None:
+                raise self.callback_error
+            try:
+                return self.blocks.get(timeout=timeout)
+            except queue.Empty:
+                if self.callback_error is None:
+                    raise TimeoutError(f"No block acquired in {timeout:.3f} s")
+
+    def reset(self):
+        super().reset()
+        self.dropped_blocks = 0
+        self.callback_error = None
+
+    def get_counters(self):
+        counters = super().get_counters()
+        counters['Dropped blocks'] = self.dropped_blocks
+        return counters
+
+
+class FilterStage(Stage):
+    """
+    Filters the voltages of every block, the filter keeps its state between blocks
+    """
+
+    def __init__(self, voltage_filter):
+        super().__init__('filter')
+        self.voltage_filter = voltage_filter
+
+    def process(self, block):
+        block.voltages = self.voltage_filter.process(block.voltages)
+        return block
+
+    def reset(self):
+        self.voltage_filter.reset()
+
+
+class CalibrateStage(Stage):
+    """
+    Rounds voltages to 3 decimal points and calculates the temperature of the whole block at once, unless an earlier
+    stage already did
+    """
+
+    def __init__(self, calibration):
+        super().__init__('calibrate')
+        self.calibration = calibration
+
+    def process(self, block):
+        if block.temperatures is None:
+            block.voltages = np.round(block.voltages, VOLTAGE_DECIMALS)
+            block.temperatures = self.calibration.calculate_temperature_array(block.voltages)
+        return block
+
+
+class DeriveStage(Stage):
+    """
+    Calculates the rate of change of the temperature between consecutive samples, carrying the last sample of the
+    previous block so the first sample of a block also has a rate
+    """
+
+    def __init__(self):
+        super().__init__('derive')
+        self.last_time = None
+        self.last_temperature = None
+
+    def process(self, block):
+        times = block.times
+        temperatures = block.temperatures
+        if self.last_time is not None:
+            times = np.concatenate(([self.last_time], times))
+            temperatures = np.concatenate(([self.last_temperature], temperatures))
+        # times are subtracted as integers, float64 can't hold every ns of a long run
+        with np.errstate(divide='ignore', invalid='ignore'):
+            rate = np.diff(temperatures) / np.diff(times) * NS_PER_S  # [ºC/s]
+        if self.last_time is None:
+            rate = np.concatenate(([np.nan], rate))
+        block.derived['rate'] = rate
+        self.last_time, self.last_temperature = int(times[-1]), float(temperatures[-1])
+        return block
+
+    def reset(self):
+        self.last_time = None
+        self.last_temperature = None
+
+
+class AlarmStage(Stage):
+    """
+    Checks the alarms of the DAQ against every sample of the block. Before the calibration stage, voltages are
+    rounded the same way and checked against the limits inverted to voltages; the temperatures are only calculated
+    when a block can't be checked in volts, and then they're kept so the calibration stage doesn't repeat them.
+    """
+
+    def __init__(self, niDAQ):
+        super().__init__('alarm')
+        self.niDAQ = niDAQ
+
+    def process(self, block):
+        if block.temperatures is None:
+            block.voltages = np.round(block.voltages, VOLTAGE_DECIMALS)
+        block.temperatures = self.niDAQ.check_alarms(block.times, block.voltages, block.temperatures)
+        return block
+
+
+class TrendStage(Stage):
+    """
+    Fits a line to the latest temperatures at every sample and checks the trend alarms of the DAQ with it, adding its
+    slope as the 'trend' derived column, a rate of change less noisy than the one between consecutive samples
+    """
+
+    def __init__(self, niDAQ):
+        super().__init__('trend')
+        self.niDAQ = niDAQ
+
+    def process(self, block):
+        block.derived['trend'] = self.niDAQ.check_trend_alarms(block.times, block.temperatures)
+        return block
+
+
+class ControlStage(Stage):
+    """
+    Updates the temperature controller of the DAQ once per block and writes its output to the analog output, right
+    after the block is read, so the loop runs at the pace of the blocks
+    """
+
+    def __init__(self, niDAQ):
+        super().__init__('control')
+        self.niDAQ = niDAQ
+
+    def process(self, block):
+        self.niDAQ.apply_control(block.times, block.temperatures)
+        return block
+
+
+class DeadbandStage(Stage):
+    """
+    Keeps a sample only when its temperature differs from the last kept one by more than the deadband, or when the
+    maximum interval has elapsed since the last kept one. Kept samples keep their exact times, and holding every
+    kept temperature until the next kept sample reproduces every dropped temperature within the deadband.
+    """
+
+    def __init__(self, deadband, max_interval=None):
+        """
+        :param deadband: temperature difference in [ºC]
+        :param max_interval: time in [ns], None to keep samples only when the temperature changes
+        """
+        if deadband < 0:
+            raise ValueError(f"Deadband can't be negative.\nGot {deadband} instead.")
+        if max_interval is not None and max_interval <= 0:
+            raise ValueError(f"Maximum interval must be positive.\nGot {max_interval} instead.")
+        super().__init__('deadband')
+        self.deadband = deadband
+        self.max_interval = max_interval
+        self.last_time = None
+        self.last_temperature = None
+
+    def find_next(self, times, temperatures, start):
+        """
+        Looks for the next sample to keep, comparing a growing window of samples at once
+        :param times: times of the block
+        :param temperatures: temperatures of the block
+        :param start: index where the search starts
+        :return: index of the sample, None if no sample of the block is kept
+        """
+        length = DEADBAND_SEARCH_LENGTH
+        while start < len(times):
+            end = min(start + length, len(times))
+            is_kept = np.abs(temperatures[start:end] - self.last_temperature) > self.deadband
+            if self.max_interval is not None:
+                is_kept |= times[start:end] - self.last_time >= self.max_interval
+            if is_kept.any():
+                return start + int(np.argmax(is_kept))
+            start, length = end, length * 2
+        return None
+
+    def process(self, block):
+        times, temperatures = block.times, block.temperatures
+        kept = []
+        index = 0
+        if self.last_time is None:
+            kept.append(0)
+            self.last_time, self.last_temperature = times[0], temperatures[0]
+            index = 1
+        while (index := self.find_next(times, temperatures, index)) is not None:
+            kept.append(index)
+            self.last_time, self.last_temperature = times[index], temperatures[index]
+            index += 1
+        return block.select(np.array(kept, dtype=int))
+
+    def reset(self):
+        self.last_time = None
+        self.last_temperature = None
+
+
+class DecimateStage(Stage):
+    """
+    Keeps one of every n samples, counting across blocks
+    """
+
+    def __init__(self, factor):
+        if factor < 1:
+            raise ValueError(f"Decimation factor must be at least 1.\nGot {factor} instead.")
+        super().__init__(f'decimate x{factor}')
+        self.factor = factor
+        self.phase = 0
+
+    def process(self, block):
+        first = (-self.phase) % self.factor
+        self.phase = (self.phase + len(block)) % self.factor
+        if first >= len(block):
+            return None
+        return block.select(slice(first, None, self.factor))
+
+    def reset(self):
+        self.phase = 0
+
+
+class Branch(Sink):
+    """
+    Sink with its own stages, used to process blocks for a single sink, e.g. decimating them before plotting
+    """
+
+    def __init__(self, stages, sink):
+        super().__init__(" -> ".join([stage.name for stage in stages] + [sink.name]))
+        self.stages = stages
+        self.sink = sink
+
+    def write(self, block):
+        block = block.select(slice(None))
+        for stage in self.stages:
+            block = stage.process(block)
+            if block is None or len(block) == 0:
+                return
+        self.sink.write(block)
+
+    def close(self):
+        self.sink.close()
+
+    def get_counters(self):
+        return self.sink.get_counters()
+
+
+class QueuedSink(Sink):
+    """
+    Runs a sink in its own thread behind a bounded queue of blocks, so a slow sink doesn't stall the acquisition.
+    When the queue is full the backpressure policy decides what happens to a new block:
+    'Block' waits until the sink catches up, 'Drop oldest' discards the oldest queued block and 'Decimate' merges
+    the two oldest queued blocks at half their resolution, keeping the whole time span at fewer samples.
+    If the sink raises an error its thread stops, and the error is raised by the next write or by close.
+    """
+
+    def __init__(self, sink, policy=backpressure_policies[0], queue_size=DEFAULT_QUEUE_SIZE):
+        if policy not in backpressure_policies:
+            raise ValueError(f"Backpressure policy must be one of {backpressure_policies}.\nGot {policy} instead.")
+        if queue_size < 2:
+            raise ValueError(f"Queue size must be at least 2.\nGot {queue_size} instead.")
+        super().__init__(sink.name)
+        self.sink = sink
+        self.policy = policy
+        self.queue_size = queue_size
+        self.queue = deque()
+        self.condition = threading.Condition()
+        self.is_closed = False
+        self.error = None  # error raised by the sink in its thread
+        self.dropped_blocks = 0
+        self.decimated_samples = 0
+        self.blocked_time = 0.0
+        self.thread = threading.Thread(target=self._run, name=f"{sink.name} sink", daemon=True)
+        self.thread.start()
+
+    def write(self, block):
+        with self.condition:
+            if self.error is not None:
+                raise self.error
+            if len(self.queue) >= self.queue_size:
+                match self.policy:
+                    case 'Block':
+                        start = time.perf_counter()
+                        self.condition.wait_for(lambda: len(self.queue) < self.queue_size or self.error is not None)
+                        self.blocked_time += time.perf_counter() - start
+                        if self.error is not None:
+                            raise self.error
+                    case 'Drop oldest':
+                        self.queue.popleft()
+                        self.dropped_blocks += 1
+                    case 'Decimate':
+                        merged = concatenate_blocks([self.queue.popleft(), self.queue.popleft()])
+                        self.queue.appendleft(merged.select(slice(None, None, 2)))
+                        self.decimated_samples += len(merged) // 2
+            self.queue.append(block)
+            self.condition.notify_all()
+
+    def _run(self):
+        """
+        Private method, body of the sink thread
+        :return:
+        """
+        while True:
+            with self.condition:
+                self.condition.wait_for(lambda: self.queue or self.is_closed)
+                if not self.queue:
+                    return
+                block = self.queue.popleft()
+                self.condition.notify_all()
+            try:
+                self.sink.write(block)
+            except Exception as e:
+                # nothing drains the queue from now on, writers waiting on it are woken up to raise the error
+                with self.condition:
+                    self.error = e
+                    self.is_closed = True
+                    self.condition.notify_all()
+                return
+
+    def close(self):
+        """
+        Writes the queued blocks and closes the sink, raising the error of the sink if it failed
+        :return:
+        """
+        with self.condition:
+            self.is_closed = True
+            self.condition.notify_all()
+        self.thread.join()
+        self.sink.close()
+        if self.error is not None:
+            raise self.error
+
+    def get_counters(self):
+        return {
+            f'{self.name} queued blocks': len(self.queue),
+            f'{self.name} dropped blocks': self.dropped_blocks,
+            f'{self.name} decimated samples': self.decimated_samples,
+            f'{self.name} blocked [ms]': round(self.blocked_time * 1000, 3)
+        }
+
+
+class StoreSink(Sink):
+    """
+    Stores the blocks in the DAQ data
+    """
+
+    def __init__(self, niDAQ):
+        super().__init__('store')
+        self.niDAQ = niDAQ
+
+    def write(self, block):
+        self.niDAQ.add_block(block.times, block.voltages, block.temperatures)
+
+
+class StatisticsSink(Sink):
+    """
+    Updates the run and window statistics of the DAQ
+    """
+
+    def __init__(self, niDAQ):
+        super().__init__('statistics')
+        self.niDAQ = niDAQ
+
+    def write(self, block):
+        self.niDAQ.update_statistics(block.temperatures, block.times)
+
+
+class PlotSink(Sink):
+    """
+    Redraws the acquisition plot
+    """
+
+    def __init__(self, niDAQ, fig, figure_canvas_agg):
+        super().__init__('plot')
+        self.niDAQ = niDAQ
+        self.fig = fig
+        self.figure_canvas_agg = figure_canvas_agg
+
+    def write(self, block):
+        self.niDAQ.update_figure(self.fig, self.figure_canvas_agg)
+
+
+class FileSink(Sink):
+    """
+    Appends the blocks to a csv file as they arrive
+    """
+
+    def __init__(self, file_name):
+        super().__init__('file')
+        if not file_name.lower().endswith(".csv"):
+            file_name += ".csv"
+        self.file = open(file_name, mode='w', newline='')
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(["Time [ns]", "Voltage [V]", "Temperature [ºC]"])
+
+    def write(self, block):
+        self.writer.writerows(zip(block.times.tolist(), block.voltages.tolist(), block.temperatures.tolist()))
+
+    def close(self):
+        self.file.close()
+
+
+class SocketSink(Sink):
+    """
+    Publishes the blocks to the subscribers of a DataPublisher
+    """
+
+    def __init__(self, publisher):
+        super().__init__('socket')
+        self.publisher = publisher
+
+    def write(self, block):
+        self.publisher.publish(block.times, block.voltages, block.temperatures)
+
+
+class SharedMemorySink(Sink):
+    """
+    Writes the blocks to a shared memory ring, describing the acquisition in its header
+    """
+
+    def __init__(self, shared_ring, sample_rate=None, calibration=None):
+        super().__init__('shared memory')
+        self.shared_ring = shared_ring
+        self.shared_ring.set_metadata(sample_rate, calibration)
+
+    def write(self, block):
+        self.shared_ring.write(block.times, block.voltages, block.temperatures)
+
+
+class StageTiming:
+    """
+    Accumulated execution time of a stage, with a histogram of the time of every call
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.samples = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.histogram = tm.LatencyHistogram()
+
+    def add(self, elapsed, n_samples):
+        """
+        Adds one execution
+        :param elapsed: execution time in [s]
+        :param n_samples: samples in the block
+        :return:
+        """
+        self.calls += 1
+        self.samples += n_samples
+        self.total += elapsed
+        self.max = max(self.max, elapsed)
+        self.histogram.add(elapsed * NS_PER_S)
+
+    def get_row(self):
+        """
+        Returns timing ordered as pipeline_timing_fieldnames[1:]
+        :return: [calls, samples, total, mean, p50, p99, max] with times in [ms]
+        """
+        return [self.calls, self.samples, round(self.total * 1000, 3),
+                round(self.total / self.calls * 1000, 3) if self.calls else None,
+                *self.histogram.get_summary()[:2], round(self.max * 1000, 3)]
+
+
+class Pipeline:
+    """
+    Acquisition pipeline: a source, a chain of stages that process NumPy blocks and the sinks every processed block
+    is fanned out to. The time spent in every stage and sink is recorded.
+    """
+
+    def __init__(self, source, stages, sinks):
+        self.source = source
+        self.stages = list(stages)
+        self.sinks = list(sinks)
+        self.timing = {name: StageTiming() for name in self.get_names()}
+
+    def __repr__(self):
+        return " -> ".join(self.get_names()[:len(self.stages) + 1]) + \
+            f" => [{', '.join(self.get_names()[len(self.stages) + 1:])}]"
+
+    def get_names(self):
+        """
+        Returns names of source, stages and sinks in order
+        :return: list of names
+        """
+        return [self.source.name] + [stage.name for stage in self.stages] + [sink.name for sink in self.sinks]
+
+    def add_sink(self, sink):
+        """
+        Adds a sink to the pipeline
+        :param sink: Sink object
+        :return:
+        """
+        self.sinks.append(sink)
+        self.timing[sink.name] = StageTiming()
+
+    def run_once(self):
+        """
+        Reads a block from the source and processes it
+        :return: processed Block object, None if it was dropped by a stage
+        """
+        start = time.perf_counter()
+        block = self.source.read()
+        self.timing[self.source.name].add(time.perf_counter() - start, len(block))
+        return self.process(block)
+
+    def process(self, block):
+        """
+        Processes a block through every stage and writes it to every sink
+        :param block: Block object
+        :return: processed Block object, None if it was dropped by a stage
+        """
+        for stage in self.stages:
+            n_samples = len(block)
+            start = time.perf_counter()
+            block = stage.process(block)
+            self.timing[stage.name].add(time.perf_counter() - start, n_samples)
+            if block is None or len(block) == 0:
+                return None
+        for sink in self.sinks:
+            start = time.perf_counter()
+            sink.write(block)
+            self.timing[sink.name].add(time.perf_counter() - start, len(block))
+        return block
+
+    def reset(self):
+        """
+        Clears the state of the source and every stage
+        :return:
+        """
+        self.source.reset()
+        for stage in self.stages:
+            stage.reset()
+
+    def close(self):
+        """
+        Closes every sink, even if closing one of them fails, and then raises the first error
+        :return:
+        """
+        errors = []
+        for sink in self.sinks:
+            try:
+                sink.close()
+            except Exception as e:
+                errors.append(e)
+        if errors:
+            raise errors[0]
+
+    def get_counters(self):
+        """
+        Returns the buffer counters of the source and the counters of every sink
+        :return: dictionary with counter names and values
+        """
+        counters = self.source.get_counters()
+        for sink in self.sinks:
+            counters.update(sink.get_counters())
+        return counters
+
+    def get_timing_report(self):
+        """
+        Returns the timing of every stage
+        :return: list of rows ordered as pipeline_timing_fieldnames
+        """
+        return [[name] + self.timing[name].get_row() for name in self.get_names()]
+
+
+def format_timing_report(report):
+    """
+    Formats a timing report as a text table
+    :param report: rows made by Pipeline.get_timing_report
+    :return: string with the table
+    """
+    rows = [pipeline_timing_fieldnames] + [["-" if value is None else str(value) for value in row] for row in report]
+    widths = [max(len(row[i]) for row in rows) for i in range(len(pipeline_timing_fieldnames))]
+    return "\n".join("  ".join(value.ljust(width) for value, width in zip(row, widths)) for row in rows)
+
+
+def format_counters(counters):
+    """
+    Formats pipeline counters in a single line
+    :param counters: dictionary made by Pipeline.get_counters
+    :return: string with the counters
+    """
+    return " | ".join(f"{name}: {'-' if value is None else value}" for name, value in counters.items())
@@ -0,0 +1,358 @@
+import multiprocessing
+import queue
+import time
+
+import src.daqTools as dt
+import src.pipelineTools as pt
+import src.sharedMemoryTools as shared_memory
+import src.streamTools as stream
+
+GUI_MAX_RATE = 1000  # [Sa/s] sent to the GUI, faster acquisitions are decimated
+GUI_UPDATE_INTERVAL = 0.05  # [s] between blocks sent to the GUI
+GUI_QUEUE_SIZE = 64  # blocks waiting for the GUI before the oldest ones are dropped
+COMMAND_TIMEOUT = 30  # [s] waiting for the acquisition process to answer a command
+
+# methods run both on the GUI copy of the DAQ and on the acquisition process
+MIRRORED_METHODS = ['set_calibration', 'set_alarm_min', 'set_alarm_max', 'set_alarm_hysteresis', 'set_alarm_rate',
+                    'set_alarm_time_to_limit', 'set_alarm_trend_window', 'set_alarm_trend_hysteresis', 'disable_alarms',
+                    'set_filter', 'set_trigger', 'set_deadband', 'set_sink_policy', 'set_statistics_window',
+                    'set_sample_rate', 'set_n_samples', 'set_time_log', 'set_controller']
+# methods only run by the acquisition process, which owns the DAQ and the full resolution data
+REMOTE_METHODS = ['set_task_start', 'set_task_stop', 'set_task_write', 'read_voltage', 'read_voltage_burst',
+                  'save_data_acquisition', 'set_interlock', 'reset_interlock', 'stop_control', 'exit']
+
+
+class GUISink(pt.Sink):
+    """
+    Sink of the acquisition process that sends the GUI the latest samples together with the statistics, alarm
+    states and counters of the run. Blocks are joined and sent at most every GUI_UPDATE_INTERVAL; if the GUI
+    falls behind, the oldest blocks waiting are dropped so the acquisition never waits for it. Every message has
+    the number of the run, so the GUI can tell late messages of a past run apart.
+    """
+
+    def __init__(self, niDAQ, gui_queue, run):
+        super().__init__('gui')
+        self.niDAQ = niDAQ
+        self.gui_queue = gui_queue
+        self.run = run
+        self.blocks = []
+        self.last_sent = 0.0
+        self.dropped_blocks = 0
+
+    def write(self, block):
+        self.blocks.append(block)
+        if time.perf_counter() - self.last_sent >= GUI_UPDATE_INTERVAL:
+            self.flush()
+
+    def flush(self):
+        """
+        Sends the blocks joined since the last message, along with the state of the run
+        :return:
+        """
+        block = pt.concatenate_blocks(self.blocks) if self.blocks else pt.Block([], [], [])
+        self.blocks = []
+        self.last_sent = time.perf_counter()
+        message = {
+            'run': self.run,
+            'times': block.times, 'voltages': block.voltages, 'temperatures': block.temperatures,
+            'n_samples': len(self.niDAQ),
+            'n_read': self.niDAQ.get_n_samples_read(),
+            'run_summary': self.niDAQ.run_statistics.get_summary(),
+            'window_summary': self.niDAQ.window_statistics.get_summary(),
+            'alarm_states': list(self.niDAQ.alarm_states),
+            'counters': self.niDAQ.get_counters(),
+            'is_trigger_finished': self.niDAQ.is_trigger_finished()
+        }
+        try:
+            self.gui_queue.put_nowait(message)
+        except queue.Full:
+            try:
+                self.gui_queue.get_nowait()
+                self.dropped_blocks += 1
+            except queue.Empty:
+                pass
+            self.gui_queue.put_nowait(message)
+
+    def get_counters(self):
+        return {'gui dropped blocks': self.dropped_blocks}
+
+
+def _answer(results, status, value=None):
+    """
+    Private method that sends the result of a command to the GUI process. Errors are sent as ValueError, since
+    driver exceptions can't always be rebuilt in another process.
+    :param results: queue of results
+    :param status: 'ok' or 'error'
+    :param value: return value or exception
+    :return:
+    """
+    results.put((status, ValueError(str(value)) if status == 'error' else value))
+
+
+def run_acquisition_process(model, commands, results, gui_queue, publish_port=None, shared_memory_name=None):
+    """
+    Body of the acquisition process: owns the DAQ, acquires at the interval set by the GUI, runs the pipeline with
+    its alarms and sinks, and runs the commands the GUI sends between readings
+    :param model: DAQ model
+    :param commands: queue of (name, args) commands from the GUI
+    :param results: queue of (status, value) answers to the GUI
+    :param gui_queue: queue of blocks for the GUI
+    :param publish_port: TCP port where acquired data is published, None to not publish it
+    :param shared_memory_name: name of the shared memory ring acquired data is written to, None to not write it
+    :return:
+    """
+    niDAQ = dt.niDAQ(model, False)
+    try:
+        niDAQ.initiate_daq()
+        if publish_port is not None:
+            niDAQ.set_publisher(stream.DataPublisher(port=publish_port))
+            niDAQ.publisher.start()
+        if shared_memory_name is not None:
+            niDAQ.set_shared_ring(shared_memory.SharedRingWriter(shared_memory_name))
+    except Exception as e:
+        _answer(results, 'error', e)
+        return
+    _answer(results, 'ok')
+
+    gui_sink = None
+    calibration, time_interval, next_reading = None, None, None
+    while True:
+        # waits for commands until the next reading is due
+        timeout = None if next_reading is None else max(next_reading - time.perf_counter(), 0)
+        try:
+            name, args = commands.get(timeout=timeout)
+        except queue.Empty:
+            name, args = None, None
+        match name:
+            case None:
+                try:
+                    niDAQ.acquire_data(calibration, time_interval)
+                except Exception as e:
+                    # the GUI raises the error when it receives it
+                    next_reading = None
+                    gui_queue.put({'run': gui_sink.run, 'error': str(e)})
+                    continue
+                next_reading += time_interval / 1000
+                is_finished = niDAQ.is_trigger_finished() or (niDAQ.n_samples is not None and
+                                                              not niDAQ.is_sampling_underway())
+                if is_finished:
+                    next_reading = None
+                    gui_sink.flush()
+            case 'start':
+                run, calibration, time_interval, decimation = args
+                gui_sink = GUISink(niDAQ, gui_queue, run)
+                niDAQ.create_pipeline(calibration, [pt.Branch([pt.DecimateStage(decimation)], gui_sink)])
+                next_reading = time.perf_counter()
+                _answer(results, 'ok')
+            case 'set_time_interval':
+                [time_interval] = args
+                _answer(results, 'ok')
+            case 'stop':
+                next_reading = None
+                if gui_sink is not None:
+                    gui_sink.flush()
+                _answer(results, 'ok')
+            case 'clear_data_acquisition':
+                next_reading, gui_sink = None, None
+                niDAQ.clear_data_acquisition()
+                _answer(results, 'ok')
+            case 'quit':
+                break
+            case _:
+                try:
+                    _answer(results, 'ok', getattr(niDAQ, name)(*args))
+                except Exception as e:
+                    _answer(results, 'error', e)
+
+    niDAQ.close_pipeline()
+    if niDAQ.publisher is not None:
+        niDAQ.publisher.stop()
+    if niDAQ.shared_ring is not None:
+        niDAQ.shared_ring.close()
+    _answer(results, 'ok')
+
+
+class RemoteStatistics:
+    """
+    Latest statistics summary received from the acquisition process, read by the GUI like the statistics objects
+    """
+
+    def __init__(self, length=None):
+        self.length = length
+        self.summary = [None] * 5
+
+    def set_length(self, length):
+        self.length = length
+
+    def get_summary(self):
+        return self.summary
+
+    def clear(self):
+        self.summary = [None] * 5
+
+
+class RemoteDAQ(dt.niDAQ):
+    """
+    DAQ whose acquisition, calibration, alarms and file sinks run in a separate process, so rendering and GUI
+    callbacks can't delay sampling. The GUI uses it like a niDAQ: settings are applied to both processes, and the
+    data it plots is a decimated copy of the data in the acquisition process, received as blocks.
+    """
+
+    def __init__(self, model, exit_requested, publish_port=None, shared_memory_name=None):
+        super().__init__(model, exit_requested)
+        self.publish_port = publish_port
+        self.shared_memory_name = shared_memory_name
+        self.commands = multiprocessing.Queue()
+        self.results = multiprocessing.Queue()
+        self.gui_queue = multiprocessing.Queue(GUI_QUEUE_SIZE)
+        self.process = None
+        self.run = 0
+        self.is_started = False
+        self.time_interval = None
+        self.n_acquired = 0
+        self.n_read = 0
+        self.counters = None
+        self.trigger_finished = False
+        self.run_statistics = RemoteStatistics()
+        self.window_statistics = RemoteStatistics(self.window_statistics.length)
+
+    def __len__(self):
+        # samples stored by the acquisition process, the GUI only has a decimated copy
+        return self.n_acquired
+
+    def initiate_daq(self):
+        """
+        Starts the acquisition process, which initiates the DAQ
+        :return:
+        """
+        self.process = multiprocessing.Process(target=run_acquisition_process, name="PyroDAQ acquisition",
+                                               args=(self.model, self.commands, self.results, self.gui_queue,
+                                                     self.publish_port, self.shared_memory_name), daemon=True)
+        self.process.start()
+        self.receive_answer()
+
+    def receive_answer(self):
+        """
+        Waits for the answer to the last command sent to the acquisition process
+        :return: value returned by the command
+        """
+        status, value = self.results.get(timeout=COMMAND_TIMEOUT)
+        if status == 'error':
+            raise value
+        return value
+
+    def call(self, name, *args):
+        """
+        Runs a command in the acquisition process
+        :param name: name of a niDAQ method or an acquisition command
+        :param args: arguments of the command
+        :return: value returned by the command
+        """
+        self.commands.put((name, args))
+        return self.receive_answer()
+
+    def receive_blocks(self):
+        """
+        Adds the blocks received from the acquisition process to the GUI copy of the data
+        :return:
+        """
+        while True:
+            try:
+                message = self.gui_queue.get_nowait()
+            except queue.Empty:
+                return
+            if message['run'] != self.run:
+                continue
+            if 'error' in message:
+                raise ValueError(f"Acquisition stopped.\n{message['error']}")
+            if len(message['times']):
+                self.add_block(message['times'], message['voltages'], message['temperatures'])
+            self.n_acquired = message['n_samples']
+            self.n_read = message['n_read']
+            self.run_statistics.summary = message['run_summary']
+            self.window_statistics.summary = message['window_summary']
+            self.alarm_states = message['alarm_states']
+            self.counters = message['counters']
+            self.trigger_finished = message['is_trigger_finished']
+
+    def get_n_samples_read(self):
+        return self.n_read
+
+    def get_counters(self):
+        return self.counters
+
+    def is_trigger_finished(self):
+        return self.trigger_finished
+
+    def perform_data_acquisition(self, window, fig, figure_canvas_agg, calibration, time_interval, alarm_icon_keys):
+        if not self.is_started:
+            sample_rate = 1000 / time_interval
+            self.call('start', self.run, calibration, time_interval, max(int(sample_rate // GUI_MAX_RATE), 1))
+            self.is_started = True
+        elif time_interval != self.time_interval:
+            self.call('set_time_interval', time_interval)
+        self.time_interval = time_interval
+        self.receive_blocks()
+        self.update_figure(fig, figure_canvas_agg)
+        self.trigger_alarms(window, alarm_icon_keys)
+
+    def stop_data_acquisition(self):
+        if self.process is not None:
+            self.call('stop')
+            self.receive_blocks()
+
+    def clear_data_acquisition(self):
+        if self.process is not None:
+            self.call('clear_data_acquisition')
+        super().clear_data_acquisition()
+        self.run += 1
+        self.is_started = False
+        self.time_interval = None
+        self.n_acquired = 0
+        self.n_read = 0
+        self.counters = None
+        self.trigger_finished = False
+
+    def close(self):
+        """
+        Stops the acquisition process
+        :return:
+        """
+        if self.process is not None:
+            self.call('quit')
+            self.process.join()
+            self.process = None
+
+
+def _mirrored(name):
+    """
+    Private method that makes a method applied to the GUI copy of the DAQ and to the acquisition process
+    :param name: name of the niDAQ method
+    :return: method
+    """
+    def method(self, *args):
+        getattr(dt.niDAQ, name)(self, *args)
+        if self.process is not None:
+            self.call(name, *args)
+    method.__name__ = name
+    method.__doc__ = getattr(dt.niDAQ, name).__doc__
+    return method
+
+
+def _remote(name):
+    """
+    Private method that makes a method only run by the acquisition process
+    :param name: name of the niDAQ method
+    :return: method
+    """
+    def method(self, *args):
+        return self.call(name, *args)
+    method.__name__ = name
+    method.__doc__ = getattr(dt.niDAQ, name).__doc__
+    return method
+
+
+for method_name in MIRRORED_METHODS:
+    setattr(RemoteDAQ, method_name, _mirrored(method_name))
+for method_name in REMOTE_METHODS:
+    setattr(RemoteDAQ, method_name, _remote(method_name))
@@ -0,0 +1,177 @@
+import atexit
+import cProfile
+import functools
+import io
+import os
+import pstats
+import time
+
+from contextlib import contextmanager
+
+# environment variables that enable profiling without changing the command line
+PROFILE_ENVIRONMENT_VARIABLE = 'PYRODAQ_PROFILE'  # any value but '' or '0' prints the profiling report at exit
+CPROFILE_ENVIRONMENT_VARIABLE = 'PYRODAQ_CPROFILE'  # path where cProfile stats of the whole run are saved
+CPROFILE_N_FUNCTIONS = 25  # functions printed from the cProfile stats
+
+profiling_fieldnames = ['Function', 'Calls', 'Total [ms]', 'Mean [ms]', 'Max [ms]']
+
+_enabled = False
+_registry = {}
+
+
+class ProfileEntry:
+    """
+    Calls and time spent in a profiled function or block
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, elapsed):
+        """
+        Adds one call
+        :param elapsed: time in [s]
+        :return:
+        """
+        self.calls += 1
+        self.total += elapsed
+        self.max = max(self.max, elapsed)
+
+    def get_row(self):
+        """
+        Returns the entry ordered as profiling_fieldnames[1:]
+        :return: [calls, total, mean, max] with times in [ms]
+        """
+        return [self.calls, round(self.total * 1000, 3), round(self.total / self.calls * 1000, 3),
+                round(self.max * 1000, 3)]
+
+
+def enable():
+    global _enabled
+    _enabled = True
+
+
+def disable():
+    global _enabled
+    _enabled = False
+
+
+def is_enabled():
+    return _enabled
+
+
+def clear():
+    _registry.clear()
+
+
+def add_time(name, elapsed):
+    """
+    Adds a call to the registry
+    :param name: name of the function or block
+    :param elapsed: time in [s]
+    :return:
+    """
+    entry = _registry.get(name)
+    if entry is None:
+        entry = _registry[name] = ProfileEntry()
+    entry.add(elapsed)
+
+
+def profiled(function):
+    """
+    Decorator that records the calls and time of a function while profiling is enabled. While it's disabled the only
+    cost is checking it.
+    :param function: function or method
+    :return: decorated function
+    """
+    name = function.__qualname__
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        if not _enabled:
+            return function(*args, **kwargs)
+        start = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            add_time(name, time.perf_counter() - start)
+    return wrapper
+
+
+@contextmanager
+def profile_block(name):
+    """
+    Context manager that records the time of a block of code while profiling is enabled
+    :param name: name the block is reported with
+    :return:
+    """
+    if not _enabled:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        add_time(name, time.perf_counter() - start)
+
+
+def get_report():
+    """
+    Returns the calls and time of every profiled function, the most time consuming first
+    :return: list of rows ordered as profiling_fieldnames
+    """
+    rows = [[name] + entry.get_row() for name, entry in _registry.items()]
+    return sorted(rows, key=lambda row: row[2], reverse=True)
+
+
+def format_report(report):
+    """
+    Formats a profiling report as a text table
+    :param report: rows made by get_report
+    :return: string with the table
+    """
+    rows = [profiling_fieldnames] + [[str(value) for value in row] for row in report]
+    widths = [max(len(row[i]) for row in rows) for i in range(len(profiling_fieldnames))]
+    return "\n".join("  ".join(value.ljust(width) for value, width in zip(row, widths)) for row in rows)
+
+
+def print_report():
+    print(f"\nPROFILING\n{format_report(get_report())}" if _registry else "\nPROFILING\nNo profiled calls")
+
+
+def start_cprofile(file_name):
+    """
+    Profiles every function until the program exits with cProfile, then saves the stats and prints the most time
+    consuming functions
+    :param file_name: path where the stats are saved, they can be read with pstats or snakeviz
+    :return:
+    """
+    profiler = cProfile.Profile()
+
+    def stop_cprofile():
+        profiler.disable()
+        profiler.dump_stats(file_name)
+        stream = io.StringIO()
+        pstats.Stats(profiler, stream=stream).sort_stats('cumulative').print_stats(CPROFILE_N_FUNCTIONS)
+        print(f"\nCPROFILE (saved to {file_name})\n{stream.getvalue()}")
+
+    atexit.register(stop_cprofile)
+    profiler.enable()
+
+
+def configure(profile=False, cprofile_file=None):
+    """
+    Enables the profiling asked for on the command line or in the environment variables. Reports are printed when
+    the program exits.
+    :param profile: True to profile the instrumented functions
+    :param cprofile_file: path where cProfile stats are saved, None to not run cProfile
+    :return:
+    """
+    if profile or os.environ.get(PROFILE_ENVIRONMENT_VARIABLE, '') not in ('', '0'):
+        enable()
+        atexit.register(print_report)
+    cprofile_file = cprofile_file or os.environ.get(CPROFILE_ENVIRONMENT_VARIABLE) or None
+    if cprofile_file is not None:
+        start_cprofile(cprofile_file)
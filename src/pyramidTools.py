@@ -0,0 +1,197 @@
+import numpy as np
+
+# decimation of every level with respect to the raw samples, every factor must divide the next one
+PYRAMID_FACTORS = [10, 100, 1000]
+PYRAMID_FILE_SUFFIX = "_pyramid.npz"
+
+# one row per bucket of samples, count is the number of samples it summarizes
+BUCKET_DTYPE = np.dtype([('start', '<i8'), ('end', '<i8'), ('min', '<f8'), ('max', '<f8'), ('mean', '<f8'),
+                         ('count', '<i8')])
+
+
+def to_buckets(times, values):
+    """
+    Turns samples into buckets of one sample each
+    :param times: time of every sample
+    :param values: value of every sample
+    :return: structured array with BUCKET_DTYPE
+    """
+    buckets = np.empty(len(times), dtype=BUCKET_DTYPE)
+    buckets['start'] = buckets['end'] = times
+    buckets['min'] = buckets['max'] = buckets['mean'] = values
+    buckets['count'] = 1
+    return buckets
+
+
+def aggregate_buckets(buckets, ratio):
+    """
+    Joins every ratio consecutive buckets into one
+    :param buckets: structured array with BUCKET_DTYPE, its length a multiple of ratio
+    :param ratio: buckets joined
+    :return: structured array with BUCKET_DTYPE
+    """
+    groups = buckets.reshape(-1, ratio)
+    aggregated = np.empty(len(groups), dtype=BUCKET_DTYPE)
+    aggregated['start'] = groups['start'][:, 0]
+    aggregated['end'] = groups['end'][:, -1]
+    aggregated['min'] = groups['min'].min(axis=1)
+    aggregated['max'] = groups['max'].max(axis=1)
+    aggregated['count'] = groups['count'].sum(axis=1)
+    aggregated['mean'] = (groups['mean'] * groups['count']).sum(axis=1) / aggregated['count']
+    return aggregated
+
+
+def reduce_buckets(buckets, n_points):
+    """
+    Joins consecutive buckets until there are at most n_points, used when even the coarsest level has too many
+    :param buckets: structured array with BUCKET_DTYPE
+    :param n_points: maximum number of buckets
+    :return: structured array with BUCKET_DTYPE
+    """
+    if len(buckets) <= n_points:
+        return buckets
+    starts = np.arange(0, len(buckets), -(-len(buckets) // n_points))
+    reduced = np.empty(len(starts), dtype=BUCKET_DTYPE)
+    reduced['start'] = buckets['start'][starts]
+    reduced['end'] = buckets['end'][np.append(starts[1:], len(buckets)) - 1]
+    reduced['min'] = np.minimum.reduceat(buckets['min'], starts)
+    reduced['max'] = np.maximum.reduceat(buckets['max'], starts)
+    # buckets of different levels can be joined, so means are weighted by the samples of every bucket
+    reduced['count'] = np.add.reduceat(buckets['count'], starts)
+    reduced['mean'] = np.add.reduceat(buckets['mean'] * buckets['count'], starts) / reduced['count']
+    return reduced
+
+
+class SummaryLevel:
+    """
+    Level of the pyramid: buckets of factor samples, plus the buckets of the level below that don't make a whole
+    bucket yet
+    """
+
+    def __init__(self, factor, ratio):
+        self.factor = factor
+        self.ratio = ratio  # buckets of the level below in every bucket of this one
+        self.buckets = np.empty(1024, dtype=BUCKET_DTYPE)
+        self.n_buckets = 0
+        self.pending = np.empty(0, dtype=BUCKET_DTYPE)
+
+    def __len__(self):
+        return self.n_buckets
+
+    def get_buckets(self):
+        return self.buckets[:self.n_buckets]
+
+    def update(self, buckets):
+        """
+        Adds buckets of the level below
+        :param buckets: structured array with BUCKET_DTYPE
+        :return: new whole buckets of this level
+        """
+        buckets = np.concatenate((self.pending, buckets))
+        n_whole = len(buckets) // self.ratio * self.ratio
+        self.pending = buckets[n_whole:]
+        new_buckets = aggregate_buckets(buckets[:n_whole], self.ratio)
+        if self.n_buckets + len(new_buckets) > len(self.buckets):
+            # grows by doubling so appending stays O(1) amortized
+            grown = np.empty(max(2 * len(self.buckets), self.n_buckets + len(new_buckets)), dtype=BUCKET_DTYPE)
+            grown[:self.n_buckets] = self.get_buckets()
+            self.buckets = grown
+        self.buckets[self.n_buckets:self.n_buckets + len(new_buckets)] = new_buckets
+        self.n_buckets += len(new_buckets)
+        return new_buckets
+
+
+class SummaryPyramid:
+    """
+    Min, max and mean of the samples at several decimation levels, updated block by block while acquiring. Any time
+    range can then be summarized at screen resolution from the coarsest level that still has enough buckets, so the
+    cost depends on the number of points shown and not on the length of the run.
+    """
+
+    def __init__(self, factors=None):
+        factors = PYRAMID_FACTORS if factors is None else factors
+        ratios = [factors[0]] + [factor // previous for previous, factor in zip(factors, factors[1:])]
+        if any(factor % previous for previous, factor in zip(factors, factors[1:])):
+            raise ValueError(f"Every pyramid factor must divide the next one.\nGot {factors} instead.")
+        self.levels = [SummaryLevel(factor, ratio) for factor, ratio in zip(factors, ratios)]
+        self.n_samples = 0
+
+    def __repr__(self):
+        return ", ".join(f"x{level.factor}: {len(level)}" for level in self.levels)
+
+    def update(self, times, values):
+        """
+        Adds a block of samples
+        :param times: time of every sample
+        :param values: value of every sample
+        :return:
+        """
+        buckets = to_buckets(times, values)
+        self.n_samples += len(buckets)
+        for level in self.levels:
+            buckets = level.update(buckets)
+
+    def clear(self):
+        self.__init__([level.factor for level in self.levels])
+
+    def query(self, start, end, n_points, raw_times, get_raw_values):
+        """
+        Summarizes a time range in at most about n_points buckets. Raw samples are only read when the range has
+        fewer than n_points of them.
+        :param start: first time of the range
+        :param end: last time of the range
+        :param n_points: number of points wanted, e.g. the width of the plot in pixels
+        :param raw_times: sorted array with the time of every raw sample
+        :param get_raw_values: function(first, last) that returns the values of the raw samples [first, last)
+        :return: structured array with BUCKET_DTYPE
+        """
+        first, last = int(np.searchsorted(raw_times, start)), int(np.searchsorted(raw_times, end, side='right'))
+        if last - first <= n_points:
+            return to_buckets(raw_times[first:last], get_raw_values(first, last))
+        index = next((i for i, level in enumerate(self.levels) if (last - first) / level.factor <= n_points),
+                     len(self.levels) - 1)
+        buckets = self.levels[index].get_buckets()
+        # samples not in a whole bucket of this level yet, from the pending buckets of every level below it
+        tail = [self.levels[i].pending for i in range(index, -1, -1)]
+        buckets = np.concatenate([buckets[np.searchsorted(buckets['end'], start):
+                                          np.searchsorted(buckets['start'], end, side='right')]] +
+                                 [pending[(pending['end'] >= start) & (pending['start'] <= end)] for pending in tail])
+        return reduce_buckets(buckets, n_points)
+
+    def save(self, file_name):
+        """
+        Saves the whole buckets of every level
+        :param file_name: path to the .npz file
+        :return:
+        """
+        np.savez(file_name, factors=[level.factor for level in self.levels], n_samples=self.n_samples,
+                 **{f"level_{level.factor}": level.get_buckets() for level in self.levels})
+
+
+def get_pyramid_file_name(file_name):
+    """
+    Returns the name of the pyramid file saved next to a data file
+    :param file_name: path to the data file
+    :return: path to the pyramid file
+    """
+    return str(file_name).removesuffix(".csv") + PYRAMID_FILE_SUFFIX
+
+
+def load_pyramid(file_name):
+    """
+    Loads a pyramid saved with SummaryPyramid.save
+    :param file_name: path to the .npz file
+    :return: SummaryPyramid object
+    """
+    with np.load(file_name) as file:
+        pyramid = SummaryPyramid(file['factors'].tolist())
+        pyramid.n_samples = int(file['n_samples'])
+        for level in pyramid.levels:
+            buckets = file[f"level_{level.factor}"]
+            level.buckets = np.empty(len(buckets), dtype=BUCKET_DTYPE)
+            # pyramids saved before buckets had a count only hold whole buckets of factor samples
+            level.buckets['count'] = level.factor
+            for name in buckets.dtype.names:
+                level.buckets[name] = buckets[name]
+            level.n_buckets = len(level.buckets)
+    return pyramid
@@ -0,0 +1,236 @@
+import json
+import os
+
+import numpy as np
+
+from multiprocessing import resource_tracker, shared_memory
+
+DEFAULT_NAME = "pyrodaq_ring"
+DEFAULT_CAPACITY = 1000000  # samples kept in the ring
+
+RING_MAGIC = b'PDAQRING'
+RING_VERSION = 2
+HEADER_SIZE = 1024  # bytes reserved for the header, samples start after it
+
+# one row per sample
+SAMPLE_DTYPE = np.dtype([('time', '<i8'), ('voltage', '<f8'), ('temperature', '<f8')])
+
+HEADER_DTYPE = np.dtype([
+    ('magic', 'S8'),
+    ('version', '<u4'),
+    ('row_size', '<u4'),
+    ('capacity', '<u8'),
+    ('write_index', '<u8'),  # number of samples written since the ring was created
+    ('reserved_index', '<u8'),  # write_index once the block being written is finished
+    ('start_index', '<u8'),  # write_index when the current acquisition started
+    ('sample_rate', '<f8'),
+    ('calibration_type', 'S32'),
+    ('coefficients', '<f8', (3,)),  # ['coefficient_g2', 'coefficient_g1', 'constant'], nan when unused
+    ('layout', 'S512')  # json with the sample dtype description
+])
+
+
+def _ring_views(buffer, capacity, sample_dtype):
+    """
+    Private method that maps the header and the samples of a shared memory buffer
+    :param buffer: shared memory buffer
+    :param capacity: number of samples in the ring
+    :param sample_dtype: numpy dtype of a sample
+    :return: header and samples arrays, both views of the buffer
+    """
+    header = np.ndarray((), dtype=HEADER_DTYPE, buffer=buffer)
+    samples = np.ndarray((capacity,), dtype=sample_dtype, buffer=buffer, offset=HEADER_SIZE)
+    return header, samples
+
+
+class SharedRingWriter:
+    """
+    Writes acquired samples to a ring buffer in shared memory, so other processes on the same computer can read
+    them without copying or serializing. There must be a single writer: it writes the samples first and the write
+    index after them, so readers never need a lock. Indexes only grow, also across acquisitions, so an index a reader
+    holds always refers to the same sample.
+    """
+
+    def __init__(self, name=DEFAULT_NAME, capacity=DEFAULT_CAPACITY):
+        """
+        Creates the shared memory block
+        :param name: name readers use to find the ring
+        :param capacity: number of samples in the ring
+        """
+        self.name = name
+        self.capacity = capacity
+        self.memory = shared_memory.SharedMemory(name=name, create=True,
+                                                 size=HEADER_SIZE + capacity * SAMPLE_DTYPE.itemsize)
+        self.header, self.samples = _ring_views(self.memory.buf, capacity, SAMPLE_DTYPE)
+        self.header['magic'] = RING_MAGIC
+        self.header['version'] = RING_VERSION
+        self.header['row_size'] = SAMPLE_DTYPE.itemsize
+        self.header['capacity'] = capacity
+        self.header['write_index'] = 0
+        self.header['reserved_index'] = 0
+        self.header['start_index'] = 0
+        self.header['sample_rate'] = np.nan
+        self.header['coefficients'] = np.nan
+        self.header['layout'] = json.dumps(SAMPLE_DTYPE.descr).encode()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """
+        Releases and removes the shared memory block
+        :return:
+        """
+        del self.header, self.samples
+        self.memory.close()
+        self.memory.unlink()
+
+    def set_metadata(self, sample_rate=None, calibration=None):
+        """
+        Writes sample rate and calibration to the header
+        :param sample_rate: sample rate in [Sa/s], None if unknown
+        :param calibration: calibration object, None if unknown
+        :return:
+        """
+        self.header['sample_rate'] = np.nan if sample_rate is None else sample_rate
+        if calibration is not None:
+            self.header['calibration_type'] = calibration.expression_type.encode()
+            self.header['coefficients'] = [np.nan if calibration.get_parameter(name) is None
+                                           else calibration.get_parameter(name)
+                                           for name in ['coefficient_g2', 'coefficient_g1', 'constant']]
+
+    def reset(self):
+        """
+        Starts a new acquisition, readers see an empty ring. The indexes carry on, so samples of the new acquisition
+        overwriting those of the previous one invalidate them like any other overwrite.
+        :return:
+        """
+        self.header['start_index'] = self.header['write_index']
+
+    def write(self, times, voltages, temperatures):
+        """
+        Writes a block of samples after the latest ones, overwriting the oldest samples when the ring is full
+        :param times: time of every sample
+        :param voltages: voltage of every sample
+        :param temperatures: temperature of every sample
+        :return:
+        """
+        n_samples = len(times)
+        write_index = int(self.header['write_index'])
+        # only the latest samples fit when the block is larger than the ring
+        skip = max(n_samples - self.capacity, 0)
+        start = (write_index + skip) % self.capacity
+        n_first = min(n_samples - skip, self.capacity - start)
+        # readers check this index to know which samples may be being overwritten
+        self.header['reserved_index'] = write_index + n_samples
+        for name, column in zip(['time', 'voltage', 'temperature'], [times, voltages, temperatures]):
+            column = np.asarray(column)[skip:]
+            self.samples[name][start:start + n_first] = column[:n_first]
+            self.samples[name][:len(column) - n_first] = column[n_first:]
+        # the index is published after the samples so readers never see unwritten samples
+        self.header['write_index'] = write_index + n_samples
+
+
+class SharedRingReader:
+    """
+    Maps a ring written by SharedRingWriter from another process and reads its latest samples as NumPy views.
+    """
+
+    def __init__(self, name=DEFAULT_NAME):
+        """
+        Attaches to an existing ring
+        :param name: name of the ring
+        """
+        self.memory = shared_memory.SharedMemory(name=name)
+        if os.name == 'posix':
+            # the writer owns the block, readers mustn't remove it when they exit
+            resource_tracker.unregister(self.memory._name, 'shared_memory')
+        header = np.ndarray((), dtype=HEADER_DTYPE, buffer=self.memory.buf)
+        if header['magic'] != RING_MAGIC or header['version'] != RING_VERSION:
+            raise ValueError(f"'{name}' isn't a PyroDAQ ring buffer")
+        sample_dtype = np.dtype([tuple(field) for field in json.loads(header['layout'].item().decode())])
+        self.capacity = int(header['capacity'])
+        self.header, self.samples = _ring_views(self.memory.buf, self.capacity, sample_dtype)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """
+        Detaches from the ring, the writer keeps it
+        :return:
+        """
+        del self.header, self.samples
+        self.memory.close()
+
+    def get_write_index(self):
+        """
+        Returns number of samples written since the ring was created
+        :return: write index
+        """
+        return int(self.header['write_index'])
+
+    def get_start_index(self):
+        """
+        Returns index of the first sample of the current acquisition
+        :return: start index
+        """
+        return int(self.header['start_index'])
+
+    def get_sample_rate(self):
+        """
+        Returns sample rate written by the acquisition
+        :return: sample rate in [Sa/s], nan if unknown
+        """
+        return float(self.header['sample_rate'])
+
+    def get_calibration(self):
+        """
+        Returns calibration written by the acquisition
+        :return: expression type and coefficients ['coefficient_g2', 'coefficient_g1', 'constant']
+        """
+        return self.header['calibration_type'].item().decode(), self.header['coefficients'].tolist()
+
+    def is_valid(self, first_index):
+        """
+        Checks if samples read from first_index haven't been overwritten yet, views returned by latest are only
+        valid while this is True
+        :param first_index: index of the first sample read
+        :return: True if they are still in the ring
+        """
+        return int(self.header['reserved_index']) - first_index <= self.capacity
+
+    def latest(self, n_samples):
+        """
+        Returns the latest samples of the current acquisition without copying them. When they wrap around the end of
+        the ring they are returned as two views, oldest first.
+        :param n_samples: number of samples, limited to the samples available
+        :return: index of the first sample and list with one or two structured array views
+        """
+        # the write index is read first, a reset in between moves the start past it and no sample is returned
+        write_index = self.get_write_index()
+        start_index = self.get_start_index()
+        n_samples = max(min(n_samples, write_index - start_index, self.capacity), 0)
+        first_index = write_index - n_samples
+        start = first_index % self.capacity
+        if start + n_samples <= self.capacity:
+            return first_index, [self.samples[start:start + n_samples]]
+        return first_index, [self.samples[start:], self.samples[:start + n_samples - self.capacity]]
+
+    def read_latest(self, n_samples):
+        """
+        Returns a consistent copy of the latest samples, retrying if the writer overwrote them while copying
+        :param n_samples: number of samples
+        :return: structured array with the samples
+        """
+        while True:
+            first_index, views = self.latest(n_samples)
+            samples = np.concatenate(views) if len(views) > 1 else views[0].copy()
+            if self.is_valid(first_index):
+                return samples
@@ -0,0 +1,195 @@
+import math
+import threading
+import time
+
+import numpy as np
+
+from nidaqmx.constants import (AcquisitionType, EveryNSamplesEventType, OverwriteMode, ReadRelativeTo,
+                               SampleTimingType)
+from nidaqmx.error_codes import DAQmxErrors
+from nidaqmx.errors import DaqReadError
+
+SIMULATED_MODEL = 'Simulated'
+SIMULATED_MAX_RATE = 250000  # [Sa/s], same as the USB-6211
+SIMULATED_BASE_VOLTAGE = 1.0  # [V]
+SIMULATED_AMPLITUDE = 0.2  # [V]
+SIMULATED_PERIOD = 60  # [s]
+SIMULATED_NOISE = 0.002  # standard deviation of the noise [V]
+
+
+class _Channels:
+    """
+    Stands for the channel collections of a nidaqmx task, only records the channels added
+    """
+
+    def __init__(self):
+        self.channels = []
+
+    def add_ai_voltage_chan(self, physical_channel, *args, **kwargs):
+        self.channels.append(physical_channel)
+
+    def add_ao_voltage_chan(self, physical_channel, *args, **kwargs):
+        self.channels.append(physical_channel)
+
+    def add_do_chan(self, lines, *args, **kwargs):
+        self.channels.append(lines)
+
+
+class _Timing:
+    """
+    Stands for nidaqmx task timing, stores the sample clock configuration
+    """
+
+    def __init__(self):
+        self.samp_clk_max_rate = SIMULATED_MAX_RATE
+        self.samp_timing_type = SampleTimingType.ON_DEMAND
+        self.samp_clk_rate = None
+        self.samp_quant_samp_mode = None
+        self.samp_quant_samp_per_chan = None
+
+    def cfg_samp_clk_timing(self, rate, source="", active_edge=None, sample_mode=AcquisitionType.FINITE,
+                            samps_per_chan=1000):
+        self.samp_timing_type = SampleTimingType.SAMPLE_CLOCK
+        self.samp_clk_rate = rate
+        self.samp_quant_samp_mode = sample_mode
+        self.samp_quant_samp_per_chan = samps_per_chan
+
+
+class _InStream:
+    """
+    Stands for nidaqmx task input stream, reports the buffer of a task with a sample clock
+    """
+
+    def __init__(self, task):
+        self.task = task
+        self.over_write = OverwriteMode.DO_NOT_OVERWRITE_UNREAD_SAMPLES
+        self.relative_to = ReadRelativeTo.CURRENT_READ_POSITION
+        self.offset = 0
+
+    @property
+    def input_buf_size(self):
+        return self.task.timing.samp_quant_samp_per_chan
+
+    @property
+    def total_samp_per_chan_acquired(self):
+        if not self.task.is_running or self.task.timing.samp_timing_type == SampleTimingType.ON_DEMAND:
+            return 0
+        return int((time.perf_counter() - self.task.start_time) * self.task.timing.samp_clk_rate)
+
+    @property
+    def curr_read_pos(self):
+        return self.task.samples_read
+
+    @property
+    def avail_samp_per_chan(self):
+        return min(self.total_samp_per_chan_acquired - self.curr_read_pos, self.input_buf_size)
+
+
+class SimulatedTask:
+    """
+    Task with the part of the nidaqmx.Task interface used by niDAQ, so the application and the acquisition
+    pipeline can run without a DAQ connected. Analog input reads a slow sine wave with noise; with a sample clock
+    configured, reads block until the requested samples would have been acquired by real hardware, and every N
+    samples callbacks are called from their own thread like the driver does.
+    """
+
+    def __init__(self, seed=None):
+        self.ai_channels = _Channels()
+        self.ao_channels = _Channels()
+        self.do_channels = _Channels()
+        self.timing = _Timing()
+        self.in_stream = _InStream(self)
+        self.output_value = 0.0
+        self.is_running = False
+        self._rng = np.random.default_rng(seed)
+        self._created = time.perf_counter()
+        self.start_time = None
+        self.samples_read = 0
+        self._every_n_samples = None
+        self._every_n_callback = None
+        self._event_thread = None
+
+    def start(self):
+        self.is_running = True
+        self.start_time = time.perf_counter()
+        self.samples_read = 0
+        if self._every_n_callback is not None:
+            self._event_thread = threading.Thread(target=self._run_every_n_samples_events,
+                                                  name="SimulatedTask events", daemon=True)
+            self._event_thread.start()
+
+    def stop(self):
+        self.is_running = False
+        # pending events are discarded, the same as stopping a real task
+        if self._event_thread is not None and self._event_thread is not threading.current_thread():
+            self._event_thread.join()
+        self._event_thread = None
+
+    def register_every_n_samples_acquired_into_buffer_event(self, sample_interval, callback_method):
+        """
+        Registers a callback called every time sample_interval samples have been acquired, None unregisters it
+        :param sample_interval: number of samples between calls
+        :param callback_method: function(task_handle, every_n_samples_event_type, number_of_samples, callback_data)
+        :return:
+        """
+        self._every_n_samples = sample_interval
+        self._every_n_callback = callback_method
+
+    def _run_every_n_samples_events(self):
+        """
+        Private method, body of the thread that calls the every N samples callback
+        :return:
+        """
+        n_events = 0
+        while self.is_running:
+            n_events += 1
+            wait = self.start_time + n_events * self._every_n_samples / self.timing.samp_clk_rate - time.perf_counter()
+            if wait > 0:
+                time.sleep(wait)
+            if not self.is_running:
+                return
+            self._every_n_callback(0, EveryNSamplesEventType.ACQUIRED_INTO_BUFFER.value, self._every_n_samples, None)
+
+    def close(self):
+        self.stop()
+
+    def write(self, value, *args, **kwargs):
+        self.output_value = value
+
+    def _signal(self, seconds):
+        """
+        Private method, simulated voltage at the given times
+        :param seconds: array of times since the task was created in [s]
+        :return: array of voltages
+        """
+        return (SIMULATED_BASE_VOLTAGE + SIMULATED_AMPLITUDE * np.sin(2 * math.pi * seconds / SIMULATED_PERIOD) +
+                self._rng.normal(0, SIMULATED_NOISE, np.shape(seconds)))
+
+    def read(self, number_of_samples_per_channel=None, timeout=10.0):
+        if self.timing.samp_timing_type == SampleTimingType.ON_DEMAND:
+            voltages = self._signal(np.full(1 if number_of_samples_per_channel is None
+                                            else number_of_samples_per_channel, time.perf_counter() - self._created))
+        else:
+            n_samples = 1 if number_of_samples_per_channel is None else number_of_samples_per_channel
+            rate = self.timing.samp_clk_rate
+            if self.in_stream.relative_to == ReadRelativeTo.MOST_RECENT_SAMPLE:
+                first_index = max(self.in_stream.total_samp_per_chan_acquired + self.in_stream.offset, 0)
+            else:
+                first_index = self.samples_read + self.in_stream.offset
+            # samples older than the buffer have been overwritten by newer ones
+            if self.in_stream.total_samp_per_chan_acquired - first_index > self.in_stream.input_buf_size:
+                raise DaqReadError("Attempted to read samples that are no longer available.",
+                                   DAQmxErrors.SAMPLES_NO_LONGER_AVAILABLE.value)
+            # waits until the hardware would have the samples in its buffer
+            ready_time = self.start_time + (first_index + n_samples) / rate
+            wait = ready_time - time.perf_counter()
+            if wait > timeout:
+                raise TimeoutError(f"Simulated read of {n_samples} samples timed out")
+            if wait > 0:
+                time.sleep(wait)
+            indexes = np.arange(first_index, first_index + n_samples)
+            voltages = self._signal(self.start_time - self._created + indexes / rate)
+            self.samples_read = first_index + n_samples
+        if number_of_samples_per_channel is None:
+            return float(voltages[0])
+        return voltages.tolist()
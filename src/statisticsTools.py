@@ -0,0 +1,317 @@
+import math
+
+from collections import deque
+
+import numpy as np
+
+DEFAULT_WINDOW_LENGTH = 50  # samples used by the sliding window statistics
+OUTLIER_THRESHOLD = 3.5  # modified z-score above which a sample is rejected as an outlier
+
+statistics_fieldnames = ['Statistic', 'Mean [ºC]', 'Std [ºC]', 'Min [ºC]', 'Max [ºC]', 'Rate [ºC/s]']
+
+
+class RunningStatistics:
+    """
+    Whole run statistics updated incrementally with Welford's algorithm. Every incoming block is merged with
+    Chan's parallel update, so the cost of each update is O(block) no matter how long the run is.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = None
+        self.max = None
+        self.first_time = None
+        self.first_value = None
+        self.last_time = None
+        self.last_value = None
+
+    def __len__(self):
+        return self.count
+
+    def clear(self):
+        """
+        Resets the accumulators
+        :return:
+        """
+        self.__init__()
+
+    def update(self, values, times):
+        """
+        Merges a block of values into the accumulators
+        :param values: block of temperatures
+        :param times: time of each value in [ns]
+        :return:
+        """
+        values = np.asarray(values, dtype=float)
+        if values.size == 0:
+            return
+        times = np.asarray(times, dtype=float)
+        block_count = values.size
+        block_mean = float(values.mean())
+        block_m2 = float(((values - block_mean) ** 2).sum())
+
+        total = self.count + block_count
+        delta = block_mean - self.mean
+        self.mean += delta * block_count / total
+        self.m2 += block_m2 + delta ** 2 * self.count * block_count / total
+        self.count = total
+
+        block_min, block_max = float(values.min()), float(values.max())
+        self.min = block_min if self.min is None else min(self.min, block_min)
+        self.max = block_max if self.max is None else max(self.max, block_max)
+
+        if self.first_time is None:
+            self.first_time, self.first_value = float(times[0]), float(values[0])
+        self.last_time, self.last_value = float(times[-1]), float(values[-1])
+
+    def get_std(self):
+        """
+        Returns sample standard deviation
+        :return: standard deviation, None if there are less than 2 values
+        """
+        return math.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else None
+
+    def get_rate(self):
+        """
+        Returns mean rate of change between the first and last values
+        :return: rate of change in [ºC/s], None if there isn't a time span
+        """
+        if self.count < 2 or self.last_time == self.first_time:
+            return None
+        return (self.last_value - self.first_value) / (self.last_time - self.first_time) * 1e9
+
+    def get_summary(self):
+        """
+        Returns the statistics as a list ordered as statistics_fieldnames[1:]
+        :return: [mean, std, min, max, rate]
+        """
+        return [self.mean if self.count else None, self.get_std(), self.min, self.max, self.get_rate()]
+
+
+class WindowStatistics:
+    """
+    Statistics over the latest n values. Mean and variance are kept with Welford's add/remove update and min/max
+    with monotonic queues, so every value costs O(1) amortized.
+    """
+
+    def __init__(self, length=DEFAULT_WINDOW_LENGTH):
+        if length < 2:
+            raise ValueError(f"Window length must be at least 2.\nGot {length} instead.")
+        self.length = length
+        self.values = deque()
+        self.times = deque()
+        self.mean = 0.0
+        self.m2 = 0.0
+        self._min_queue = deque()
+        self._max_queue = deque()
+        self._n_seen = 0
+
+    def __len__(self):
+        return len(self.values)
+
+    def clear(self):
+        """
+        Resets the window keeping its length
+        :return:
+        """
+        self.__init__(self.length)
+
+    def set_length(self, length):
+        """
+        Changes the window length, clearing the window
+        :param length: number of samples in the window
+        :return:
+        """
+        self.__init__(length)
+
+    def update(self, values, times):
+        """
+        Pushes a block of values into the window
+        :param values: block of temperatures
+        :param times: time of each value in [ns]
+        :return:
+        """
+        for value, time in zip(np.asarray(values, dtype=float).tolist(), np.asarray(times, dtype=float).tolist()):
+            self._push(value, time)
+
+    def _push(self, value, time):
+        """
+        Private method that adds a value to the window, removing the oldest one when it's full
+        :param value: temperature
+        :param time: time in [ns]
+        :return:
+        """
+        if len(self.values) == self.length:
+            self._pop()
+        self.values.append(value)
+        self.times.append(time)
+        delta = value - self.mean
+        self.mean += delta / len(self.values)
+        self.m2 += delta * (value - self.mean)
+
+        # queues keep (index, value) so that values leaving the window can be recognised
+        while self._min_queue and self._min_queue[-1][1] >= value:
+            self._min_queue.pop()
+        self._min_queue.append((self._n_seen, value))
+        while self._max_queue and self._max_queue[-1][1] <= value:
+            self._max_queue.pop()
+        self._max_queue.append((self._n_seen, value))
+        self._n_seen += 1
+
+    def _pop(self):
+        """
+        Private method that removes the oldest value of the window
+        :return:
+        """
+        value = self.values.popleft()
+        self.times.popleft()
+        n = len(self.values)
+        if n == 0:
+            self.mean, self.m2 = 0.0, 0.0
+        else:
+            old_mean = self.mean
+            self.mean -= (value - self.mean) / n
+            self.m2 = max(self.m2 - (value - old_mean) * (value - self.mean), 0.0)
+
+        oldest_index = self._n_seen - n - 1
+        if self._min_queue and self._min_queue[0][0] == oldest_index:
+            self._min_queue.popleft()
+        if self._max_queue and self._max_queue[0][0] == oldest_index:
+            self._max_queue.popleft()
+
+    def get_std(self):
+        """
+        Returns sample standard deviation of the window
+        :return: standard deviation, None if there are less than 2 values
+        """
+        return math.sqrt(self.m2 / (len(self) - 1)) if len(self) > 1 else None
+
+    def get_rate(self):
+        """
+        Returns rate of change between the oldest and newest values in the window
+        :return: rate of change in [ºC/s], None if there isn't a time span
+        """
+        if len(self) < 2 or self.times[-1] == self.times[0]:
+            return None
+        return (self.values[-1] - self.values[0]) / (self.times[-1] - self.times[0]) * 1e9
+
+    def get_summary(self):
+        """
+        Returns the statistics as a list ordered as statistics_fieldnames[1:]
+        :return: [mean, std, min, max, rate]
+        """
+        if not self.values:
+            return [None] * 5
+        return [self.mean, self.get_std(), self._min_queue[0][1], self._max_queue[0][1], self.get_rate()]
+
+
+class WindowTrend:
+    """
+    Trend of the latest n values: the slope and the level at the newest value of their least squares line,
+    calculated for every sample of a block with array operations, so a block costs O(block) whatever the length.
+
+    The samples are split in chunks of n, so every window is the end of the previous chunk plus the start of its own
+    one. Their sums are cumulative sums within each chunk, relative to its first sample, which keeps them as precise
+    as sums over a single window however long the block is. The latest n - 1 samples are kept for the next block.
+    """
+
+    def __init__(self, length=DEFAULT_WINDOW_LENGTH):
+        if length < 2:
+            raise ValueError(f"Window length must be at least 2.\nGot {length} instead.")
+        self.length = length
+        self.times = np.empty(0, dtype=np.int64)
+        self.values = np.empty(0)
+
+    def clear(self):
+        """
+        Resets the window keeping its length
+        :return:
+        """
+        self.__init__(self.length)
+
+    def set_length(self, length):
+        """
+        Changes the window length, clearing the window
+        :param length: number of samples in the window
+        :return:
+        """
+        self.__init__(length)
+
+    def update(self, times, values):
+        """
+        Fits the window ending at every sample of a block
+        :param times: time of each value in [ns]
+        :param values: block of temperatures
+        :return: arrays with the rate of change in [ºC/s] and the temperature of the line at every sample, nan until
+        the window is full
+        """
+        n = self.length
+        n_new = len(times)
+        times = np.concatenate((self.times, np.asarray(times, dtype=np.int64)))
+        values = np.concatenate((self.values, np.asarray(values, dtype=float)))
+        self.times, self.values = times[-(n - 1):], values[-(n - 1):]
+        if n_new == 0:
+            return np.empty(0), np.empty(0)
+
+        # one chunk per row, the last one padded with its last sample
+        n_chunks = -(-len(times) // n)
+        padding = n_chunks * n - len(times)
+        chunk_times = np.pad(times, (0, padding), mode='edge').reshape(n_chunks, n)
+        chunk_values = np.pad(values, (0, padding), mode='edge').reshape(n_chunks, n)
+        t0, v0 = chunk_times[:, :1], chunk_values[:, :1]
+        u = (chunk_times - t0) / 1e9  # [s], times are subtracted as integers
+        y = chunk_values - v0
+        prefix_sums = [np.cumsum(column, axis=1) for column in (u, u * u, y, u * y)]
+
+        # the window ending at column j of a chunk takes the last n - 1 - j samples of the previous chunk, their sums
+        # are moved to the origin of the chunk
+        m = n - 1 - np.arange(n)
+        su, suu, sy, suy = [np.vstack((np.zeros((1, n)), (sums[:, -1:] - sums)[:-1])) for sums in prefix_sums]
+        du = np.vstack(([[0.0]], (t0[:-1] - t0[1:]) / 1e9))
+        dy = np.vstack(([[0.0]], v0[:-1] - v0[1:]))
+        su, suu, sy, suy = (su + m * du, suu + 2 * du * su + m * du * du, sy + m * dy,
+                            suy + du * sy + dy * su + m * du * dy)
+        su, suu, sy, suy = [sums + suffix for sums, suffix in zip(prefix_sums, (su, suu, sy, suy))]
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            rates = (n * suy - su * sy) / (n * suu - su * su)
+            levels = v0 + (sy + rates * (n * u - su)) / n
+        rates, levels = rates.ravel()[:len(times)], levels.ravel()[:len(times)]
+        # windows that start before the first sample
+        rates[:n - 1], levels[:n - 1] = np.nan, np.nan
+        return rates[-n_new:], levels[-n_new:]
+
+
+def robust_mean(samples, threshold=OUTLIER_THRESHOLD):
+    """
+    Calculates the mean and its standard error after rejecting outliers. Samples whose modified z-score, based on the
+    median absolute deviation, is above the threshold are rejected.
+    :param samples: list of samples
+    :param threshold: modified z-score limit
+    :return: mean, standard error of the mean and number of samples kept
+    """
+    samples = np.asarray(samples, dtype=float)
+    if samples.size == 0:
+        raise ValueError("There must be at least one sample.")
+    median = np.median(samples)
+    mad = np.median(np.abs(samples - median))
+    if mad > 0:
+        # 0.6745 makes the MAD consistent with the standard deviation for normal data
+        samples = samples[0.6745 * np.abs(samples - median) / mad <= threshold]
+    n_kept = samples.size
+    std_error = float(samples.std(ddof=1) / math.sqrt(n_kept)) if n_kept > 1 else 0.0
+    return float(samples.mean()), std_error, n_kept
+
+
+def format_summary(summary):
+    """
+    Formats a statistics summary to be shown in the gui
+    :param summary: [mean, std, min, max, rate]
+    :return: string with the summary
+    """
+    names = ['Mean', 'Std', 'Min', 'Max', 'dT/dt']
+    units = ['ºC', 'ºC', 'ºC', 'ºC', 'ºC/s']
+    return "   ".join(f"{name}: {'-' if value is None else f'{value:.3f}'} {unit}"
+                      for name, value, unit in zip(names, summary, units))
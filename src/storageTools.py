@@ -0,0 +1,107 @@
+import json
+import sqlite3
+
+import datetime as dt
+import src.calibrationTools as ct
+
+from pathlib import Path
+
+CALIBRATION_LIBRARY_PATH = str(Path.home().joinpath(".pyrodaq", "calibrations.db"))
+LIBRARY_LOG_LENGTH = 10  # calibrations loaded to the log when the app starts
+
+
+class CalibrationLibrary:
+    """
+    Local store where every calibration is saved. Calibrations are kept in a SQLite file indexed by sensor id, so
+    loading the latest calibration of a sensor is an index lookup that doesn't depend on the size of the library.
+    """
+
+    def __init__(self, path=CALIBRATION_LIBRARY_PATH):
+        """
+        Opens the library, creating it if it doesn't exist
+        :param path: path to the library file
+        """
+        self.path = path
+        if path != ":memory:":
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("CREATE TABLE IF NOT EXISTS calibrations ("
+                                "id INTEGER PRIMARY KEY AUTOINCREMENT, "
+                                "sensor_id TEXT NOT NULL, "
+                                "timestamp TEXT NOT NULL, "
+                                "expression_type TEXT NOT NULL, "
+                                "calibration TEXT NOT NULL)")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS calibrations_sensor_id "
+                                "ON calibrations (sensor_id, id)")
+        self.connection.commit()
+
+    def __len__(self):
+        return self.connection.execute("SELECT COUNT(*) FROM calibrations").fetchone()[0]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """
+        Closes the library file
+        :return:
+        """
+        self.connection.close()
+
+    def save(self, calibration):
+        """
+        Saves a calibration to the library, assigning the moment it was saved
+        :param calibration: calibration object
+        :return:
+        """
+        calibration.set_timestamp(dt.datetime.now().isoformat(timespec='seconds'))
+        self.connection.execute("INSERT INTO calibrations (sensor_id, timestamp, expression_type, calibration) "
+                                "VALUES (?, ?, ?, ?)",
+                                (calibration.sensor_id, calibration.timestamp, calibration.expression_type,
+                                 json.dumps(calibration.to_dict())))
+        self.connection.commit()
+
+    def load_latest(self, sensor_id=ct.DEFAULT_SENSOR_ID):
+        """
+        Loads the last calibration saved for a sensor
+        :param sensor_id: string that identifies the sensor
+        :return: calibration object, None if the sensor has no calibrations
+        """
+        calibrations = self.load(sensor_id, limit=1)
+        return calibrations[0] if calibrations else None
+
+    def load(self, sensor_id=ct.DEFAULT_SENSOR_ID, limit=LIBRARY_LOG_LENGTH):
+        """
+        Loads the latest calibrations saved for a sensor
+        :param sensor_id: string that identifies the sensor
+        :param limit: maximum number of calibrations loaded
+        :return: list of calibration objects, from oldest to newest
+        """
+        rows = self.connection.execute("SELECT calibration FROM calibrations WHERE sensor_id = ? "
+                                       "ORDER BY id DESC LIMIT ?", (sensor_id, limit)).fetchall()
+        return [ct.calibration_from_dict(json.loads(row[0])) for row in reversed(rows)]
+
+    def get_sensor_ids(self):
+        """
+        Returns every sensor id with saved calibrations
+        :return: list of sensor ids
+        """
+        return [row[0] for row in self.connection.execute("SELECT DISTINCT sensor_id FROM calibrations "
+                                                          "ORDER BY sensor_id")]
+
+
+def load_calibration(sensor_id=ct.DEFAULT_SENSOR_ID, path=CALIBRATION_LIBRARY_PATH):
+    """
+    Loads the last calibration of a sensor without going through the calibration windows, used by headless scripts
+    :param sensor_id: string that identifies the sensor
+    :param path: path to the library file
+    :return: calibration object
+    """
+    with CalibrationLibrary(path) as library:
+        calibration = library.load_latest(sensor_id)
+    if calibration is None:
+        raise ValueError(f"No calibration found for sensor '{sensor_id}' in {path}")
+    return calibration
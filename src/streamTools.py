@@ -0,0 +1,259 @@
+import argparse
+import asyncio
+import struct
+import threading
+
+import numpy as np
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 50007
+DEFAULT_QUEUE_SIZE = 64  # frames kept for every subscriber before the oldest ones are dropped
+
+# frame header: magic, version, number of channels, number of samples, sequence number
+FRAME_MAGIC = b'PDAQ'
+FRAME_VERSION = 1
+FRAME_HEADER = struct.Struct('<4sBBxxIQ')
+# channels after the int64 time column, every one as float64
+FRAME_CHANNELS = ['voltage', 'temperature']
+
+
+def encode_frame(sequence, times, voltages, temperatures):
+    """
+    Packs a block of samples in the binary frame sent to subscribers: the header followed by the time column as
+    int64 and every channel as float64, all little endian
+    :param sequence: number of the frame, so subscribers can detect dropped frames
+    :param times: time of every sample
+    :param voltages: voltage of every sample
+    :param temperatures: temperature of every sample
+    :return: bytes with the frame
+    """
+    n_samples = len(times)
+    header = FRAME_HEADER.pack(FRAME_MAGIC, FRAME_VERSION, len(FRAME_CHANNELS), n_samples, sequence)
+    return b''.join((header,
+                     np.asarray(times, dtype='<i8').tobytes(),
+                     np.asarray(voltages, dtype='<f8').tobytes(),
+                     np.asarray(temperatures, dtype='<f8').tobytes()))
+
+
+def payload_size(n_channels, n_samples):
+    """
+    Returns size of the frame payload that follows the header
+    :param n_channels: number of float64 channels
+    :param n_samples: number of samples
+    :return: size in bytes
+    """
+    return (1 + n_channels) * 8 * n_samples
+
+
+def decode_frame(header, payload):
+    """
+    Unpacks a frame made with encode_frame
+    :param header: bytes with the frame header
+    :param payload: bytes with the columns
+    :return: sequence number and dictionary with the 'time' column and one column per channel
+    """
+    magic, version, n_channels, n_samples, sequence = FRAME_HEADER.unpack(header)
+    if magic != FRAME_MAGIC or version != FRAME_VERSION:
+        raise ValueError(f"Invalid frame header: {magic} version {version}")
+    block = {'time': np.frombuffer(payload, dtype='<i8', count=n_samples)}
+    for i, channel in enumerate(FRAME_CHANNELS[:n_channels], start=1):
+        block[channel] = np.frombuffer(payload, dtype='<f8', count=n_samples, offset=i * 8 * n_samples)
+    return sequence, block
+
+
+class DataPublisher:
+    """
+    Publishes acquisition blocks to any number of local subscribers over TCP. The asyncio server runs in its own
+    thread and every subscriber has a bounded queue: when a subscriber can't keep up its oldest frames are dropped,
+    so publishing never blocks the acquisition.
+    """
+
+    def __init__(self, host=DEFAULT_HOST, port=DEFAULT_PORT, queue_size=DEFAULT_QUEUE_SIZE):
+        self.host = host
+        self.port = port
+        self.queue_size = queue_size
+        self.sequence = 0
+        self.dropped_frames = 0
+        self.subscribers = set()
+        self._loop = None
+        self._server = None
+        self._thread = None
+        self._ready = threading.Event()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def start(self):
+        """
+        Starts the server thread and waits until it's listening
+        :return:
+        """
+        self._thread = threading.Thread(target=self._run, name="DataPublisher", daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        if self._server is None:
+            raise ValueError(f"Couldn't start publisher on {self.host}:{self.port}")
+
+    def stop(self):
+        """
+        Closes the server and every subscriber connection
+        :return:
+        """
+        if self._loop is not None and self._loop.is_running():
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+
+    def _run(self):
+        """
+        Private method, body of the server thread
+        :return:
+        """
+        self._loop = asyncio.new_event_loop()
+        try:
+            self._server = self._loop.run_until_complete(
+                asyncio.start_server(self._handle_subscriber, self.host, self.port))
+            # port 0 lets the system choose a free port
+            self.port = self._server.sockets[0].getsockname()[1]
+        except OSError as e:
+            print(f"Error: {e}")
+        self._ready.set()
+        if self._server is None:
+            return
+        self._loop.run_forever()
+        self._server.close()
+        for task in asyncio.all_tasks(self._loop):
+            task.cancel()
+        self._loop.run_until_complete(asyncio.sleep(0))
+        self._loop.close()
+
+    async def _handle_subscriber(self, reader, writer):
+        """
+        Private method that sends the frames of a subscriber's queue until it disconnects
+        :param reader: asyncio stream reader, unused
+        :param writer: asyncio stream writer
+        :return:
+        """
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        self.subscribers.add(queue)
+        try:
+            while True:
+                frame = await queue.get()
+                writer.write(frame)
+                await writer.drain()
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            self.subscribers.discard(queue)
+            writer.close()
+
+    def _broadcast(self, frame):
+        """
+        Private method, runs in the server thread and queues a frame for every subscriber
+        :param frame: bytes with the frame
+        :return:
+        """
+        for queue in self.subscribers:
+            if queue.full():
+                queue.get_nowait()
+                self.dropped_frames += 1
+            queue.put_nowait(frame)
+
+    def publish(self, times, voltages, temperatures):
+        """
+        Sends a block of samples to every subscriber, can be called from any thread
+        :param times: time of every sample
+        :param voltages: voltage of every sample
+        :param temperatures: temperature of every sample
+        :return:
+        """
+        if self._loop is None or not self._loop.is_running():
+            return
+        frame = encode_frame(self.sequence, times, voltages, temperatures)
+        self.sequence += 1
+        self._loop.call_soon_threadsafe(self._broadcast, frame)
+
+    def get_n_subscribers(self):
+        """
+        Returns number of connected subscribers
+        :return: number of subscribers
+        """
+        return len(self.subscribers)
+
+
+async def subscribe(host=DEFAULT_HOST, port=DEFAULT_PORT):
+    """
+    Connects to a publisher and yields the blocks it sends
+    :param host: publisher host
+    :param port: publisher port
+    :return: async generator of (sequence, block) pairs
+    """
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        while True:
+            header = await reader.readexactly(FRAME_HEADER.size)
+            _, _, n_channels, n_samples, _ = FRAME_HEADER.unpack(header)
+            payload = await reader.readexactly(payload_size(n_channels, n_samples))
+            yield decode_frame(header, payload)
+    except asyncio.IncompleteReadError:
+        return
+    finally:
+        writer.close()
+
+
+async def _print_subscription(host, port):
+    """
+    Private method that prints every block received from a publisher
+    :param host: publisher host
+    :param port: publisher port
+    :return:
+    """
+    async for sequence, block in subscribe(host, port):
+        print(f"#{sequence}: {len(block['time'])} samples, last temperature {block['temperature'][-1]:.3f} ºC")
+
+
+async def _run_loopback_test(n_blocks, block_size):
+    """
+    Private method that publishes blocks on a free local port and checks a subscriber gets them unchanged
+    :param n_blocks: number of blocks published
+    :param block_size: samples per block
+    :return: True if every block was received unchanged
+    """
+    with DataPublisher(port=0) as publisher:
+        subscription = subscribe(publisher.host, publisher.port)
+        # waits until the publisher has registered the subscriber
+        first_block = asyncio.ensure_future(anext(subscription))
+        while publisher.get_n_subscribers() == 0:
+            await asyncio.sleep(0.01)
+        sent = []
+        for i in range(n_blocks):
+            times = np.arange(i * block_size, (i + 1) * block_size)
+            voltages = np.random.rand(block_size)
+            sent.append((times, voltages, voltages * 100))
+            publisher.publish(*sent[-1])
+        received = [await first_block] + [await anext(subscription) for _ in range(n_blocks - 1)]
+        await subscription.aclose()
+    return all(sequence == i and np.array_equal(block['time'], times) and np.array_equal(block['voltage'], voltages)
+               and np.array_equal(block['temperature'], temperatures)
+               for i, ((sequence, block), (times, voltages, temperatures)) in enumerate(zip(received, sent)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Test client for the PyroDAQ data stream")
+    parser.add_argument('--host', default=DEFAULT_HOST, help="publisher host")
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help="publisher port")
+    parser.add_argument('--loopback', action='store_true', help="runs a local publisher and checks what is received")
+    arguments = parser.parse_args()
+
+    if arguments.loopback:
+        passed = asyncio.run(_run_loopback_test(n_blocks=DEFAULT_QUEUE_SIZE // 2, block_size=100))
+        print("Loopback test passed" if passed else "Loopback test failed")
+    else:
+        asyncio.run(_print_subscription(arguments.host, arguments.port))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+import math
+
+import numpy as np
+
+HISTOGRAM_MIN_NS = 1000  # [ns], shorter times fall in the first bin
+HISTOGRAM_DECADES = 7  # from 1 µs to 10 s, longer times fall in the last bin
+HISTOGRAM_BINS_PER_DECADE = 20  # every bin is about 12 % wider than the previous one
+
+histogram_fieldnames = ['Up to [ms]', 'Count']
+
+
+class LatencyHistogram:
+    """
+    Histogram of times with logarithmic bins, so it has the same relative resolution for µs and s. Its size is fixed,
+    adding a time is O(1) and percentiles are read from the bins, with an error of at most one bin width.
+    """
+
+    def __init__(self):
+        self.counts = np.zeros(HISTOGRAM_DECADES * HISTOGRAM_BINS_PER_DECADE + 2, dtype=np.int64)
+        self.count = 0
+        self.max = 0
+
+    def __len__(self):
+        return self.count
+
+    @staticmethod
+    def get_upper_bounds():
+        """
+        Returns the upper bound of every bin, the last bin has no bound
+        :return: array of times in [ns]
+        """
+        exponents = np.arange(HISTOGRAM_DECADES * HISTOGRAM_BINS_PER_DECADE + 1) / HISTOGRAM_BINS_PER_DECADE
+        return np.append(HISTOGRAM_MIN_NS * 10 ** exponents, np.inf)
+
+    def add(self, time_ns):
+        """
+        Adds a time
+        :param time_ns: time in [ns], negative times are added as 0
+        :return:
+        """
+        time_ns = max(time_ns, 0)
+        if time_ns < HISTOGRAM_MIN_NS:
+            index = 0
+        else:
+            index = min(int(math.log10(time_ns / HISTOGRAM_MIN_NS) * HISTOGRAM_BINS_PER_DECADE) + 1,
+                        len(self.counts) - 1)
+        self.counts[index] += 1
+        self.count += 1
+        self.max = max(self.max, time_ns)
+
+    def get_percentile(self, percentile):
+        """
+        Returns the time below which a percentage of the times are, rounded up to the bound of its bin
+        :param percentile: percentage between 0 and 100
+        :return: time in [ns], None if no time has been added
+        """
+        if self.count == 0:
+            return None
+        index = int(np.searchsorted(np.cumsum(self.counts), math.ceil(self.count * percentile / 100)))
+        return min(self.get_upper_bounds()[index], self.max)
+
+    def get_summary(self):
+        """
+        Returns the median, 99th percentile and maximum
+        :return: [p50, p99, max] in [ms], None if no time has been added
+        """
+        if self.count == 0:
+            return [None] * 3
+        return [to_ms(self.get_percentile(50)), to_ms(self.get_percentile(99)), to_ms(self.max)]
+
+    def get_rows(self):
+        """
+        Returns the bins with any time in them
+        :return: list of rows ordered as histogram_fieldnames
+        """
+        bounds = self.get_upper_bounds()
+        return [[to_ms(bounds[index]) if index < len(bounds) - 1 else 'More', int(self.counts[index])]
+                for index in np.flatnonzero(self.counts)]
+
+    def clear(self):
+        self.counts[:] = 0
+        self.count = 0
+        self.max = 0
+
+
+def to_ms(time_ns):
+    """
+    Converts a time to milliseconds with µs resolution
+    :param time_ns: time in [ns]
+    :return: time in [ms]
+    """
+    return round(float(time_ns) / 1e6, 3)
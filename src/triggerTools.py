@@ -0,0 +1,210 @@
+import numpy as np
+import src.pipelineTools as pt
+
+# Trigger type list
+trigger_types = ['None', 'Level', 'Rate of rise']
+trigger_directions = ['Rising', 'Falling']
+
+# text shown next to the level input for every trigger type
+trigger_level_names = {
+    'None': '',
+    'Level': 'Level [ºC]',
+    'Rate of rise': 'Rate [ºC/s]'
+}
+
+
+class Trigger:
+    """
+    Trigger with hysteresis on the temperature or on its rate of change. A rising trigger fires when the signal
+    reaches the level after having been below level - hysteresis, a falling one when it reaches the level after
+    having been above level + hysteresis, so noise around the level can't fire it again and again. Whether the
+    trigger is armed is kept between blocks.
+
+    Rate of rise triggers use the slope of the line fitted to the latest samples by the trend stage, not the rate
+    between consecutive samples, whose noise is the temperature noise times the sample rate and would fire them.
+    """
+
+    def __init__(self, trigger_type, level, direction='Rising', hysteresis=0.0):
+        if trigger_type not in trigger_types[1:]:
+            raise ValueError(f"No matching trigger found.\nExpected: {trigger_types[1:]}\nGot: {trigger_type}.")
+        if direction not in trigger_directions:
+            raise ValueError(f"No matching direction found.\nExpected: {trigger_directions}\nGot: {direction}.")
+        if hysteresis < 0:
+            raise ValueError(f"Hysteresis can't be negative.\nGot {hysteresis} instead.")
+        self.trigger_type = trigger_type
+        self.level = level
+        self.direction = direction
+        self.hysteresis = hysteresis
+        self.is_armed = False
+
+    def __repr__(self):
+        unit = 'ºC' if self.trigger_type == 'Level' else 'ºC/s'
+        return f"{self.trigger_type} {self.direction.lower()} {self.level} {unit} (hysteresis {self.hysteresis} {unit})"
+
+    def get_signal(self, block):
+        """
+        Returns the signal the trigger is evaluated on
+        :param block: Block object, with the 'trend' derived column for rate of rise triggers
+        :return: array with one value per sample
+        """
+        match self.trigger_type:
+            case 'Level':
+                return block.temperatures
+            case 'Rate of rise':
+                return block.derived['trend']
+
+    def find(self, block):
+        """
+        Looks for the first sample of a block where the trigger fires
+        :param block: Block object
+        :return: index of the sample, None if it doesn't fire in this block
+        """
+        signal = self.get_signal(block)
+        if self.direction == 'Falling':
+            signal, level = -signal, -self.level
+        else:
+            level = self.level
+        # nan rates never arm nor fire the trigger
+        with np.errstate(invalid='ignore'):
+            is_arming = signal < level - self.hysteresis
+            is_firing = signal >= level
+        armed_from = 0
+        if not self.is_armed:
+            if not is_arming.any():
+                return None
+            armed_from = int(np.argmax(is_arming))
+        fired = np.flatnonzero(is_firing[armed_from:])
+        if len(fired) == 0:
+            self.is_armed = True
+            return None
+        self.is_armed = False
+        return armed_from + int(fired[0])
+
+    def reset(self):
+        self.is_armed = False
+
+
+def create_trigger(trigger_type, level=None, direction='Rising', hysteresis=0.0):
+    """
+    Creates a trigger given its type and parameters
+    :param trigger_type: one of trigger_types
+    :param level: temperature in [ºC] or rate in [ºC/s], depending on the trigger type
+    :param direction: one of trigger_directions
+    :param hysteresis: distance from the level the signal has to go back to before the trigger is armed
+    :return: Trigger object, None if trigger_type is 'None'
+    """
+    if trigger_type == 'None':
+        return None
+    return Trigger(trigger_type, float(level), direction, float(hysteresis))
+
+
+class PreTriggerBuffer:
+    """
+    Circular buffer with the latest samples before the trigger, written one block at a time
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.columns = None
+        self.n_written = 0
+
+    def __len__(self):
+        return min(self.n_written, self.capacity)
+
+    def write(self, block):
+        """
+        Writes a block after the latest samples, overwriting the oldest ones
+        :param block: Block object
+        :return:
+        """
+        if self.capacity == 0:
+            return
+        columns = {'times': block.times, 'voltages': block.voltages, 'temperatures': block.temperatures}
+        columns.update(block.derived)
+        if self.columns is None:
+            self.columns = {name: np.empty(self.capacity, dtype=column.dtype) for name, column in columns.items()}
+        # only the latest samples fit when the block is larger than the buffer
+        skip = max(len(block) - self.capacity, 0)
+        start = (self.n_written + skip) % self.capacity
+        n_first = min(len(block) - skip, self.capacity - start)
+        for name, column in columns.items():
+            column = column[skip:]
+            self.columns[name][start:start + n_first] = column[:n_first]
+            self.columns[name][:len(column) - n_first] = column[n_first:]
+        self.n_written += len(block)
+
+    def read(self):
+        """
+        Returns the samples in the buffer, oldest first
+        :return: Block object, None if the buffer is empty
+        """
+        if len(self) == 0:
+            return None
+        order = (np.arange(len(self)) + self.n_written - len(self)) % self.capacity
+        block = pt.Block(self.columns['times'][order], self.columns['voltages'][order],
+                         self.columns['temperatures'][order])
+        block.derived = {name: column[order] for name, column in self.columns.items()
+                         if name not in ('times', 'voltages', 'temperatures')}
+        return block
+
+    def clear(self):
+        self.columns = None
+        self.n_written = 0
+
+
+class TriggerStage(pt.Stage):
+    """
+    Only lets through the samples around a trigger: while waiting it keeps the latest samples in a pre-trigger
+    buffer, when the trigger fires it outputs them followed by the samples of the post-trigger window, and then
+    drops every later block.
+    """
+
+    def __init__(self, trigger, pre_samples, post_samples):
+        if pre_samples < 0 or post_samples < 1:
+            raise ValueError(f"Pre-trigger samples can't be negative and post-trigger samples must be at least 1.\n"
+                             f"Got {pre_samples} and {post_samples} instead.")
+        super().__init__('trigger')
+        self.trigger = trigger
+        self.pre_samples = pre_samples
+        self.post_samples = post_samples
+        self.pre_trigger_buffer = PreTriggerBuffer(pre_samples)
+        self.n_post_remaining = post_samples
+        self.trigger_time = None
+
+    def is_triggered(self):
+        return self.trigger_time is not None
+
+    def is_finished(self):
+        """
+        Checks if the post-trigger window has been recorded
+        :return: True if it has
+        """
+        return self.n_post_remaining == 0
+
+    def process(self, block):
+        if self.is_finished():
+            return None
+        if not self.is_triggered():
+            index = self.trigger.find(block)
+            if index is None:
+                self.pre_trigger_buffer.write(block)
+                return None
+            self.trigger_time = int(block.times[index])
+            self.pre_trigger_buffer.write(block.select(slice(None, index)))
+            history = self.pre_trigger_buffer.read()
+            block = block.select(slice(index, None))
+            if history is not None:
+                block = pt.concatenate_blocks([history, block])
+            self.pre_trigger_buffer.clear()
+            n_history = 0 if history is None else len(history)
+        else:
+            n_history = 0
+        n_kept = min(len(block) - n_history, self.n_post_remaining)
+        self.n_post_remaining -= n_kept
+        return block.select(slice(None, n_history + n_kept))
+
+    def reset(self):
+        self.trigger.reset()
+        self.pre_trigger_buffer.clear()
+        self.n_post_remaining = self.post_samples
+        self.trigger_time = None
@@ -0,0 +1,189 @@
+import numpy as np
+import pytest
+import src.alarmTools as at
+import src.calibrationTools as ct
+import src.daqTools as dt
+import src.simulationTools as sim
+
+NS_PER_MS = 1_000_000
+
+
+def create_calibration():
+    calibration = ct.LinearCalibration('LEAST_SQUARES')
+    calibration.set_parameters(100.0, -5.0)
+    return calibration
+
+
+def create_run(n_samples=3000, seed=0):
+    """
+    Creates 1 kSa/s voltages that cross 95 ºC and 105 ºC several times, with noise around the limits
+    :return: times in [ns] and voltages rounded like the calibration stage does
+    """
+    rng = np.random.default_rng(seed)
+    times = np.arange(n_samples, dtype=np.int64) * NS_PER_MS
+    voltages = 1.05 + 0.07 * np.sin(np.arange(n_samples) / 150) + rng.normal(0, 0.002, n_samples)
+    return times, np.round(voltages, 3)
+
+
+def create_engine(calibration=None, hysteresis=0.5, debounce=5 * NS_PER_MS):
+    engine = at.AlarmEngine(trend_window=20)
+    engine.set_calibration(calibration)
+    engine.set_hysteresis(hysteresis, debounce)
+    engine.set_limit('Below Minimum', 100.0)
+    engine.set_limit('Above Maximum', 105.0)
+    return engine
+
+
+def run_blocks(engine, times, voltages=None, temperatures=None, block_size=100):
+    for start in range(0, len(times), block_size):
+        block = slice(start, start + block_size)
+        engine.update(times[block], None if voltages is None else voltages[block],
+                      None if temperatures is None else temperatures[block])
+    return sort_episodes(engine.log)
+
+
+def sort_episodes(log):
+    """
+    Sorts episodes by start, the log of every block has them alarm by alarm
+    """
+    return sorted(log, key=lambda episode: (episode['Start [ns]'], episode['Alarm Type']))
+
+
+@pytest.mark.parametrize('block_size', [1, 7, 64, 1000])
+def test_episodes_dont_depend_on_block_size(block_size):
+    times, voltages = create_run()
+    temperatures = create_calibration().calculate_temperature_array(voltages)
+    expected = run_blocks(create_engine(), times, temperatures=temperatures, block_size=len(times))
+    assert expected
+    assert run_blocks(create_engine(), times, temperatures=temperatures, block_size=block_size) == expected
+
+
+def test_hysteresis_logs_one_episode_per_excursion():
+    rng = np.random.default_rng(1)
+    times = np.arange(2000, dtype=np.int64) * NS_PER_MS
+    # beyond the limit from 500 to 1500, with noise around it the whole time
+    temperatures = 105.0 + np.where((times >= 500 * NS_PER_MS) & (times < 1500 * NS_PER_MS), 0.3, -0.3) + \
+        rng.normal(0, 0.1, len(times))
+    engine = create_engine(hysteresis=1.0, debounce=0)
+    engine.update(times, temperatures=temperatures)
+    maximum_episodes = [episode for episode in engine.log if episode['Alarm Type'] == 'Above Maximum']
+    assert len(maximum_episodes) == 1
+    assert maximum_episodes[0]['End [ns]'] is None
+    assert maximum_episodes[0]['Peak'] == pytest.approx(temperatures.max())
+
+
+def test_debounce_ignores_short_excursions():
+    times = np.arange(100, dtype=np.int64) * NS_PER_MS
+    temperatures = np.full(100, 102.0)
+    temperatures[10:13] = 106.0  # 3 ms
+    temperatures[50:70] = 107.0  # 20 ms
+    engine = create_engine(hysteresis=0, debounce=5 * NS_PER_MS)
+    engine.update(times, temperatures=temperatures)
+    assert engine.log == [{'Alarm Type': 'Above Maximum', 'Start [ns]': 50 * NS_PER_MS, 'End [ns]': 70 * NS_PER_MS,
+                           'Peak': 107.0, 'Unit': 'ºC'}]
+    assert engine.get_raised_times()[1] == 55 * NS_PER_MS
+
+
+@pytest.mark.parametrize('block_size', [1, 7, 64, 3000])
+def test_voltages_log_the_same_episodes_as_temperatures(block_size):
+    times, voltages = create_run()
+    calibration = create_calibration()
+    temperatures = calibration.calculate_temperature_array(voltages)
+    expected = run_blocks(create_engine(), times, temperatures=temperatures)
+    assert run_blocks(create_engine(calibration), times, voltages, block_size=block_size) == expected
+
+
+def create_monitoring_daq(calibration, monkeypatch):
+    """
+    Creates a DAQ that monitors the alarms, recording how many temperatures the calibration calculates
+    :return: niDAQ object and list with the number of temperatures of every call
+    """
+    niDAQ = dt.niDAQ(sim.SIMULATED_MODEL, False)
+    niDAQ.initiate_daq()
+    niDAQ.set_time_log()
+    niDAQ.set_monitoring(True)
+    converted = []
+    calculate_temperature_array = calibration.calculate_temperature_array
+    monkeypatch.setattr(calibration, 'calculate_temperature_array',
+                        lambda voltages: converted.append(len(voltages)) or calculate_temperature_array(voltages))
+    return niDAQ, converted
+
+
+def run_monitoring(niDAQ, calibration, converted, n_blocks=10):
+    niDAQ.create_pipeline(calibration, samples_per_block=100)
+    # inverting the limits doesn't count
+    converted.clear()
+    niDAQ.start_buffered_acquisition(10000)
+    try:
+        for _ in range(n_blocks):
+            niDAQ.pipeline.run_once()
+    finally:
+        niDAQ.stop_buffered_acquisition()
+
+
+def test_monitoring_checks_voltages_without_converting_them(monkeypatch):
+    # the simulated voltages are about 1 V, 95 ºC
+    calibration = create_calibration()
+    niDAQ, converted = create_monitoring_daq(calibration, monkeypatch)
+    niDAQ.set_alarm_min(80.0)
+    niDAQ.set_alarm_max(110.0)
+    run_monitoring(niDAQ, calibration, converted)
+    assert niDAQ.pipeline.get_names() == ['source', 'alarm']
+    assert converted == []
+    assert niDAQ.get_n_samples_read() == 1000 and len(niDAQ) == 0
+    assert not any(niDAQ.alarm_states) and len(niDAQ.alarm_engine) == 0
+
+
+def test_monitoring_only_converts_the_peaks(monkeypatch):
+    calibration = create_calibration()
+    niDAQ, converted = create_monitoring_daq(calibration, monkeypatch)
+    niDAQ.set_alarm_max(90.0)
+    run_monitoring(niDAQ, calibration, converted)
+    assert niDAQ.alarm_states[at.alarm_types.index('Above Maximum')]
+    [episode] = niDAQ.alarm_engine.log
+    assert episode['Peak'] > 90.0
+    # only the few values of the open episode, never the whole block
+    assert len(converted) == 10 and max(converted) <= 2
+
+
+def test_monitoring_rejects_what_needs_temperatures():
+    niDAQ = dt.niDAQ(sim.SIMULATED_MODEL, False)
+    niDAQ.set_monitoring(True)
+    niDAQ.set_alarm_rate(2.0)
+    with pytest.raises(ValueError, match="trend alarms"):
+        niDAQ.create_pipeline(create_calibration())
+    niDAQ.set_alarm_rate(None)
+    with pytest.raises(ValueError, match="other sinks"):
+        niDAQ.create_pipeline(create_calibration(), [object()])
+
+
+@pytest.mark.parametrize('block_size', [1, 13, 500])
+def test_trend_episodes_dont_depend_on_block_size(block_size):
+    times, voltages = create_run()
+    temperatures = create_calibration().calculate_temperature_array(voltages)
+
+    def run(size):
+        engine = create_engine()
+        engine.set_limit('Rate of Change', 20.0)
+        engine.set_limit('Time to Limit', 0.5)
+        for start in range(0, len(times), size):
+            engine.update_trend(times[start:start + size], temperatures[start:start + size])
+        return sort_episodes(engine.log)
+
+    expected = run(len(times))
+    log = run(block_size)
+    assert any(episode['Alarm Type'] == 'Rate of Change' for episode in expected)
+    # fits of windows split differently in chunks only differ in rounding
+    assert [{**episode, 'Peak': None} for episode in log] == [{**episode, 'Peak': None} for episode in expected]
+    assert [episode['Peak'] for episode in log] == pytest.approx([episode['Peak'] for episode in expected])
+
+
+def test_trend_alarms_take_their_hysteresis():
+    engine = at.AlarmEngine()
+    engine.set_limit('Rate of Change', 2.0)
+    assert engine.alarms[2].hysteresis == pytest.approx(at.DEFAULT_TREND_HYSTERESIS * 2.0)
+    engine.set_trend_hysteresis(0.5, 3.0)
+    engine.set_limit('Time to Limit', 30.0)
+    assert [alarm.hysteresis for alarm in engine.alarms[2:]] == [0.5, 3.0]
+    with pytest.raises(ValueError):
+        engine.set_trend_hysteresis(-1.0)
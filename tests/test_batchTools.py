@@ -0,0 +1,83 @@
+import csv
+import json
+
+import numpy as np
+import pytest
+import src.batchTools as bt
+import src.calibrationTools as ct
+import src.storageTools as storage
+
+
+def create_calibration():
+    calibration = ct.NonLinearCalibration()
+    calibration.set_parameters(2.0, 100.0, -5.0)
+    return calibration
+
+
+def write_saved_run(file_name, voltages):
+    """
+    Writes a file like niDAQ.save_data_acquisition, with sections before the data
+    """
+    with open(file_name, mode='w', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerows([["CALIBRATION"], ["Calibration"], ["y = 2.000x² + 100.000x -5.000"], [],
+                          ["DATA"], ["Voltage [V]", "Temperature [ºC]", "Time [ns]"]])
+        writer.writerows([voltage, 0.0, i] for i, voltage in enumerate(voltages))
+
+
+def write_raw_file(file_name, voltages):
+    with open(file_name, mode='w', newline='') as file:
+        file.write("Voltage [V]\n")
+        file.writelines(f"{voltage}\n" for voltage in voltages)
+
+
+def load_columns(output_dir):
+    return [np.load(output_dir / column_file) for column_file in bt.COLUMN_FILE_NAMES.values()]
+
+
+@pytest.mark.parametrize('write_file', [write_saved_run, write_raw_file])
+@pytest.mark.parametrize('chunk_size', [1, 333, 100000])
+def test_convert_file(tmp_path, write_file, chunk_size):
+    voltages = np.random.default_rng(0).uniform(0, 5, 1000)
+    write_file(tmp_path / "run.csv", voltages)
+    calibration = create_calibration()
+    file_name, n_rows, _ = bt.convert_file(tmp_path / "run.csv", tmp_path / "run", calibration.to_dict(), chunk_size)
+    assert n_rows == len(voltages)
+    converted_voltages, temperatures = load_columns(tmp_path / "run")
+    np.testing.assert_array_equal(converted_voltages, voltages)
+    np.testing.assert_allclose(temperatures, calibration.calculate_temperature_array(voltages))
+    with open(tmp_path / "run" / "calibration.json") as file:
+        assert json.load(file) == {'source': file_name, 'rows': n_rows, 'calibration': calibration.to_dict()}
+
+
+def test_convert_directory(tmp_path):
+    rng = np.random.default_rng(1)
+    runs = {"a.csv": rng.uniform(0, 5, 500), "nested/b.txt": rng.uniform(0, 5, 700), "nested/c.csv": np.empty(0)}
+    for name, voltages in runs.items():
+        (tmp_path / "raw" / name).parent.mkdir(parents=True, exist_ok=True)
+        write_saved_run(tmp_path / "raw" / name, voltages)
+    (tmp_path / "raw" / "notes.md").write_text("not a raw file")
+
+    calibration = create_calibration()
+    total_rows = bt.convert_directory(tmp_path / "raw", tmp_path / "converted", calibration, workers=2, chunk_size=64)
+    assert total_rows == 1200
+    for name, voltages in runs.items():
+        converted_voltages, temperatures = load_columns(tmp_path / "converted" / name.rsplit('.', 1)[0])
+        np.testing.assert_array_equal(converted_voltages, voltages)
+        np.testing.assert_allclose(temperatures, calibration.calculate_temperature_array(voltages))
+
+
+def test_calibrate_sensors_file(tmp_path):
+    with open(tmp_path / "table.csv", mode='w', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow(["sensor_id", "voltage", "temperature"])
+        writer.writerows([["TC-2", 0.0, 20.0], ["TC-1", 0.0, -5.0], ["TC-2", 1.0, 30.0], ["TC-1", 1.0, 95.0], [],
+                          ["TC-1", "n/a", 50.0]])
+    with storage.CalibrationLibrary(":memory:") as library:
+        results = bt.calibrate_sensors_file(str(tmp_path / "table.csv"), str(tmp_path / "report"), library=library)
+        assert [repr(result['calibration']) for result in results] == ["y = 100.000x -5.000", "y = 10.000x + 20.000"]
+        assert repr(library.load_latest('TC-2')) == "y = 10.000x + 20.000"
+    with open(tmp_path / "report.csv", newline='') as file:
+        rows = list(csv.reader(file))
+    assert rows[0] == ct.fit_report_fieldnames
+    assert [row[:3] for row in rows[1:]] == [["TC-1", "y = 100.000x -5.000", "2"], ["TC-2", "y = 10.000x + 20.000", "2"]]
@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+import src.calibrationTools as ct
+
+
+def create_table(degree, n_sensors=50, seed=0):
+    """
+    Creates a bulk table of sensors with different numbers of points, shuffled like rows of a real table
+    :return: sensor ids, voltages and temperatures of every row
+    """
+    rng = np.random.default_rng(seed)
+    sensor_ids, voltages, temperatures = [], [], []
+    for i in range(n_sensors):
+        n_points = degree + 1 + i % 7
+        x = 1000.0 + rng.uniform(0, 5, n_points)  # large offset that would make the normal equations ill conditioned
+        coefficients = rng.uniform(-50, 50, degree + 1)
+        sensor_ids += [f"TC-{i:03d}"] * n_points
+        voltages.append(x)
+        temperatures.append(np.polyval(coefficients, x - 1000.0) + rng.normal(0, 0.1, n_points))
+    order = rng.permutation(len(sensor_ids))
+    return np.array(sensor_ids)[order], np.concatenate(voltages)[order], np.concatenate(temperatures)[order]
+
+
+@pytest.mark.parametrize('expression_type, degree', [('LINEAR_EQUATION', 1), ('NON_LINEAR_EQUATION', 2)])
+def test_batch_fit_matches_polyfit(expression_type, degree):
+    sensor_ids, voltages, temperatures = create_table(degree)
+    results = ct.fit_calibrations_batch(sensor_ids, voltages, temperatures, expression_type)
+    assert [result['sensor_id'] for result in results] == sorted(set(sensor_ids))
+    for result in results:
+        rows = sensor_ids == result['sensor_id']
+        x, y = voltages[rows], temperatures[rows]
+        calibration = result['calibration']
+        assert calibration.expression_type == expression_type
+        assert calibration.sensor_id == result['sensor_id']
+        assert result['n_points'] == rows.sum()
+        assert sorted(map(tuple, calibration.get_data())) == sorted(zip(x, y))
+
+        # reference fit on centered voltages, polyfit loses precision with the offset
+        fitted = np.polyval(np.polyfit(x - x.mean(), y, degree), x - x.mean())
+        residuals = y - fitted
+        assert result['rmse'] == pytest.approx(np.sqrt(np.mean(residuals ** 2)), rel=1e-6, abs=1e-9)
+        assert result['max_residual'] == pytest.approx(np.abs(residuals).max(), rel=1e-6, abs=1e-9)
+        if len(x) > degree + 1:
+            assert result['r_squared'] == pytest.approx(1 - np.sum(residuals ** 2) / np.sum((y - y.mean()) ** 2))
+        # temperatures are rounded to 3 decimals, and so are the linear parameters
+        tolerance = 1e-3 * (1 + np.abs(x).max()) if degree == 1 else 1e-3
+        np.testing.assert_allclose(calibration.calculate_temperature_array(x), fitted, atol=tolerance)
+
+
+def test_batch_fit_needs_enough_points():
+    with pytest.raises(ValueError, match="TC-2"):
+        ct.fit_calibrations_batch(['TC-1', 'TC-1', 'TC-2'], [0.0, 1.0, 0.0], [20.0, 30.0, 20.0])
+    with pytest.raises(ValueError):
+        ct.fit_calibrations_batch(['TC-1'] * 3, [0.0, 1.0, 2.0], [20.0, 30.0, 40.0], 'CUBIC')
+
+
+def test_batch_fit_with_repeated_voltages():
+    [result] = ct.fit_calibrations_batch(['TC-1'] * 3, [1.0, 1.0, 1.0], [20.0, 21.0, 22.0])
+    assert result['calibration'].calculate_temperature(1.0) == pytest.approx(21.0)
@@ -0,0 +1,102 @@
+import numpy as np
+import pytest
+import src.controlTools as control
+import src.daqTools as dt
+import src.simulationTools as sim
+
+NS_PER_S = 1_000_000_000
+PERIOD = NS_PER_S // 10  # 10 Hz loop
+
+
+def update(controller, step, temperature):
+    return controller.update(np.array([step * PERIOD]), np.array([temperature]))
+
+
+def test_output_is_clamped():
+    controller = control.PIDController(10.0, profile=control.create_profile("50"))
+    assert update(controller, 1, 0.0) == 5.0
+    assert update(controller, 2, 100.0) == 0.0
+
+
+def test_integrator_doesnt_wind_up_while_saturated():
+    controller = control.PIDController(1.0, 1.0, profile=control.create_profile("100"))
+    for step in range(1, 1000):
+        assert update(controller, step, 20.0) == 5.0
+    assert 0.0 <= controller.integral <= 5.0
+    # once past the setpoint the output leaves the limit right away instead of unwinding for minutes
+    assert update(controller, 1000, 101.0) < 5.0
+
+
+def test_integrator_unwinds_from_a_limit():
+    controller = control.PIDController(0.0, 10.0, profile=control.create_profile("10"))
+    for step in range(1, 20):
+        update(controller, step, 0.0)
+    assert controller.integral == 5.0
+    # the change of the integral brings the output back within the limits, so it's taken
+    update(controller, 20, 10.5)
+    assert controller.integral == pytest.approx(5.0 - 10.0 * 0.5 * 0.1)
+
+
+def test_setpoint_steps_dont_kick_the_derivative():
+    controller = control.PIDController(0.0, 0.0, 1.0, control.create_profile("0:0, 1:0, 1:50"), (-10.0, 10.0))
+    outputs = [update(controller, step, 20.0) for step in range(1, 20)]
+    assert outputs == [0.0] * 19
+
+
+def test_hold_doesnt_integrate_over_the_pause():
+    controller = control.PIDController(0.0, 1.0, profile=control.create_profile("10"))
+    update(controller, 1, 9.0)
+    update(controller, 2, 9.0)
+    integral = controller.integral
+    controller.hold()
+    update(controller, 100, 9.0)
+    assert controller.integral == integral
+
+
+def test_converges_on_a_first_order_plant():
+    controller = control.PIDController(0.5, 0.2, 0.0, control.create_profile("40"))
+    temperature = 20.0
+    for step in range(1, 5000):
+        output = update(controller, step, temperature)
+        # heats 10 ºC per V with a 5 s time constant
+        temperature += (20.0 + 10.0 * output - temperature) * 0.1 / 5.0
+    assert temperature == pytest.approx(40.0, abs=0.05)
+    assert len(controller.log) == 4999
+
+
+def test_profile_ramps_and_soaks():
+    profile = control.create_profile("0:25, 10:75, 20:75")
+    assert profile.get_setpoint(-NS_PER_S) == 25.0
+    assert profile.get_setpoint(5 * NS_PER_S) == 50.0
+    assert profile.get_setpoint(30 * NS_PER_S) == 75.0
+
+
+@pytest.mark.parametrize('text', ["hot", "10:25, 5:75", "0:25:3"])
+def test_profile_rejects_invalid_text(text):
+    with pytest.raises(ValueError):
+        control.create_profile(text)
+
+
+def test_rejects_inverted_limits():
+    with pytest.raises(ValueError):
+        control.PIDController(1.0, output_limits=(5.0, 0.0))
+
+
+def test_daq_holds_the_output_while_the_interlock_is_tripped():
+    niDAQ = dt.niDAQ(sim.SIMULATED_MODEL, False)
+    niDAQ.initiate_daq()
+    niDAQ.set_time_log()
+    with pytest.raises(ValueError):
+        niDAQ.set_controller(control.PIDController(1.0, output_limits=(0.0, 6.0)))
+    niDAQ.set_controller(control.PIDController(1.0, profile=control.create_profile("3")))
+    niDAQ.set_alarm_max(2.0)
+    niDAQ.set_interlock('Analog Output', ['Above Maximum'], 0.0)
+    times = np.arange(10, dtype=np.int64) * 1_000_000
+    niDAQ.check_alarms(times, temperatures=np.full(10, 2.5))
+    niDAQ.apply_control(times, np.full(10, 2.5))
+    assert niDAQ.task_ai_ao[1].output_value == 0.0 and not niDAQ.controller.log
+    niDAQ.check_alarms(times + 10_000_000, temperatures=np.full(10, 1.0))
+    niDAQ.apply_control(times + 10_000_000, np.full(10, 1.0))
+    assert niDAQ.task_ai_ao[1].output_value == 2.0
+    niDAQ.stop_control()
+    assert niDAQ.task_ai_ao[1].output_value == 0.0
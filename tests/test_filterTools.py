@@ -0,0 +1,75 @@
+import numpy as np
+import pytest
+from scipy.ndimage import median_filter
+from scipy.signal import butter, sosfilt, sosfilt_zi
+import src.filterTools as ft
+
+SAMPLE_RATE = 1000.0
+
+
+def create_signal(n_samples=4000, seed=0):
+    rng = np.random.default_rng(seed)
+    return 1.0 + 0.2 * np.sin(np.arange(n_samples) / 100) + rng.normal(0, 0.01, n_samples)
+
+
+def create_filters():
+    return [ft.create_filter('Moving Average', 16), ft.create_filter('Single-pole IIR', 0.1),
+            ft.create_filter('Butterworth Low-pass', 20.0, SAMPLE_RATE), ft.create_filter('Median', 9)]
+
+
+@pytest.mark.parametrize('block_size', [1, 7, 64, 1000])
+@pytest.mark.parametrize('index', range(4))
+def test_blocks_match_the_whole_signal(index, block_size):
+    signal = create_signal()
+    whole = create_filters()[index].process(signal)
+    stream_filter = create_filters()[index]
+    blocks = [stream_filter.process(signal[start:start + block_size]) for start in range(0, len(signal), block_size)]
+    np.testing.assert_allclose(np.concatenate(blocks), whole, rtol=1e-12, atol=1e-12)
+    np.testing.assert_allclose(ft.filter_signal(stream_filter, signal, block_size), whole, rtol=1e-12, atol=1e-12)
+
+
+def test_filters_match_their_reference():
+    signal = create_signal()
+    moving_average, iir, butterworth, median = create_filters()
+
+    expected = np.convolve(signal, np.ones(16) / 16, mode='valid')
+    np.testing.assert_allclose(moving_average.process(signal)[15:], expected)
+
+    expected = [signal[0]]
+    for value in signal[1:]:
+        expected.append(expected[-1] + 0.1 * (value - expected[-1]))
+    np.testing.assert_allclose(iir.process(signal), expected)
+
+    sos = butter(ft.BUTTERWORTH_ORDER, 20.0, btype='lowpass', output='sos', fs=SAMPLE_RATE)
+    np.testing.assert_allclose(butterworth.process(signal), sosfilt(sos, signal, zi=sosfilt_zi(sos) * signal[0])[0])
+
+    np.testing.assert_allclose(median.process(signal)[8:], median_filter(signal, 9, origin=4)[8:])
+
+
+def test_reset_starts_a_new_signal():
+    signal = create_signal()
+    for stream_filter in create_filters():
+        first = stream_filter.process(signal)
+        stream_filter.process(signal[::-1])
+        stream_filter.reset()
+        np.testing.assert_allclose(stream_filter.process(signal), first)
+
+
+@pytest.mark.parametrize('filter_type', ['Moving Average', 'Median'])
+def test_lengths_must_be_positive_integers(filter_type):
+    assert ft.create_filter(filter_type, 5.0).length == 5
+    for parameter in [4.7, 0, -3]:
+        with pytest.raises(ValueError, match=f"Got {parameter} instead"):
+            ft.create_filter(filter_type, parameter)
+
+
+def test_invalid_parameters():
+    with pytest.raises(ValueError):
+        ft.create_filter('Single-pole IIR', 1.5)
+    with pytest.raises(ValueError):
+        ft.create_filter('Butterworth Low-pass', SAMPLE_RATE, SAMPLE_RATE)
+    with pytest.raises(ValueError):
+        ft.create_filter('Butterworth Low-pass', 20.0)
+    with pytest.raises(ValueError):
+        ft.create_filter('Kalman', 1.0)
+    assert ft.create_filter('None') is None
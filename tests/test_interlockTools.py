@@ -0,0 +1,103 @@
+import numpy as np
+import pytest
+import src.alarmTools as at
+import src.daqTools as dt
+import src.interlockTools as it
+import src.simulationTools as sim
+
+NS_PER_MS = 1_000_000
+MAXIMUM = at.alarm_types.index('Above Maximum')
+
+
+def get_states(*raised_alarm_types):
+    return [alarm_type in raised_alarm_types for alarm_type in at.alarm_types]
+
+
+def get_raised_times(time_ns):
+    return [time_ns] * len(at.alarm_types)
+
+
+def create_interlock(latch=False):
+    task = sim.SimulatedTask()
+    return it.AnalogInterlock(task, safe_voltage=1.0, tripped_voltage=0.0, alarm_types=['Above Maximum'],
+                              latch=latch), task
+
+
+def test_trips_and_restores():
+    interlock, task = create_interlock()
+    interlock.write(False)
+    assert task.output_value == 1.0
+    assert not interlock.update(get_states('Below Minimum'), get_raised_times(0), lambda: 0)
+    assert interlock.update(get_states('Above Maximum'), get_raised_times(0), lambda: 0)
+    assert interlock.is_tripped and task.output_value == 0.0
+    # nothing is written while the alarm stays raised
+    assert not interlock.update(get_states('Above Maximum'), get_raised_times(0), lambda: 0)
+    assert interlock.update(get_states(), get_raised_times(None), lambda: 10)
+    assert not interlock.is_tripped and task.output_value == 1.0
+    assert [entry['Event'] for entry in interlock.log] == ['Trip', 'Restore']
+
+
+def test_latches_until_reset():
+    interlock, task = create_interlock(latch=True)
+    interlock.update(get_states('Above Maximum'), get_raised_times(0), lambda: 0)
+    assert not interlock.update(get_states(), get_raised_times(None), lambda: 10)
+    assert interlock.is_tripped and task.output_value == 0.0
+    interlock.reset(20)
+    assert not interlock.is_tripped and task.output_value == 1.0
+    assert [entry['Event'] for entry in interlock.log] == ['Trip', 'Reset']
+
+
+def test_trips_again_after_reset_while_raised():
+    interlock, task = create_interlock(latch=True)
+    interlock.update(get_states('Above Maximum'), get_raised_times(5 * NS_PER_MS), lambda: 6 * NS_PER_MS)
+    interlock.reset(10 * NS_PER_MS)
+    # the alarm was raised before the reset, so this trip has no sample to time it from
+    assert interlock.update(get_states('Above Maximum'), get_raised_times(5 * NS_PER_MS), lambda: 11 * NS_PER_MS)
+    assert interlock.is_tripped and task.output_value == 0.0
+    assert interlock.log[-1]['Latency [ms]'] is None
+    assert len(interlock.latency) == 1
+
+
+def test_records_actuation_latency():
+    interlock, _ = create_interlock()
+    interlock.update(get_states('Above Maximum'), get_raised_times(100 * NS_PER_MS), lambda: 103 * NS_PER_MS)
+    assert interlock.log[0] == {'Event': 'Trip', 'Sample [ns]': 100 * NS_PER_MS, 'Actuated [ns]': 103 * NS_PER_MS,
+                                'Latency [ms]': 3.0}
+    counters = interlock.get_counters()
+    assert counters['Interlock trips'] == 1 and counters['Interlock tripped']
+    assert counters['Actuation max [ms]'] == 3.0
+    assert counters['Actuation p50 [ms]'] == pytest.approx(3.0, rel=0.15)
+
+
+def test_digital_line_low_while_tripped():
+    task = sim.SimulatedTask()
+    interlock = it.DigitalInterlock(task, tripped_high=False, alarm_types=['Above Maximum'])
+    interlock.update(get_states('Above Maximum'), get_raised_times(0), lambda: 0)
+    assert task.output_value is False
+    interlock.update(get_states(), get_raised_times(None), lambda: 0)
+    assert task.output_value is True
+
+
+def test_rejects_unknown_alarms():
+    with pytest.raises(ValueError):
+        it.DigitalInterlock(sim.SimulatedTask(), alarm_types=['Too Hot'])
+
+
+def test_daq_trips_from_the_block_that_raises_the_alarm():
+    niDAQ = dt.niDAQ(sim.SIMULATED_MODEL, False)
+    niDAQ.initiate_daq()
+    niDAQ.set_time_log()
+    niDAQ.set_alarm_max(105.0)
+    niDAQ.set_interlock('Analog Output', ['Above Maximum'], 0.5, latch=True)
+    assert niDAQ.task_ai_ao[1].output_value == dt.AO_DAQ_VAL
+    times = np.arange(10, dtype=np.int64) * NS_PER_MS
+    niDAQ.check_alarms(times, temperatures=np.linspace(100.0, 110.0, 10))
+    assert niDAQ.alarm_states[MAXIMUM] and niDAQ.interlock.is_tripped
+    assert niDAQ.task_ai_ao[1].output_value == 0.5
+    assert niDAQ.interlock.log[0]['Sample [ns]'] == 5 * NS_PER_MS
+    niDAQ.check_alarms(times + 10 * NS_PER_MS, temperatures=np.full(10, 100.0))
+    assert niDAQ.interlock.is_tripped
+    niDAQ.reset_interlock()
+    assert niDAQ.task_ai_ao[1].output_value == dt.AO_DAQ_VAL
+    with pytest.raises(ValueError):
+        niDAQ.set_interlock('Analog Output', value=6.0)
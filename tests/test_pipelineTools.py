@@ -0,0 +1,320 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+import src.calibrationTools as ct
+import src.daqTools as dt
+import src.pipelineTools as pt
+import src.simulationTools as sim
+
+NS_PER_MS = 1_000_000
+
+
+class ListSource:
+    """
+    Source that hands over a list of blocks
+    """
+
+    def __init__(self, blocks):
+        self.name = 'list'
+        self.blocks = list(blocks)
+
+    def read(self):
+        return self.blocks.pop(0)
+
+
+class ListSink(pt.Sink):
+    """
+    Keeps every block it receives
+    """
+
+    def __init__(self, name='list'):
+        super().__init__(name)
+        self.blocks = []
+
+    def write(self, block):
+        self.blocks.append(block)
+
+
+class DropOddBlocks(pt.Stage):
+    """
+    Drops every other block, to check dropped blocks don't reach the sinks
+    """
+
+    def __init__(self):
+        super().__init__('drop odd')
+        self.n_blocks = 0
+
+    def process(self, block):
+        self.n_blocks += 1
+        return None if self.n_blocks % 2 == 0 else block
+
+    def reset(self):
+        self.n_blocks = 0
+
+
+def create_blocks(n_samples=1000, block_size=64):
+    times = np.arange(n_samples, dtype=np.int64) * NS_PER_MS
+    temperatures = 20.0 + np.cumsum(np.random.default_rng(0).normal(0, 0.1, n_samples))
+    return [pt.Block(times[start:start + block_size], temperatures[start:start + block_size] / 100,
+                     temperatures[start:start + block_size]) for start in range(0, n_samples, block_size)]
+
+
+def create_calibration():
+    calibration = ct.LinearCalibration('LEAST_SQUARES')
+    calibration.set_parameters(100.0, -5.0)
+    return calibration
+
+
+def test_select_and_concatenate_keep_derived_columns():
+    block = create_blocks()[0]
+    block.derived['rate'] = np.arange(len(block), dtype=float)
+    selected = block.select(slice(1, None, 2))
+    joined = pt.concatenate_blocks([block.select(slice(None, 10)), block.select(slice(10, None))])
+    np.testing.assert_array_equal(selected.derived['rate'], block.derived['rate'][1::2])
+    np.testing.assert_array_equal(selected.times, block.times[1::2])
+    for name in ['times', 'voltages', 'temperatures']:
+        np.testing.assert_array_equal(getattr(joined, name), getattr(block, name))
+    np.testing.assert_array_equal(joined.derived['rate'], block.derived['rate'])
+
+
+@pytest.mark.parametrize('block_size', [1, 7, 1000])
+def test_derived_rate_doesnt_depend_on_block_size(block_size):
+    whole = pt.DeriveStage().process(pt.concatenate_blocks(create_blocks()))
+    stage = pt.DeriveStage()
+    rate = np.concatenate([stage.process(block).derived['rate'] for block in create_blocks(block_size=block_size)])
+    np.testing.assert_allclose(rate, whole.derived['rate'])
+    assert np.isnan(rate[0])
+    assert rate[1] == pytest.approx((whole.temperatures[1] - whole.temperatures[0]) * 1000)
+
+
+@pytest.mark.parametrize('block_size', [1, 3, 64])
+def test_decimate_counts_across_blocks(block_size):
+    stage = pt.DecimateStage(5)
+    kept = [stage.process(block) for block in create_blocks(block_size=block_size)]
+    times = np.concatenate([block.times for block in kept if block is not None])
+    np.testing.assert_array_equal(times, np.arange(0, 1000, 5) * NS_PER_MS)
+    with pytest.raises(ValueError):
+        pt.DecimateStage(0)
+
+
+def test_pipeline_fans_out_processed_blocks():
+    blocks = create_blocks()
+    stored, decimated = ListSink('store'), ListSink('plot')
+    pipeline = pt.Pipeline(ListSource(blocks), [DropOddBlocks(), pt.DeriveStage()],
+                           [stored, pt.Branch([pt.DecimateStage(10)], decimated)])
+    results = [pipeline.run_once() for _ in blocks]
+    assert results[1::2] == [None] * (len(blocks) // 2)
+    assert stored.blocks == [block for block in results if block is not None]
+    assert all('rate' in block.derived for block in stored.blocks)
+    # the branch decimates its own copy of the blocks
+    assert sum(map(len, stored.blocks)) == sum(map(len, blocks[::2]))
+    assert sum(map(len, decimated.blocks)) == -(-sum(map(len, blocks[::2])) // 10)
+
+    report = {row[0]: row[1:] for row in pipeline.get_timing_report()}
+    assert report['list'][:2] == [len(blocks), 1000]
+    assert report['drop odd'][:2] == [len(blocks), 1000]
+    assert report['derive'][0] == report['store'][0] == len(stored.blocks)
+    assert report['store'][1] == sum(map(len, stored.blocks))
+    assert repr(pipeline) == "list -> drop odd -> derive => [store, decimate x10 -> plot]"
+
+
+def test_column_grows():
+    column = pt.Column(np.int64, capacity=2)
+    for start in range(0, 100, 7):
+        column.append(np.arange(start, min(start + 7, 100)))
+    np.testing.assert_array_equal(column.get(), np.arange(100))
+    assert column[-1] == 99
+    column.clear()
+    assert len(column) == 0
+
+
+@pytest.mark.parametrize('samples_per_block', [1, 50])
+def test_daq_pipeline_stores_calibrated_samples(samples_per_block):
+    niDAQ = dt.niDAQ(sim.SIMULATED_MODEL, False)
+    niDAQ.initiate_daq()
+    niDAQ.set_time_log()
+    calibration = create_calibration()
+    niDAQ.create_pipeline(calibration, samples_per_block=samples_per_block)
+    if samples_per_block > 1:
+        niDAQ.start_buffered_acquisition(10000)
+    try:
+        for _ in range(4):
+            niDAQ.pipeline.run_once()
+    finally:
+        niDAQ.stop_buffered_acquisition()
+        niDAQ.close_pipeline()
+    voltages, temperatures = np.array(niDAQ.data).T
+    assert len(niDAQ) == 4 * samples_per_block == len(niDAQ.run_statistics)
+    np.testing.assert_array_equal(voltages, np.round(voltages, pt.VOLTAGE_DECIMALS))
+    np.testing.assert_allclose(temperatures, calibration.calculate_temperature_array(voltages))
+    assert np.all(np.diff(niDAQ.times.get()) > 0)
+
+
+@pytest.mark.parametrize('block_size', [1, 7, 1000])
+@pytest.mark.parametrize('max_interval', [None, 50 * NS_PER_MS])
+def test_deadband_holds_every_temperature_within_the_deadband(block_size, max_interval):
+    stage = pt.DeadbandStage(0.5, max_interval)
+    kept = pt.concatenate_blocks([stage.process(block) for block in create_blocks(block_size=block_size)])
+    whole = pt.concatenate_blocks(create_blocks())
+    assert 1 < len(kept) < len(whole) // 5
+    # holding every kept temperature until the next kept sample
+    held = kept.temperatures[np.searchsorted(kept.times, whole.times, side='right') - 1]
+    assert np.all(np.abs(held - whole.temperatures) <= 0.5)
+    if max_interval is not None:
+        assert np.diff(kept.times).max() <= max_interval
+
+
+@pytest.mark.parametrize('samples_per_block', [1, 100])
+def test_finite_sampling_with_a_deadband_stops(samples_per_block):
+    n_samples = 2000 if samples_per_block > 1 else 50
+    niDAQ = dt.niDAQ(sim.SIMULATED_MODEL, False)
+    niDAQ.initiate_daq()
+    niDAQ.set_time_log()
+    niDAQ.set_n_samples(n_samples)
+    # 5 times the noise of the simulated temperatures, so almost no sample is stored
+    niDAQ.set_deadband(1.0)
+    niDAQ.create_pipeline(create_calibration(), samples_per_block=samples_per_block)
+    if samples_per_block > 1:
+        niDAQ.start_buffered_acquisition(20000)
+    try:
+        n_reads = 0
+        while niDAQ.is_sampling_underway() and n_reads < 2 * n_samples:
+            niDAQ.pipeline.run_once()
+            n_reads += 1
+    finally:
+        niDAQ.stop_buffered_acquisition()
+    assert not niDAQ.is_sampling_underway()
+    assert niDAQ.get_n_samples_read() == n_samples == len(niDAQ.run_statistics)
+    assert 0 < len(niDAQ) < n_samples // 10
+    niDAQ.clear_data_acquisition()
+    assert niDAQ.get_n_samples_read() == 0
+
+
+class GateSink(pt.Sink):
+    """
+    Sink that waits at every write until it's opened, standing for a slow consumer. It raises instead of writing
+    once it's set to fail.
+    """
+
+    def __init__(self):
+        super().__init__('gate')
+        self.entered = threading.Event()
+        self.gate = threading.Event()
+        self.fail = False
+        self.blocks = []
+        self.is_closed = False
+
+    def write(self, block):
+        self.entered.set()
+        self.gate.wait()
+        if self.fail:
+            raise OSError("Disk full")
+        self.blocks.append(block)
+
+    def close(self):
+        self.is_closed = True
+
+
+def fill_queue(queued_sink, sink, blocks):
+    """
+    Writes the first block, which the sink thread takes and holds, and then fills the queue
+    :return: blocks left
+    """
+    queued_sink.write(blocks[0])
+    assert sink.entered.wait(1)
+    for block in blocks[1:queued_sink.queue_size + 1]:
+        queued_sink.write(block)
+    return blocks[queued_sink.queue_size + 1:]
+
+
+def test_queued_sink_drops_the_oldest_blocks():
+    sink, blocks = GateSink(), create_blocks(block_size=10)
+    queued_sink = pt.QueuedSink(sink, 'Drop oldest', queue_size=4)
+    for block in fill_queue(queued_sink, sink, blocks)[:3]:
+        queued_sink.write(block)
+    sink.gate.set()
+    queued_sink.close()
+    assert queued_sink.dropped_blocks == 3
+    assert sink.blocks == [blocks[0]] + blocks[4:8] and sink.is_closed
+
+
+def test_queued_sink_decimates_the_oldest_blocks():
+    sink, blocks = GateSink(), create_blocks(block_size=10)
+    queued_sink = pt.QueuedSink(sink, 'Decimate', queue_size=4)
+    left = fill_queue(queued_sink, sink, blocks)
+    for block in left[:3]:
+        queued_sink.write(block)
+    sink.gate.set()
+    queued_sink.close()
+    received = pt.concatenate_blocks(sink.blocks)
+    # the whole time span is kept at fewer samples
+    assert queued_sink.decimated_samples == 30
+    assert len(received) == 80 - 30
+    assert received.times[0] == blocks[0].times[0] and received.times[-1] == left[2].times[-1]
+    assert np.all(np.diff(received.times) > 0)
+
+
+def test_queued_sink_blocks_until_the_sink_catches_up():
+    sink, blocks = GateSink(), create_blocks(block_size=10)
+    queued_sink = pt.QueuedSink(sink, 'Block', queue_size=2)
+    left = fill_queue(queued_sink, sink, blocks)
+    threading.Timer(0.05, sink.gate.set).start()
+    queued_sink.write(left[0])
+    queued_sink.close()
+    assert queued_sink.blocked_time >= 0.04
+    assert sink.blocks == blocks[:4]
+    assert queued_sink.get_counters()['gate blocked [ms]'] >= 40
+
+
+@pytest.mark.parametrize('policy', pt.backpressure_policies)
+def test_queued_sink_raises_the_errors_of_its_sink(policy):
+    sink, blocks = GateSink(), create_blocks(block_size=10)
+    queued_sink = pt.QueuedSink(sink, policy, queue_size=2)
+    left = fill_queue(queued_sink, sink, blocks)
+    sink.fail = True
+    threading.Timer(0.05, sink.gate.set).start()
+    if policy != 'Block':
+        queued_sink.thread.join(1)
+    # with the 'Block' policy the sink fails while the writer waits for room in the queue
+    with pytest.raises(OSError):
+        queued_sink.write(left[0])
+    with pytest.raises(OSError):
+        queued_sink.write(left[0])
+    with pytest.raises(OSError):
+        queued_sink.close()
+    assert sink.is_closed
+
+
+def test_pipeline_closes_every_sink_when_one_fails():
+    sink, other_sink = GateSink(), ListSink()
+    sink.fail = True
+    sink.gate.set()
+    pipeline = pt.Pipeline(ListSource(create_blocks()), [], [pt.QueuedSink(sink), other_sink])
+    pipeline.run_once()
+    with pytest.raises(OSError):
+        pipeline.close()
+    assert sink.is_closed
+
+
+def test_overruns_resume_from_the_latest_samples():
+    niDAQ = dt.niDAQ(sim.SIMULATED_MODEL, False)
+    niDAQ.initiate_daq()
+    niDAQ.set_time_log()
+    niDAQ.create_pipeline(create_calibration(), samples_per_block=50)
+    # 100 samples of buffer
+    niDAQ.start_buffered_acquisition(10000, buffer_seconds=0.01)
+    try:
+        niDAQ.pipeline.run_once()
+        time.sleep(0.05)
+        niDAQ.pipeline.run_once()
+    finally:
+        niDAQ.stop_buffered_acquisition()
+    counters = niDAQ.get_counters()
+    source = niDAQ.pipeline.source
+    assert counters['Overruns'] == 1 and counters['Dropped samples'] >= 300
+    assert source.n_read == 100 + counters['Dropped samples']
+    # times of the samples after the overrun count the dropped ones
+    times = niDAQ.times.get()
+    assert times[50] - times[49] == (counters['Dropped samples'] + 1) * 100_000
@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+import src.pyramidTools as pyr
+
+N_SAMPLES = 123457
+
+
+def create_run(block_size=777):
+    rng = np.random.default_rng(0)
+    times = np.arange(N_SAMPLES, dtype=np.int64) * 1000
+    values = np.cumsum(rng.normal(0, 1, N_SAMPLES))
+    pyramid = pyr.SummaryPyramid()
+    for start in range(0, N_SAMPLES, block_size):
+        pyramid.update(times[start:start + block_size], values[start:start + block_size])
+    return pyramid, times, values
+
+
+def assert_matches_raw(buckets, times, values):
+    for bucket in buckets:
+        samples = values[(times >= bucket['start']) & (times <= bucket['end'])]
+        assert bucket['count'] == len(samples)
+        assert bucket['min'] == samples.min() and bucket['max'] == samples.max()
+        assert bucket['mean'] == pytest.approx(samples.mean())
+
+
+@pytest.mark.parametrize('first, last, n_points', [(0, N_SAMPLES - 1, 500), (N_SAMPLES - 5000, N_SAMPLES - 1, 300),
+                                                   (1234, 99999, 700), (5000, 5400, 1000), (0, N_SAMPLES - 1, 7)])
+def test_query_matches_raw_samples(first, last, n_points):
+    pyramid, times, values = create_run()
+    buckets = pyramid.query(times[first], times[last], n_points, times, lambda start, end: values[start:end])
+    assert len(buckets) <= n_points
+    # buckets at the edges can hold samples just outside the range
+    assert buckets['start'][0] <= times[first] and buckets['end'][-1] >= times[last]
+    assert buckets['count'].sum() == np.count_nonzero((times >= buckets['start'][0]) & (times <= buckets['end'][-1]))
+    assert_matches_raw(buckets, times, values)
+
+
+@pytest.mark.parametrize('block_size', [7, 999, N_SAMPLES])
+def test_levels_dont_depend_on_block_size(block_size):
+    expected, _, _ = create_run(N_SAMPLES)
+    pyramid, _, _ = create_run(block_size)
+    for level, expected_level in zip(pyramid.levels, expected.levels):
+        assert level.get_buckets()[['start', 'end', 'min', 'max', 'count']].tolist() == \
+            expected_level.get_buckets()[['start', 'end', 'min', 'max', 'count']].tolist()
+        assert level.get_buckets()['mean'] == pytest.approx(expected_level.get_buckets()['mean'])
+
+
+def test_saves_and_loads(tmp_path):
+    pyramid, times, values = create_run()
+    file_name = pyr.get_pyramid_file_name(tmp_path / "run.csv")
+    pyramid.save(file_name)
+    loaded = pyr.load_pyramid(file_name)
+    assert loaded.n_samples == N_SAMPLES
+    for level, loaded_level in zip(pyramid.levels, loaded.levels):
+        assert (loaded_level.get_buckets() == level.get_buckets()).all()
+
+
+def test_rejects_factors_that_dont_divide():
+    with pytest.raises(ValueError):
+        pyr.SummaryPyramid([10, 25])
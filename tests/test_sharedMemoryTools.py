@@ -0,0 +1,72 @@
+import uuid
+
+import numpy as np
+import pytest
+import src.sharedMemoryTools as shm
+
+CAPACITY = 10
+
+
+@pytest.fixture
+def ring():
+    name = f"test_ring_{uuid.uuid4().hex[:8]}"
+    with shm.SharedRingWriter(name, CAPACITY) as writer, shm.SharedRingReader(name) as reader:
+        yield writer, reader
+
+
+def write(writer, first, last):
+    times = np.arange(first, last, dtype=np.int64)
+    writer.write(times, times * 1.0, times * 2.0)
+
+
+def read_times(views):
+    return np.concatenate(views)['time'].tolist()
+
+
+def test_wraps_around(ring):
+    writer, reader = ring
+    write(writer, 0, 7)
+    write(writer, 7, 14)
+    first_index, views = reader.latest(CAPACITY)
+    assert first_index == 4 and len(views) == 2
+    assert read_times(views) == list(range(4, 14))
+    assert reader.read_latest(3)['temperature'].tolist() == [22.0, 24.0, 26.0]
+    assert reader.is_valid(first_index)
+
+
+def test_block_larger_than_the_ring_keeps_the_latest_samples(ring):
+    writer, reader = ring
+    write(writer, 0, 25)
+    assert reader.get_write_index() == 25
+    assert read_times(reader.latest(100)[1]) == list(range(15, 25))
+
+
+def test_overwritten_samples_are_invalid(ring):
+    writer, reader = ring
+    write(writer, 0, 5)
+    first_index, _ = reader.latest(5)
+    write(writer, 5, 10)
+    assert reader.is_valid(first_index)
+    write(writer, 10, 11)
+    assert not reader.is_valid(first_index)
+
+
+def test_reset_keeps_indexes_across_runs(ring):
+    writer, reader = ring
+    write(writer, 0, 8)
+    first_index, _ = reader.latest(5)
+    writer.reset()
+    first_index_after_reset, views = reader.latest(5)
+    assert first_index_after_reset == 8 and read_times(views) == []
+    write(writer, 100, 106)
+    # the new run overwrote samples the reader still points at
+    assert not reader.is_valid(first_index)
+    first_index, views = reader.latest(CAPACITY)
+    assert first_index == 8 and read_times(views) == list(range(100, 106))
+
+
+def test_readers_find_the_metadata(ring):
+    writer, reader = ring
+    writer.set_metadata(sample_rate=1000.0)
+    assert reader.get_sample_rate() == 1000.0
+    assert reader.capacity == CAPACITY
@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+import src.statisticsTools as st
+
+NS_PER_MS = 1_000_000
+
+
+def create_run(n_samples=5000, seed=0):
+    rng = np.random.default_rng(seed)
+    times = np.arange(n_samples, dtype=np.int64) * NS_PER_MS
+    # large offset so that naive sums of squares would lose the variance
+    values = 1e6 + np.cumsum(rng.normal(0, 0.1, n_samples))
+    return times, values
+
+
+@pytest.mark.parametrize('block_size', [1, 7, 500, 5000])
+def test_running_statistics_match_the_whole_run(block_size):
+    times, values = create_run()
+    statistics = st.RunningStatistics()
+    for start in range(0, len(times), block_size):
+        statistics.update(values[start:start + block_size], times[start:start + block_size])
+    mean, std, minimum, maximum, rate = statistics.get_summary()
+    assert len(statistics) == len(values)
+    assert mean == pytest.approx(values.mean(), rel=1e-12)
+    assert std == pytest.approx(values.std(ddof=1), rel=1e-9)
+    assert (minimum, maximum) == (values.min(), values.max())
+    assert rate == pytest.approx((values[-1] - values[0]) / ((times[-1] - times[0]) / 1e9))
+
+
+def test_running_statistics_without_enough_values():
+    statistics = st.RunningStatistics()
+    assert statistics.get_summary() == [None] * 5
+    statistics.update([20.0], [0])
+    assert statistics.get_summary() == [20.0, None, 20.0, 20.0, None]
+    statistics.clear()
+    assert len(statistics) == 0
+
+
+@pytest.mark.parametrize('block_size', [1, 13, 5000])
+def test_window_statistics_match_the_latest_values(block_size):
+    length = 50
+    times, values = create_run()
+    window = st.WindowStatistics(length)
+    for start in range(0, len(times), block_size):
+        window.update(values[start:start + block_size], times[start:start + block_size])
+        end = min(start + block_size, len(times))
+        latest = values[max(end - length, 0):end]
+        latest_times = times[max(end - length, 0):end]
+        mean, std, minimum, maximum, rate = window.get_summary()
+        assert len(window) == len(latest)
+        assert mean == pytest.approx(latest.mean(), abs=1e-6)
+        assert (minimum, maximum) == (latest.min(), latest.max())
+        if len(latest) > 1:
+            assert std == pytest.approx(latest.std(ddof=1), rel=1e-4)
+            assert rate == pytest.approx((latest[-1] - latest[0]) / ((latest_times[-1] - latest_times[0]) / 1e9))
+
+
+def test_window_length_must_be_at_least_two():
+    with pytest.raises(ValueError):
+        st.WindowStatistics(1)
+    window = st.WindowStatistics(10)
+    window.update([1.0, 2.0, 3.0], [0, 1, 2])
+    window.set_length(5)
+    assert window.length == 5 and len(window) == 0
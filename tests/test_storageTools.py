@@ -0,0 +1,59 @@
+import pytest
+import src.calibrationTools as ct
+import src.storageTools as stg
+
+
+def create_calibration(sensor_id, m, n):
+    calibration = ct.LinearCalibration('LEAST_SQUARES')
+    calibration.set_parameters(m, n)
+    calibration.set_data_list([[0.5, m * 0.5 + n], [1.5, m * 1.5 + n]])
+    calibration.set_sensor_id(sensor_id)
+    return calibration
+
+
+def create_nonlinear_calibration(sensor_id):
+    calibration = ct.NonLinearCalibration()
+    calibration.set_parameters(1.5, -2.25, 20.125)
+    calibration.set_data_list([[0.0, 20.125], [1.0, 19.375], [2.0, 21.625]])
+    calibration.set_sensor_id(sensor_id)
+    return calibration
+
+
+def test_calibrations_round_trip(tmp_path):
+    path = str(tmp_path / "library" / "calibrations.db")
+    saved = [create_calibration('TC-1', 100.0, -5.0), create_nonlinear_calibration('TC-1')]
+    with stg.CalibrationLibrary(path) as library:
+        for calibration in saved:
+            library.save(calibration)
+
+    # reopened from the file
+    with stg.CalibrationLibrary(path) as library:
+        loaded = library.load('TC-1')
+    assert [calibration.to_dict() for calibration in loaded] == [calibration.to_dict() for calibration in saved]
+    assert isinstance(loaded[1], ct.NonLinearCalibration)
+    assert loaded[1].timestamp is not None
+    assert loaded[1].calculate_temperature(1.0) == pytest.approx(19.375)
+
+
+def test_latest_calibration_of_every_sensor():
+    with stg.CalibrationLibrary(":memory:") as library:
+        for i in range(15):
+            library.save(create_calibration('TC-1', 100.0 + i, 0.0))
+        library.save(create_calibration('TC-2', 50.0, 1.0))
+        assert len(library) == 16
+        assert library.get_sensor_ids() == ['TC-1', 'TC-2']
+        assert library.load_latest('TC-1').get_parameter('coefficient_g1') == 114.0
+        assert library.load_latest('TC-2').get_parameter('constant') == 1.0
+        assert library.load_latest('TC-3') is None
+        # the latest ones, from oldest to newest
+        assert [calibration.get_parameter('coefficient_g1') for calibration in library.load('TC-1')] == \
+            [100.0 + i for i in range(15 - stg.LIBRARY_LOG_LENGTH, 15)]
+
+
+def test_load_calibration_without_calibrations(tmp_path):
+    path = str(tmp_path / "calibrations.db")
+    with stg.CalibrationLibrary(path) as library:
+        library.save(create_calibration('TC-1', 100.0, -5.0))
+    assert repr(stg.load_calibration('TC-1', path)) == "y = 100.000x -5.000"
+    with pytest.raises(ValueError):
+        stg.load_calibration('TC-2', path)
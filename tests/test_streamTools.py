@@ -0,0 +1,40 @@
+import asyncio
+
+import numpy as np
+import pytest
+import src.streamTools as stream
+
+
+def test_frames_round_trip():
+    times = np.arange(5, dtype=np.int64) * 10 ** 12
+    voltages = np.linspace(0, 1, 5)
+    frame = stream.encode_frame(7, times, voltages, voltages * 100)
+    header, payload = frame[:stream.FRAME_HEADER.size], frame[stream.FRAME_HEADER.size:]
+    assert len(payload) == stream.payload_size(len(stream.FRAME_CHANNELS), len(times))
+    sequence, block = stream.decode_frame(header, payload)
+    assert sequence == 7
+    np.testing.assert_array_equal(block['time'], times)
+    np.testing.assert_array_equal(block['voltage'], voltages)
+    np.testing.assert_array_equal(block['temperature'], voltages * 100)
+    with pytest.raises(ValueError):
+        stream.decode_frame(b'XXXX' + header[4:], payload)
+
+
+def test_subscriber_receives_every_block():
+    assert asyncio.run(stream._run_loopback_test(n_blocks=20, block_size=100))
+
+
+def test_slow_subscribers_drop_their_oldest_frames():
+    publisher = stream.DataPublisher(queue_size=2)
+    queue = asyncio.Queue(maxsize=2)
+    publisher.subscribers.add(queue)
+    for i in range(5):
+        publisher._broadcast(bytes([i]))
+    assert publisher.dropped_frames == 3
+    assert [queue.get_nowait(), queue.get_nowait()] == [bytes([3]), bytes([4])]
+
+
+def test_publishing_without_a_server_does_nothing():
+    publisher = stream.DataPublisher()
+    publisher.publish([0], [0.0], [0.0])
+    assert publisher.sequence == 0
@@ -0,0 +1,74 @@
+import time
+
+import numpy as np
+import pytest
+import src.calibrationTools as ct
+import src.daqTools as dt
+import src.simulationTools as sim
+import src.timingTools as tm
+
+NS_PER_MS = 1_000_000
+BIN_RATIO = 10 ** (1 / tm.HISTOGRAM_BINS_PER_DECADE)
+
+
+def create_times(n_times=10000, seed=0):
+    # log-normal around 1 ms, from about 10 µs to 100 ms
+    return np.random.default_rng(seed).lognormal(np.log(NS_PER_MS), 1.0, n_times)
+
+
+def test_times_fall_in_their_bin():
+    histogram = tm.LatencyHistogram()
+    times = create_times()
+    for time_ns in times:
+        histogram.add(time_ns)
+    bounds = tm.LatencyHistogram.get_upper_bounds()
+    expected = np.bincount(np.searchsorted(bounds, times, side='right'), minlength=len(bounds))
+    np.testing.assert_array_equal(histogram.counts, expected)
+    assert len(histogram) == len(times) == sum(count for _, count in histogram.get_rows())
+    assert np.allclose(bounds[1:-1] / bounds[:-2], BIN_RATIO)
+
+
+def test_out_of_range_times_go_to_the_first_and_last_bins():
+    histogram = tm.LatencyHistogram()
+    for time_ns in [-5, 0, tm.HISTOGRAM_MIN_NS - 1, 100 * 10 ** 9]:
+        histogram.add(time_ns)
+    assert histogram.get_rows() == [[tm.to_ms(tm.HISTOGRAM_MIN_NS), 3], ['More', 1]]
+    assert histogram.max == 100 * 10 ** 9
+
+
+@pytest.mark.parametrize('percentile', [1, 50, 90, 99, 100])
+def test_percentiles_are_within_one_bin(percentile):
+    histogram = tm.LatencyHistogram()
+    times = create_times()
+    for time_ns in times:
+        histogram.add(time_ns)
+    exact = np.percentile(times, percentile, method='inverted_cdf')
+    assert exact <= histogram.get_percentile(percentile) <= min(exact * BIN_RATIO, times.max())
+
+
+def test_summary_in_ms():
+    histogram = tm.LatencyHistogram()
+    assert histogram.get_summary() == [None] * 3
+    for time_ns in [2 * NS_PER_MS] * 99 + [7 * NS_PER_MS]:
+        histogram.add(time_ns)
+    p50, p99, maximum = histogram.get_summary()
+    assert 2.0 <= p50 <= 2.0 * BIN_RATIO and p50 == p99
+    assert maximum == 7.0
+    histogram.clear()
+    assert len(histogram) == 0 and histogram.get_summary() == [None] * 3
+
+
+def test_on_demand_reads_count_missed_reads():
+    niDAQ = dt.niDAQ(sim.SIMULATED_MODEL, False)
+    niDAQ.initiate_daq()
+    niDAQ.set_time_log()
+    calibration = ct.LinearCalibration('LEAST_SQUARES')
+    calibration.set_parameters(100.0, 0.0)
+    niDAQ.acquire_data(calibration, time_interval=1)
+    time.sleep(0.0035)
+    niDAQ.acquire_data(calibration, time_interval=1)
+    counters = niDAQ.get_counters()
+    # 2.5 ms late is two whole intervals missed
+    assert counters['Missed reads'] >= 2
+    assert counters['Jitter max [ms]'] >= 2.5
+    assert len(niDAQ.pipeline.source.jitter) == 1
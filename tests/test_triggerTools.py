@@ -0,0 +1,69 @@
+import numpy as np
+import pytest
+import src.pipelineTools as pt
+import src.triggerTools as tt
+
+
+def run_stage(stage, temperatures, block_size, derived=None):
+    """
+    Feeds consecutive blocks to a trigger stage
+    :return: Block object with every sample it let through
+    """
+    times = np.arange(len(temperatures), dtype=np.int64) * 1000
+    kept = []
+    for start in range(0, len(times), block_size):
+        block = pt.Block(times[start:start + block_size], temperatures[start:start + block_size],
+                         temperatures[start:start + block_size])
+        for name, column in ({} if derived is None else derived).items():
+            block.derived[name] = column[start:start + block_size]
+        block = stage.process(block)
+        if block is not None and len(block):
+            kept.append(block)
+    return pt.concatenate_blocks(kept)
+
+
+@pytest.mark.parametrize('block_size', [1, 7, 64, 1000, 5000])
+def test_keeps_pre_and_post_trigger_windows(block_size):
+    temperatures = np.arange(2000, dtype=float)
+    stage = tt.TriggerStage(tt.Trigger('Level', 500.0), 100, 200)
+    kept = run_stage(stage, temperatures, block_size)
+    assert kept.temperatures.tolist() == list(range(400, 700))
+    assert stage.trigger_time == 500 * 1000
+    assert stage.is_finished()
+
+
+@pytest.mark.parametrize('block_size', [1, 30, 1000])
+def test_pre_trigger_window_holds_only_the_samples_before_the_trigger(block_size):
+    temperatures = np.arange(2000, dtype=float)
+    stage = tt.TriggerStage(tt.Trigger('Level', 50.0), 100, 200)
+    assert run_stage(stage, temperatures, block_size).temperatures.tolist() == list(range(0, 250))
+
+
+def test_falling_trigger_arms_with_hysteresis():
+    # starts below the level, it has to go above level + hysteresis before it can fire
+    temperatures = np.array([10.0, 9.0, 11.0, 12.5, 11.0, 9.5, 8.0])
+    trigger = tt.Trigger('Level', 10.0, 'Falling', hysteresis=2.0)
+    assert trigger.find(pt.Block(np.arange(7), temperatures, temperatures)) == 5
+
+
+def test_doesnt_fire_again_after_the_post_trigger_window():
+    temperatures = np.tile(np.arange(100, dtype=float), 5)
+    stage = tt.TriggerStage(tt.Trigger('Level', 50.0), 0, 10)
+    assert len(run_stage(stage, temperatures, 64)) == 10
+
+
+def test_rate_of_rise_fires_on_the_trend():
+    temperatures = np.zeros(100)
+    # a noisy sample to sample rate far above the level, but a flat trend until sample 60
+    rates = np.where(np.arange(100) % 2, 1000.0, -1000.0)
+    trend = np.where(np.arange(100) < 60, 0.0, 5.0)
+    stage = tt.TriggerStage(tt.Trigger('Rate of rise', 2.0, hysteresis=1.0), 0, 5)
+    run_stage(stage, temperatures, 10, {'rate': rates, 'trend': trend})
+    assert stage.trigger_time == 60 * 1000
+
+
+def test_rejects_invalid_windows():
+    with pytest.raises(ValueError):
+        tt.TriggerStage(tt.Trigger('Level', 0.0), -1, 10)
+    with pytest.raises(ValueError):
+        tt.TriggerStage(tt.Trigger('Level', 0.0), 0, 0)